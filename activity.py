@@ -0,0 +1,96 @@
+"""
+Активность папки загрузки по времени последней записи
+Монитор берет самый свежий mtime из DirSizeTracker, который и так обходит папку;
+detect_activity для разового вызова обходит дерево сам и прекращает обход
+на первом свежем файле.
+"""
+
+import os
+import time
+from typing import NamedTuple, Optional
+
+ACTIVE = "active"
+STALLED = "stalled"
+PAUSED = "paused"
+
+# Запись не позже этого (секунды) - загрузка идет
+ACTIVE_WITHIN = 30.0
+# Запись не позже этого - загрузка застряла (сеть, диск); дольше - стоит на паузе
+STALLED_WITHIN = 5 * 60.0
+
+
+class Activity(NamedTuple):
+    state: str
+    newest_mtime: Optional[float]   # None - папки нет
+    idle_seconds: Optional[float]   # сколько прошло с последней записи
+
+
+def newest_mtime(root, stop_at: Optional[float] = None) -> Optional[float]:
+    """
+    Самый свежий mtime каталога root, его подкаталогов и файлов.
+    stop_at - вернуть первое найденное значение не меньше этого, не досматривая дерево.
+    """
+    try:
+        newest = os.stat(root).st_mtime
+    except OSError:
+        return None
+    if stop_at is not None and newest >= stop_at:
+        return newest
+
+    stack = [os.fspath(root)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                try:
+                    mtime = entry.stat(follow_symlinks=False).st_mtime
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                except OSError:
+                    continue
+                if mtime > newest:
+                    newest = mtime
+                    if stop_at is not None and newest >= stop_at:
+                        return newest
+    return newest
+
+
+def classify_activity(mtime: Optional[float], now: Optional[float] = None,
+                      active_within: Optional[float] = None,
+                      stalled_within: Optional[float] = None) -> Activity:
+    """
+    Классифицирует загрузку по времени последней записи в папку (now - time.time()).
+    Пороги по умолчанию читаются при вызове, чтобы их можно было подменить (replay --set).
+    """
+    if now is None:
+        now = time.time()
+    if active_within is None:
+        active_within = ACTIVE_WITHIN
+    if stalled_within is None:
+        stalled_within = STALLED_WITHIN
+    if mtime is None:
+        return Activity(PAUSED, None, None)
+
+    idle = max(0.0, now - mtime)
+    if idle < active_within:
+        state = ACTIVE
+    elif idle < stalled_within:
+        state = STALLED
+    else:
+        state = PAUSED
+    return Activity(state, mtime, round(idle, 1))
+
+
+def detect_activity(folder, now: Optional[float] = None,
+                    active_within: Optional[float] = None,
+                    stalled_within: Optional[float] = None) -> Activity:
+    """То же по самой папке, без DirSizeTracker"""
+    if now is None:
+        now = time.time()
+    if active_within is None:
+        active_within = ACTIVE_WITHIN
+    mtime = newest_mtime(folder, stop_at=now - active_within)
+    return classify_activity(mtime, now, active_within, stalled_within)
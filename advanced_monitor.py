@@ -1,18 +1,19 @@
 # steam_monitor.py
-import os
 import sys
 import time
-import winreg
 import logging
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, Dict, Tuple
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+from vdf_parser import AppManifest, load_manifest
+from size_tracker import get_tracker
+from fs_watcher import create_watcher
+from speed_history import SpeedHistory
+from speed_estimator import SpeedEstimator
+from profiler import StageProfiler
+from steam_discovery import STEAM_ROOT_ENV, find_steam_root
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,36 +27,19 @@ class AdvancedSteamMonitor:
             self.steam_path = self._find_steam_path()
 
         if not self.steam_path:
-            logger.error("Steam не найден на системе")
+            logger.error(f"Steam не найден на системе (можно указать путь в {STEAM_ROOT_ENV})")
             sys.exit(1)
 
         logger.info(f"✅ Steam найден: {self.steam_path}")
 
-        self.last_sizes = {}
-        self.download_history = {}
+        self.size_trackers = {}
+        self.speed_estimator = SpeedEstimator()
+        self.download_history = SpeedHistory()
+        self.profiler = StageProfiler()
 
     def _find_steam_path(self) -> Optional[Path]:
-        """Находит путь установки Steam"""
-        # Ваш конкретный путь
-        paths = [
-            Path("G:/SteamLibrary"),
-            Path("C:/Program Files (x86)/Steam"),
-            Path("C:/Program Files/Steam"),
-            Path(os.path.expanduser("~/Steam")),
-        ]
-
-        for path in paths:
-            if path.exists():
-                return path
-
-        # Поиск в реестре
-        try:
-            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Software\Valve\Steam")
-            steam_path = winreg.QueryValueEx(key, "SteamPath")[0]
-            winreg.CloseKey(key)
-            return Path(steam_path)
-        except:
-            return None
+        """Находит путь установки Steam (STEAM_ROOT, реестр Windows, стандартные пути ОС)"""
+        return find_steam_root()
 
     def get_download_info(self):
         """Получает полную информацию о загрузке"""
@@ -77,18 +61,24 @@ class AdvancedSteamMonitor:
                 app_id = folders[0].name
                 info['app_id'] = app_id
 
+                # appmanifest читается один раз за проверку
+                with self.profiler.stage("manifest"):
+                    manifest = self._load_manifest(app_id)
+
                 # Получаем имя игры
-                info['game_name'] = self._get_game_name(app_id)
+                with self.profiler.stage("game_name"):
+                    info['game_name'] = self._get_game_name(app_id, manifest)
 
                 # Проверяем прогресс через appmanifest
-                progress_data = self._get_download_progress(app_id)
+                progress_data = self._get_download_progress(app_id, manifest)
                 if progress_data:
                     info['progress'] = progress_data['progress']
                     info['size_downloaded'] = progress_data['downloaded']
                     info['size_total'] = progress_data['total']
 
                 # Рассчитываем скорость по изменению размера папки
-                speed = self._calculate_speed(app_id)
+                with self.profiler.stage("size_walk"):
+                    speed = self._calculate_speed(app_id, manifest)
                 info['speed_mb'] = speed
 
                 # Определяем статус
@@ -101,97 +91,60 @@ class AdvancedSteamMonitor:
 
         return info
 
-    def _calculate_speed(self, app_id):
-        """Рассчитывает скорость по изменению размера папки"""
+    def _calculate_speed(self, app_id, manifest: Optional[AppManifest] = None):
+        """Скорость по росту BytesDownloaded, если манифест не меняется - по размеру папки"""
         download_folder = self.steam_path / "steamapps" / "downloading" / app_id
 
-        if not download_folder.exists():
-            return 0.0
-
-        # Считаем текущий размер
-        current_size = 0
-        file_count = 0
-        for file_path in download_folder.rglob("*"):
-            if file_path.is_file():
-                current_size += file_path.stat().st_size
-                file_count += 1
-
-        current_time = time.time()
-
-        # Сохраняем предыдущий размер
-        if app_id not in self.last_sizes:
-            self.last_sizes[app_id] = (current_time, current_size, file_count)
-            return 0.0
-
-        last_time, last_size, last_count = self.last_sizes[app_id]
-        time_diff = current_time - last_time
-
-        if time_diff >= 1:  # Если прошла хотя бы 1 секунда
-            size_diff = current_size - last_size
-            speed = size_diff / time_diff / (1024 * 1024)  # MB/s
-
-            # Обновляем запись
-            self.last_sizes[app_id] = (current_time, current_size, file_count)
-
-            # Добавляем в историю для статистики
-            if app_id not in self.download_history:
-                self.download_history[app_id] = []
-            self.download_history[app_id].append((current_time, speed))
+        folder_bytes = None
+        if download_folder.exists():
+            # Пересканируются только измененные каталоги
+            folder_bytes = get_tracker(self.size_trackers, app_id, download_folder).update()
 
-            # Ограничиваем историю
-            self.download_history[app_id] = [
-                (t, s) for t, s in self.download_history[app_id]
-                if current_time - t < 300  # 5 минут
-            ]
+        now = time.monotonic()
+        estimate = self.speed_estimator.update(
+            app_id, now,
+            manifest.bytes_downloaded if manifest is not None else None,
+            folder_bytes
+        )
 
-            return round(speed, 2)
+        if estimate.confidence > 0:
+            # Добавляем в историю для статистики (окно 5 минут)
+            self.download_history.add(app_id, estimate.speed_mbps, now)
+            self.download_history.evict_idle(now)
 
-        return 0.0
+        return round(estimate.speed_mbps, 2)
 
-    def _get_download_progress(self, app_id):
-        """Получает прогресс загрузки из appmanifest"""
+    def _load_manifest(self, app_id) -> Optional[AppManifest]:
+        """Читает appmanifest игры"""
         manifest_file = self.steam_path / "steamapps" / f"appmanifest_{app_id}.acf"
 
         if manifest_file.exists():
             try:
-                with open(manifest_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-
-                # Ищем BytesDownloaded и SizeOnDisk
-                import re
-                downloaded_match = re.search(r'"BytesDownloaded"\s+"(\d+)"', content)
-                total_match = re.search(r'"SizeOnDisk"\s+"(\d+)"', content)
-
-                if downloaded_match and total_match:
-                    downloaded = int(downloaded_match.group(1))
-                    total = int(total_match.group(1))
-
-                    if total > 0:
-                        progress = (downloaded / total) * 100
-                        return {
-                            'progress': round(progress, 1),
-                            'downloaded': downloaded,
-                            'total': total
-                        }
+                return load_manifest(manifest_file)
             except Exception as e:
                 logger.error(f"Ошибка чтения appmanifest: {e}")
 
         return None
 
-    def _get_game_name(self, app_id):
+    def _get_download_progress(self, app_id, manifest: Optional[AppManifest] = None):
+        """Получает прогресс загрузки из appmanifest"""
+        manifest = manifest or self._load_manifest(app_id)
+
+        if manifest and manifest.total_bytes > 0:
+            return {
+                'progress': round(manifest.progress, 1),
+                'downloaded': manifest.bytes_downloaded,
+                'total': manifest.total_bytes
+            }
+
+        return None
+
+    def _get_game_name(self, app_id, manifest: Optional[AppManifest] = None):
         """Получает название игры"""
-        manifest_file = self.steam_path / "steamapps" / f"appmanifest_{app_id}.acf"
+        manifest = manifest or self._load_manifest(app_id)
 
-        if manifest_file.exists():
-            try:
-                with open(manifest_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        if '"name"' in line:
-                            parts = line.strip().split('"')
-                            if len(parts) >= 4:
-                                return parts[3]
-            except:
-                pass
+        if manifest and manifest.name:
+            return manifest.name
 
         return f"Игра (ID: {app_id})"
 
@@ -206,8 +159,10 @@ class AdvancedSteamMonitor:
         else:
             return "0 B/s"
 
-    def start_monitoring(self, update_interval=60, duration_minutes=5):
+    def start_monitoring(self, update_interval=60, duration_minutes=5, backend="auto"):
         """Запускает мониторинг"""
+        watcher = create_watcher([self.steam_path / "steamapps"], self.steam_path / "logs", backend)
+
         print("=" * 70)
         print("🎮 Steam Download Monitor - Реальный мониторинг")
         print(f"📁 Путь к Steam: {self.steam_path}")
@@ -220,7 +175,8 @@ class AdvancedSteamMonitor:
         try:
             while time.time() < end_time:
                 update_count += 1
-                info = self.get_download_info()
+                with self.profiler.stage("get_download_info"):
+                    info = self.get_download_info()
 
                 print(f"\n📊 Обновление #{update_count} - {datetime.now().strftime('%H:%M:%S')}")
                 print("-" * 70)
@@ -262,14 +218,18 @@ class AdvancedSteamMonitor:
                 # Ожидание до следующего обновления
                 wait_time = min(update_interval, end_time - time.time())
                 if wait_time > 0:
-                    time.sleep(wait_time)
+                    watcher.wait(wait_time)
                 else:
                     break
 
         except KeyboardInterrupt:
             print("\n\n⚠️  Мониторинг прерван пользователем")
         finally:
+            watcher.close()
             self._print_summary()
+            if self.profiler.enabled:
+                print("\n" + "\n".join(self.profiler.format_summary()))
+                self.profiler.log_summary()
 
     def _print_summary(self):
         """Печатает итоговую статистику"""
@@ -277,16 +237,11 @@ class AdvancedSteamMonitor:
         print("📈 Итоговая статистика")
         print("=" * 70)
 
-        for app_id in self.download_history:
-            if self.download_history[app_id]:
-                speeds = [s for _, s in self.download_history[app_id]]
-                if speeds:
-                    avg_speed = sum(speeds) / len(speeds)
-                    max_speed = max(speeds)
-
-                    print(f"\n🎮 {self._get_game_name(app_id)} (AppID: {app_id})")
-                    print(f"   Средняя скорость: {self.format_speed(avg_speed)}")
-                    print(f"   Максимальная скорость: {self.format_speed(max_speed)}")
-                    print(f"   Всего измерений: {len(speeds)}")
+        for app_id, series in self.download_history:
+            if series:
+                print(f"\n🎮 {self._get_game_name(app_id)} (AppID: {app_id})")
+                print(f"   Средняя скорость: {self.format_speed(series.mean)}")
+                print(f"   Максимальная скорость: {self.format_speed(series.peak)}")
+                print(f"   Всего измерений: {series.total_count}")
 
         print("\n✅ Мониторинг завершен")
\ No newline at end of file
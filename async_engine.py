@@ -0,0 +1,311 @@
+"""
+Асинхронный движок мониторинга
+Диски сканируются в пуле потоков, Store API - через пул HTTP-соединений,
+вывод и экспорт работают отдельными задачами
+"""
+
+import time
+import signal
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from name_cache import LOOKUP_TIMEOUT, STORE_API_URL, fetch_store_name, parse_store_response
+from scheduler import PollScheduler
+
+logger = logging.getLogger(__name__)
+
+# Сколько ждать сканирования одной библиотеки, прежде чем взять прошлый результат
+SCAN_TIMEOUT = 5.0
+# Соединений к Store API одновременно
+HTTP_POOL_SIZE = 4
+# Сколько при остановке ждать, пока обработчики допишут уже полученные снимки
+DRAIN_TIMEOUT = 5.0
+
+
+class StoreClient:
+    """Асинхронные запросы к Store API (aiohttp, если установлен, иначе requests в пуле)"""
+
+    def __init__(self, timeout: float = LOOKUP_TIMEOUT, pool_size: int = HTTP_POOL_SIZE,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.executor = executor
+        self._session = None
+        self._aiohttp = None
+        self._limit = asyncio.Semaphore(pool_size)
+
+    def _get_session(self):
+        if self._session is None:
+            try:
+                import aiohttp
+            except ImportError:
+                return None
+            self._aiohttp = aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def fetch_name(self, app_id: str) -> Optional[str]:
+        """Название игры из Store API или None"""
+        async with self._limit:
+            session = self._get_session()
+            if session is None:
+                loop = asyncio.get_running_loop()
+                try:
+                    return await asyncio.wait_for(
+                        loop.run_in_executor(self.executor, fetch_store_name, app_id, self.timeout),
+                        self.timeout + 1
+                    )
+                except asyncio.TimeoutError:
+                    return None
+
+            try:
+                async with session.get(STORE_API_URL.format(app_id=app_id)) as response:
+                    if response.status == 200:
+                        return parse_store_response(app_id, await response.json(content_type=None))
+            except Exception as e:
+                logger.debug(f"Store API недоступен для {app_id}: {e}")
+            return None
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class _Consumer:
+    """
+    Получатель снимков (вывод, экспорт). Медленный получатель пропускает промежуточные
+    снимки, если keep_all не задан; с keep_all обрабатывает каждый по порядку.
+    """
+
+    def __init__(self, func: Callable, executor: ThreadPoolExecutor, keep_all: bool = False):
+        self.func = func
+        self.executor = executor
+        self.is_async = asyncio.iscoroutinefunction(func)
+        self.pending: deque = deque(maxlen=None if keep_all else 1)
+        self.ready = asyncio.Event()
+        self.closing = False
+
+    def offer(self, snapshot):
+        self.pending.append(snapshot)
+        self.ready.set()
+
+    def close(self):
+        """Дописать полученные снимки и завершиться"""
+        self.closing = True
+        self.ready.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            while self.pending:
+                snapshot = self.pending.popleft()
+                try:
+                    if self.is_async:
+                        await self.func(snapshot)
+                    else:
+                        await loop.run_in_executor(self.executor, self.func, snapshot)
+                except Exception as e:
+                    logger.error(f"Ошибка обработчика снимка {self.func}: {e}")
+            if self.closing:
+                return
+
+
+class AsyncMonitorEngine:
+    """Цикл опроса RealSteamMonitor на asyncio"""
+
+    def __init__(self, monitor, scheduler: Optional[PollScheduler] = None,
+                 scan_timeout: float = SCAN_TIMEOUT, workers: int = 4):
+        self.monitor = monitor
+        self.scheduler = scheduler or PollScheduler(60)
+        self.scan_timeout = scan_timeout
+
+        # Сканирование библиотек и сетевые запросы без requests/aiohttp
+        self.io_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="async-io")
+        # Изменение состояния монитора - строго в одном потоке
+        self.state_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="engine-state")
+        # Вывод и экспорт
+        self.output_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="engine-output")
+
+        # Создается в run(): на Python 3.8-3.9 Semaphore привязывается к текущему циклу событий
+        self.store: Optional[StoreClient] = None
+        self.snapshot: List = []
+
+        self._scan_futures: Dict[Path, asyncio.Future] = {}
+        self._last_scans: Dict[Path, Dict] = {}
+        self._consumers: List[_Consumer] = []
+        self._consumer_funcs: List[Callable] = []
+        self._exporters: List[_Consumer] = []
+        self._exporter_funcs: List[Callable] = []
+        self._lookups: Set[asyncio.Task] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    def add_consumer(self, func: Callable[[List], Optional[Awaitable]]):
+        """Регистрирует обработчик снимков (обычная функция или корутина)"""
+        self._consumer_funcs.append(func)
+
+    def add_exporter(self, func: Callable):
+        """Регистрирует обработчик каждой проверки (monitor.last_check), без пропусков"""
+        self._exporter_funcs.append(func)
+
+    def stop(self):
+        """Просит движок остановиться (потокобезопасно)"""
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    def _request_lookup(self, app_id: str):
+        """Вызывается кэшем названий из потока состояния"""
+        self._loop.call_soon_threadsafe(self._spawn_lookup, app_id)
+
+    def _spawn_lookup(self, app_id: str):
+        task = asyncio.ensure_future(self._lookup(app_id))
+        self._lookups.add(task)
+        task.add_done_callback(self._lookups.discard)
+
+    async def _lookup(self, app_id: str):
+        name = await self.store.fetch_name(app_id)
+        self.monitor.name_cache.set_lookup_result(app_id, name)
+
+    async def _scan_libraries(self) -> Dict[str, Dict]:
+        """Сканирует библиотеки параллельно; зависшая библиотека не задерживает остальные"""
+        loop = asyncio.get_running_loop()
+        libraries = self.monitor._get_all_libraries()
+
+        for library in libraries:
+            # Если прошлое сканирование еще идет, новое не запускаем
+            if library not in self._scan_futures:
+                self._scan_futures[library] = loop.run_in_executor(
+                    self.io_executor, self.monitor._scan_library, library
+                )
+
+        futures = [self._scan_futures[lib] for lib in libraries]
+        if futures:
+            await asyncio.wait(futures, timeout=self.scan_timeout)
+
+        results = []
+        for library in libraries:
+            future = self._scan_futures[library]
+            if future.done():
+                del self._scan_futures[library]
+                try:
+                    self._last_scans[library] = future.result()
+                except Exception as e:
+                    logger.error(f"Ошибка сканирования {library}: {e}")
+            else:
+                logger.warning(f"Библиотека {library} отвечает медленно, используются прошлые данные")
+            results.append(self._last_scans.get(library, {}))
+
+        return self.monitor._merge_scans(results)
+
+    async def sample(self) -> List:
+        """Одна проверка всех загрузок"""
+        loop = asyncio.get_running_loop()
+        monitor = self.monitor
+        profiler = monitor.profiler
+
+        with profiler.stage("check_downloads"):
+            now = time.monotonic()
+            with profiler.stage("libraries"):
+                await loop.run_in_executor(self.state_executor, monitor.library_registry.refresh)
+
+            log_task = loop.run_in_executor(self.state_executor, monitor._collect_log_speeds, now)
+            with profiler.stage("scan_libraries"):
+                scanned = await self._scan_libraries()
+            with profiler.stage("parse_logs"):
+                log_speeds = await log_task
+
+            with profiler.stage("build_downloads"):
+                downloads = await loop.run_in_executor(
+                    self.state_executor, monitor._build_downloads, log_speeds, scanned, now
+                )
+
+        self.snapshot = downloads
+        for consumer in self._consumers:
+            consumer.offer(downloads)
+        for exporter in self._exporters:
+            exporter.offer(monitor.last_check)
+        return downloads
+
+    async def run(self, duration: Optional[float] = None, backend: str = "auto"):
+        """Основной цикл; duration в минутах, None или 0 - без ограничения"""
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        try:
+            self._loop.add_signal_handler(signal.SIGTERM, self._stop.set)
+        except (NotImplementedError, AttributeError, RuntimeError):
+            pass
+
+        self.store = StoreClient(executor=self.io_executor)
+        watcher = self.monitor._create_watcher(backend)
+        self.monitor.name_cache.lookup_handler = self._request_lookup
+
+        self._consumers = [_Consumer(f, self.output_executor) for f in self._consumer_funcs]
+        self._exporters = [_Consumer(f, self.output_executor, keep_all=True) for f in self._exporter_funcs]
+        consumer_tasks = [asyncio.ensure_future(c.run()) for c in self._consumers + self._exporters]
+
+        end_time = time.monotonic() + duration * 60 if duration else None
+
+        try:
+            while not self._stop.is_set() and (end_time is None or time.monotonic() < end_time):
+                downloads = await self.sample()
+
+                delay = self.scheduler.next_delay(downloads)
+                if end_time is not None:
+                    delay = min(delay, end_time - time.monotonic())
+                    if delay <= 0:
+                        break
+
+                # Ждем изменений на диске, таймера или сигнала остановки
+                change = asyncio.ensure_future(watcher.wait_async(delay))
+                stop = asyncio.ensure_future(self._stop.wait())
+                done, pending = await asyncio.wait({change, stop}, return_when=asyncio.FIRST_COMPLETED)
+                for task in pending:
+                    task.cancel()
+                # Отмена должна завершиться до закрытия наблюдателя
+                await asyncio.gather(*pending, return_exceptions=True)
+                if change in done and change.result():
+                    # Проверка сразу после события, но не чаще event_gap
+                    delay = self.scheduler.event_delay()
+                    if end_time is not None:
+                        delay = min(delay, end_time - time.monotonic())
+                    try:
+                        await asyncio.wait_for(self._stop.wait(), max(0.0, delay))
+                    except asyncio.TimeoutError:
+                        pass
+                    self.scheduler.reset()
+
+            if self._stop.is_set():
+                logger.info("Мониторинг остановлен по сигналу")
+        finally:
+            try:
+                self._loop.remove_signal_handler(signal.SIGTERM)
+            except (NotImplementedError, AttributeError, RuntimeError):
+                pass
+
+            # Обработчики дописывают полученные снимки: после выхода монитор закрывает
+            # вывод и экспорт, и обработчик не должен работать с ними в это время
+            for consumer in self._consumers + self._exporters:
+                consumer.close()
+            if consumer_tasks:
+                await asyncio.wait(consumer_tasks, timeout=DRAIN_TIMEOUT)
+            for task in consumer_tasks + list(self._lookups):
+                task.cancel()
+            await asyncio.gather(*consumer_tasks, *self._lookups, return_exceptions=True)
+
+            self.monitor.name_cache.lookup_handler = None
+            await self.store.close()
+            watcher.close()
+            for executor in (self.io_executor, self.state_executor):
+                executor.shutdown(wait=False)
+            # Отмена задачи не останавливает вызов, уже идущий в потоке вывода
+            self.output_executor.shutdown(wait=True)
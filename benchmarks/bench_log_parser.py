@@ -0,0 +1,45 @@
+"""
+Бенчмарк разбора строк content_log
+Запуск: python -m benchmarks.bench_log_parser [--lines N]
+"""
+
+import time
+import argparse
+
+from log_parser import parse_line
+from benchmarks.content_log_generator import generate_lines
+
+
+def bench_parse(lines, repeat: int = 5) -> float:
+    """Возвращает лучшую скорость разбора в строках в секунду"""
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            parse_line(line)
+        elapsed = time.perf_counter() - start
+        if elapsed > 0:
+            best = max(best, len(lines) / elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк разбора content_log")
+    parser.add_argument("--lines", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Бенчмарк log_parser.parse_line")
+    print("=" * 60)
+
+    for ratio in (0.05, 0.3, 1.0):
+        lines = list(generate_lines(args.lines, download_ratio=ratio))
+        rate = bench_parse(lines, args.repeat)
+        print(f"Доля строк о загрузке {ratio:>4.0%}: {rate:,.0f} строк/сек")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Бенчмарк монитора на синтетической установке Steam
+Время check_downloads, get_download_info, разбора appmanifest и подсчета размера
+при разных масштабах; результат в JSON для сравнения между коммитами.
+Запуск: python -m benchmarks.bench_monitor [--scales small,medium] [--output results.json]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import argparse
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.steam_fixture import SteamFixture, build_steam_root, default_fixture_dir
+from size_tracker import DirSizeTracker
+from activity import classify_activity, detect_activity
+from vdf_parser import load_manifest
+
+# Масштабы: параметры build_steam_root
+SCALES = {
+    'small': dict(libraries=1, manifests=50, downloading=2, chunks=50,
+                  log_lines=1000, log_sparse_bytes=0),
+    'medium': dict(libraries=3, manifests=300, downloading=5, chunks=500,
+                   log_lines=20_000, log_sparse_bytes=256 * 1024 ** 2),
+    'large': dict(libraries=5, manifests=1000, downloading=10, chunks=2000,
+                  log_lines=100_000, log_sparse_bytes=4 * 1024 ** 3),
+}
+
+
+def measure(func: Callable[[], object], repeat: int, setup: Optional[Callable[[], object]] = None) -> Dict:
+    """Запускает func repeat раз; setup (если есть) выполняется перед каждым запуском вне замера"""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {
+        'repeat': repeat,
+        'min_ms': round(min(samples) * 1000, 3),
+        'median_ms': round(statistics.median(samples) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3),
+    }
+
+
+def bench_manifests(fixture: SteamFixture, repeat: int) -> Dict:
+    def parse_all():
+        for path in fixture.manifests:
+            load_manifest(path)
+
+    result = measure(parse_all, repeat)
+    result['items'] = len(fixture.manifests)
+    return result
+
+
+def bench_size_walk(fixture: SteamFixture, repeat: int) -> Dict[str, Dict]:
+    folders = fixture.downloading
+
+    def rglob():
+        for folder in folders:
+            sum(f.stat().st_size for f in folder.rglob('*') if f.is_file())
+
+    def tracker_cold():
+        for folder in folders:
+            DirSizeTracker(folder).update()
+
+    trackers = [DirSizeTracker(folder) for folder in folders]
+    for tracker in trackers:
+        tracker.update()
+
+    def tracker_warm():
+        for tracker in trackers:
+            tracker.update()
+
+    return {
+        'size_walk_rglob': measure(rglob, repeat),
+        'size_walk_cold': measure(tracker_cold, repeat),
+        'size_walk_warm': measure(tracker_warm, repeat),
+    }
+
+
+def bench_activity(fixture: SteamFixture, repeat: int) -> Dict[str, Dict]:
+    folders = fixture.downloading
+
+    def rglob():
+        for folder in folders:
+            bool(list(folder.rglob('*')))
+
+    def walk_active():
+        # Разовый обход: файлы только что созданы - обход кончается на первом же
+        for folder in folders:
+            detect_activity(folder)
+
+    # Монитор: mtime берется из трекера размера, который обходит папку в любом случае
+    trackers = [DirSizeTracker(folder) for folder in folders]
+    for tracker in trackers:
+        tracker.update()
+
+    def tracked(offset: float):
+        def run():
+            # offset=3600 - через час после записи: свежих файлов нет (пауза)
+            now = time.time() + offset
+            for tracker in trackers:
+                tracker.update()
+                classify_activity(tracker.newest_mtime, now)
+        return run
+
+    return {
+        'activity_rglob': measure(rglob, repeat),
+        'activity_walk_active': measure(walk_active, repeat),
+        'activity_active': measure(tracked(0), repeat),
+        'activity_idle': measure(tracked(3600), repeat),
+    }
+
+
+def _quiet_name_cache(base: Path):
+    from name_cache import GameNameCache
+    return GameNameCache(cache_file=base / "names.json", use_network=False)
+
+
+def bench_check_downloads(fixture: SteamFixture, base: Path, repeat: int) -> Dict[str, Dict]:
+    from steam_monitor import RealSteamMonitor
+
+    monitors: List[RealSteamMonitor] = []
+
+    def new_monitor():
+        monitor = RealSteamMonitor(fixture.steam_path)
+        monitor.name_cache = _quiet_name_cache(base)
+        monitors.append(monitor)
+
+    cold = measure(lambda: monitors[-1].check_downloads(), repeat, setup=new_monitor)
+
+    monitor = monitors[-1]
+    warm = measure(monitor.check_downloads, repeat)
+
+    for m in monitors:
+        if m.scan_executor is not None:
+            m.scan_executor.shutdown(wait=True)
+    return {'check_downloads_cold': cold, 'check_downloads_warm': warm}
+
+
+def bench_get_download_info(fixture: SteamFixture, repeat: int) -> Dict:
+    from advanced_monitor import AdvancedSteamMonitor
+
+    monitor = AdvancedSteamMonitor(fixture.steam_path)
+    return measure(monitor.get_download_info, repeat)
+
+
+def run_scale(name: str, params: Dict, base_dir: Path, repeat: int, keep: bool = False) -> Dict:
+    base = Path(tempfile.mkdtemp(prefix=f"steam-bench-{name}-", dir=base_dir))
+    try:
+        start = time.perf_counter()
+        fixture = build_steam_root(base, **params)
+        results: Dict[str, object] = {
+            'params': params,
+            'fixture_build_s': round(time.perf_counter() - start, 3),
+            'manifest_parse': bench_manifests(fixture, repeat),
+        }
+        results.update(bench_size_walk(fixture, repeat))
+        results.update(bench_activity(fixture, repeat))
+        results.update(bench_check_downloads(fixture, base, repeat))
+        results['get_download_info'] = bench_get_download_info(fixture, repeat)
+        return results
+    finally:
+        if keep:
+            print(f"Установка сохранена: {base}", file=sys.stderr)
+        else:
+            shutil.rmtree(base, ignore_errors=True)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Бенчмарк монитора на синтетической установке Steam")
+    parser.add_argument("--scales", default="small,medium",
+                        help=f"масштабы через запятую ({', '.join(SCALES)})")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dir", type=Path, default=None, help="где создавать установку (по умолчанию tmpfs)")
+    parser.add_argument("--output", type=Path, default=None, help="записать результаты в JSON-файл")
+    parser.add_argument("--keep", action="store_true", help="не удалять созданную установку")
+    args = parser.parse_args(argv)
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"неизвестные масштабы: {', '.join(unknown)}")
+
+    # Сообщения мониторов не нужны в выводе бенчмарка
+    logging.disable(logging.INFO)
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        },
+        'results': {},
+    }
+    base_dir = args.dir or default_fixture_dir()
+
+    for name in scales:
+        print(f"⏱  {name}...", file=sys.stderr)
+        report['results'][name] = run_scale(name, SCALES[name], base_dir, args.repeat, args.keep)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding='utf-8')
+        print(f"✅ Результаты: {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Проверка времени запуска CLI по python -X importtime
+Время импорта steam_monitor должно укладываться в бюджет, а тяжелые зависимости
+(asyncio, sqlite3, http.server, requests, aiohttp) не должны грузиться без нужды.
+Код возврата 1 при нарушении - можно запускать в CI.
+Запуск: python -m benchmarks.bench_startup [--budget-ms 100] [--runs 5]
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+# Бюджет на импорт точки входа (миллисекунды, лучший из запусков)
+BUDGET_MS = 100.0
+
+# Модули, которые грузятся только при включении соответствующей функции
+LAZY_MODULES = (
+    "asyncio",        # --async
+    "sqlite3",        # --history
+    "http.server",    # --metrics-port
+    "requests",       # названия игр из Store API
+    "aiohttp",        # --async
+    "async_engine",
+    "sample_store",
+    "metrics_exporter",
+    "fleet",
+    "json_output",
+    "replay",
+    "notifier",
+)
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)\s*$")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(output: str) -> List[Tuple[str, int, int, int]]:
+    """Строки -X importtime: (модуль, собственное мкс, суммарное мкс, глубина)"""
+    rows = []
+    for line in output.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def measure_import(module: str) -> Tuple[float, List[Tuple[str, int, int, int]]]:
+    """Импортирует модуль в новом процессе; возвращает (мс, строки importtime)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=REPO_ROOT,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} завершился с ошибкой:\n{result.stderr}")
+
+    rows = parse_importtime(result.stderr)
+    total = next((cumulative for name, _, cumulative, _ in reversed(rows) if name == module), 0)
+    return total / 1000, rows
+
+
+def check_startup(module: str = "steam_monitor", runs: int = 5, budget_ms: float = BUDGET_MS) -> Dict:
+    best_ms = None
+    best_rows: List[Tuple[str, int, int, int]] = []
+    for _ in range(runs):
+        elapsed_ms, rows = measure_import(module)
+        if best_ms is None or elapsed_ms < best_ms:
+            best_ms, best_rows = elapsed_ms, rows
+
+    imported = {name for name, _, _, _ in best_rows}
+    eager = [name for name in LAZY_MODULES if name in imported]
+    slowest = sorted((row for row in best_rows if row[3] == 1), key=lambda row: -row[2])[:10]
+
+    return {
+        'module': module,
+        'runs': runs,
+        'import_ms': round(best_ms or 0.0, 2),
+        'budget_ms': budget_ms,
+        'eager_imports': eager,
+        'slowest': [{'module': name, 'cumulative_ms': round(cumulative / 1000, 2)}
+                    for name, _, cumulative, _ in slowest],
+        'ok': (best_ms or 0.0) <= budget_ms and not eager,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Проверка времени запуска по -X importtime")
+    parser.add_argument("--module", default="steam_monitor")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--json", action="store_true", help="вывести результат в JSON")
+    args = parser.parse_args(argv)
+
+    report = check_startup(args.module, args.runs, args.budget_ms)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print("=" * 60)
+        print(f"Импорт {report['module']}: {report['import_ms']:.1f} мс (бюджет {report['budget_ms']:.0f} мс)")
+        print("=" * 60)
+        for row in report['slowest']:
+            print(f"  {row['module']:<24} {row['cumulative_ms']:>8.2f} мс")
+        if report['eager_imports']:
+            print(f"❌ Загружены без необходимости: {', '.join(report['eager_imports'])}")
+        print("✅ В пределах бюджета" if report['ok'] else "❌ Бюджет превышен")
+
+    return 0 if report['ok'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
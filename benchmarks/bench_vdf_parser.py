@@ -0,0 +1,118 @@
+"""
+Бенчмарк разбора appmanifest_*.acf
+Запуск: python -m benchmarks.bench_vdf_parser [--manifests N]
+"""
+
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from vdf_parser import load_manifest, parse_vdf
+
+MANIFEST_TEMPLATE = '''"AppState"
+{{
+\t"appid"\t\t"{app_id}"
+\t"Universe"\t\t"1"
+\t"name"\t\t"Synthetic Game {app_id}"
+\t"StateFlags"\t\t"{state_flags}"
+\t"installdir"\t\t"Synthetic Game {app_id}"
+\t"LastUpdated"\t\t"1701432600"
+\t"SizeOnDisk"\t\t"{size}"
+\t"StagingSize"\t\t"0"
+\t"buildid"\t\t"{build_id}"
+\t"LastOwner"\t\t"76561198000000000"
+\t"UpdateResult"\t\t"0"
+\t"BytesToDownload"\t\t"{to_download}"
+\t"BytesDownloaded"\t\t"{downloaded}"
+\t"BytesToStage"\t\t"{to_download}"
+\t"BytesStaged"\t\t"{downloaded}"
+\t"TargetBuildID"\t\t"{build_id}"
+\t"AutoUpdateBehavior"\t\t"0"
+\t"AllowOtherDownloadsWhileRunning"\t\t"0"
+\t"ScheduledAutoUpdate"\t\t"0"
+\t"InstalledDepots"
+\t{{
+{depots}\t}}
+\t"UserConfig"
+\t{{
+\t\t"language"\t\t"english"
+\t}}
+\t"MountedConfig"
+\t{{
+\t\t"language"\t\t"english"
+\t}}
+}}
+'''
+
+DEPOT_TEMPLATE = '''\t\t"{depot_id}"
+\t\t{{
+\t\t\t"manifest"\t\t"{manifest_id}"
+\t\t\t"size"\t\t"{size}"
+\t\t}}
+'''
+
+
+def make_manifest(app_id: int, rnd: random.Random, state_flags: Optional[int] = None) -> str:
+    """Текст синтетического appmanifest (state_flags=None - случайное состояние)"""
+    size = rnd.randint(10 ** 8, 10 ** 11)
+    to_download = rnd.randint(0, size)
+    depots = "".join(
+        DEPOT_TEMPLATE.format(depot_id=app_id + i, manifest_id=rnd.getrandbits(63),
+                              size=rnd.randint(10 ** 6, size))
+        for i in range(1, rnd.randint(2, 6))
+    )
+    return MANIFEST_TEMPLATE.format(
+        app_id=app_id, state_flags=state_flags or rnd.choice([4, 6, 1026, 1030]), size=size,
+        build_id=rnd.randint(10 ** 6, 10 ** 7), to_download=to_download,
+        downloaded=rnd.randint(0, to_download), depots=depots,
+    )
+
+
+def write_manifests(directory: Path, count: int, seed: int = 42) -> list:
+    """Записывает count манифестов в каталог"""
+    rnd = random.Random(seed)
+    paths = []
+    for i in range(count):
+        app_id = 10 + i * 10
+        path = directory / f"appmanifest_{app_id}.acf"
+        path.write_text(make_manifest(app_id, rnd), encoding='utf-8')
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк разбора appmanifest")
+    parser.add_argument("--manifests", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"Бенчмарк vdf_parser ({args.manifests} манифестов)")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_manifests(Path(tmp), args.manifests)
+        texts = [p.read_text(encoding='utf-8') for p in paths]
+
+        best_text = best_file = 0.0
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for text in texts:
+                parse_vdf(text, lower_keys=True)
+            best_text = max(best_text, len(texts) / (time.perf_counter() - start))
+
+            start = time.perf_counter()
+            for path in paths:
+                load_manifest(path)
+            best_file = max(best_file, len(paths) / (time.perf_counter() - start))
+
+    print(f"parse_vdf (в памяти):      {best_text:,.0f} манифестов/сек")
+    print(f"load_manifest (с диска):   {best_file:,.0f} манифестов/сек")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
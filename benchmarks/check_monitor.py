@@ -0,0 +1,154 @@
+"""
+Проверки поведения монитора на синтетической установке Steam
+Каждая проверка возвращает словарь с полем ok; код возврата 1, если хоть одна не прошла.
+Запуск: python -m benchmarks.check_monitor [--dir DIR] [--keep]
+"""
+
+import io
+import re
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import urllib.request
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.steam_fixture import SteamFixture, build_steam_root, default_fixture_dir
+from benchmarks.bench_monitor import _quiet_name_cache
+
+# Событие на диске должно вызвать проверку не позже этого (секунды) при интервале по умолчанию
+MAX_EVENT_LATENCY = 1.5
+
+# Строка образца в текстовом формате Prometheus: имя{метки} значение
+_SAMPLE_RE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[^}]*\})? [-+]?([0-9.eE+-]+|Inf|NaN)$')
+METRIC_FAMILIES = (
+    "steam_download_speed_bytes",
+    "steam_download_size_bytes",
+    "steam_download_status",
+    "steam_poll_duration_seconds",
+)
+
+
+def _wait_for(predicate: Callable[[], bool], timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+def check_event_wake(fixture: SteamFixture, base: Path) -> Dict:
+    """Новая папка в downloading вызывает проверку сразу, а не через --interval (60 сек)"""
+    from steam_monitor import RealSteamMonitor
+
+    if not sys.platform.startswith("linux"):
+        return {'ok': True, 'skipped': "inotify есть только на Linux"}
+
+    monitor = RealSteamMonitor(fixture.steam_path)
+    monitor.name_cache = _quiet_name_cache(base)
+    checks: List[float] = []
+    check_downloads = monitor.check_downloads
+
+    def timed_check(now=None):
+        checks.append(time.monotonic())
+        return check_downloads(now)
+
+    monitor.check_downloads = timed_check
+    thread = threading.Thread(target=monitor.monitor, daemon=True,
+                              kwargs=dict(interval=60, duration=0.1, backend="inotify", quiet=True))
+    thread.start()
+
+    _wait_for(lambda: len(checks) >= 1, 10)
+    # Наблюдатель должен уже ждать изменений
+    time.sleep(0.2)
+    changed_at = time.monotonic()
+    (fixture.downloading[0].parent / "999999").mkdir()
+    woke = _wait_for(lambda: len(checks) >= 2, 5)
+    thread.join()
+
+    latency = checks[1] - changed_at if woke else None
+    return {
+        'ok': latency is not None and latency <= MAX_EVENT_LATENCY,
+        'latency_s': round(latency, 3) if latency is not None else None,
+        'limit_s': MAX_EVENT_LATENCY,
+    }
+
+
+def check_metrics_endpoint(fixture: SteamFixture, base: Path) -> Dict:
+    """/metrics экспортера на свободном порту отдает загрузки из проверки в формате Prometheus"""
+    from steam_monitor import RealSteamMonitor
+    from metrics_exporter import CONTENT_TYPE, MetricsExporter
+
+    monitor = RealSteamMonitor(fixture.steam_path)
+    monitor.name_cache = _quiet_name_cache(base)
+    monitor.metrics = MetricsExporter(port=0)
+    monitor.metrics.start()
+    try:
+        downloads = monitor.check_downloads()
+        url = f"http://127.0.0.1:{monitor.metrics.port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            content_type = response.headers.get("Content-Type")
+            text = response.read().decode("utf-8")
+    finally:
+        monitor.metrics.close()
+        monitor.name_cache.close()
+
+    lines = [line for line in text.splitlines() if line and not line.startswith("#")]
+    malformed = [line for line in lines if not _SAMPLE_RE.match(line)]
+    missing = [name for name in METRIC_FAMILIES if f"# TYPE {name} " not in text]
+    apps = {d.app_id for d in downloads}
+    unexported = sorted(a for a in apps if f'steam_download_status{{app_id="{a}"' not in text)
+    return {
+        'ok': (content_type == CONTENT_TYPE and bool(apps) and not malformed
+               and not missing and not unexported and "steam_poll_duration_seconds_count 1" in text),
+        'downloads': len(apps),
+        'samples': len(lines),
+        'malformed': malformed[:5],
+        'missing_families': missing,
+        'unexported_apps': unexported[:5],
+    }
+
+
+CHECKS = {
+    'event_wake': check_event_wake,
+    'metrics_endpoint': check_metrics_endpoint,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Проверки монитора на синтетической установке Steam")
+    parser.add_argument("--dir", type=Path, default=None, help="где создавать установку (по умолчанию tmpfs)")
+    parser.add_argument("--keep", action="store_true", help="не удалять созданную установку")
+    args = parser.parse_args(argv)
+
+    # Сообщения мониторов не нужны в выводе проверок
+    logging.disable(logging.INFO)
+
+    results: Dict[str, Dict] = {}
+    for name, check in CHECKS.items():
+        base = Path(tempfile.mkdtemp(prefix=f"steam-check-{name}-", dir=args.dir or default_fixture_dir()))
+        try:
+            fixture = build_steam_root(base)
+            # Итоги монитора печатаются в stdout и испортили бы JSON
+            with redirect_stdout(io.StringIO()):
+                results[name] = check(fixture, base)
+        finally:
+            if args.keep:
+                print(f"Установка сохранена: {base}", file=sys.stderr)
+            else:
+                shutil.rmtree(base, ignore_errors=True)
+        print(f"{'✅' if results[name]['ok'] else '❌'} {name}", file=sys.stderr)
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    return 0 if all(r['ok'] for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
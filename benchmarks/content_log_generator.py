@@ -0,0 +1,73 @@
+"""
+Генератор синтетического content_log для бенчмарков
+Формат строк похож на настоящий лог Steam, часть строк - шум
+"""
+
+import random
+import argparse
+from pathlib import Path
+from typing import Iterator
+
+# Шаблоны строк о загрузке, разные формы AppID/скорости/прогресса
+DOWNLOAD_TEMPLATES = [
+    "[{ts}] Downloading app_id: {app} at {speed} MB/s ({pct}%)",
+    "[{ts}] AppID {app} download progress {pct}% rate {speed_kb} KB/s",
+    "[{ts}] download appid={app} {pct}% complete, {speed} mb/s",
+    "[{ts}] AppID {app} update started : download 0/{total}, store 0/{total}",
+]
+
+NOISE_TEMPLATES = [
+    "[{ts}] Created download interface of type 'SteamCache' for CDN server",
+    "[{ts}] HTTP (SteamCache,1234) - cache1-fra1.steamcontent.com (0.0.0.0:80 / 0.0.0.0:80, host: cache1-fra1)",
+    "[{ts}] AppID {app} state changed : Update Required,Update Queued,",
+    "[{ts}] AppID {app} scheduler finished : removed from schedule (result No Error, state 0xc)",
+    "[{ts}] Got {chunks} depot chunks from local cache, {missing} missing",
+]
+
+
+def generate_lines(count: int, download_ratio: float = 0.3, seed: int = 42) -> Iterator[str]:
+    """Отдает count строк синтетического лога"""
+    rnd = random.Random(seed)
+    apps = [str(rnd.randint(10, 2_000_000)) for _ in range(16)]
+
+    for i in range(count):
+        ts = f"2023-12-01 14:{(i // 60) % 60:02d}:{i % 60:02d}"
+        app = rnd.choice(apps)
+        templates = DOWNLOAD_TEMPLATES if rnd.random() < download_ratio else NOISE_TEMPLATES
+        yield rnd.choice(templates).format(
+            ts=ts,
+            app=app,
+            speed=f"{rnd.uniform(0.1, 120):.2f}",
+            speed_kb=f"{rnd.uniform(10, 900):.1f}",
+            pct=f"{rnd.uniform(0, 100):.1f}",
+            total=rnd.randint(10 ** 6, 10 ** 11),
+            chunks=rnd.randint(0, 5000),
+            missing=rnd.randint(0, 5000),
+        )
+
+
+def write_log(path: Path, count: int, download_ratio: float = 0.3, seed: int = 42) -> Path:
+    """Записывает синтетический лог в файл"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in generate_lines(count, download_ratio, seed):
+            f.write(line)
+            f.write("\n")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генератор синтетического content_log")
+    parser.add_argument("output", type=Path, help="куда записать лог")
+    parser.add_argument("--lines", type=int, default=100_000, help="число строк")
+    parser.add_argument("--download-ratio", type=float, default=0.3, help="доля строк о загрузке")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    write_log(args.output, args.lines, args.download_ratio, args.seed)
+    print(f"✅ Записано {args.lines} строк в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
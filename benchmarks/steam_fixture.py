@@ -0,0 +1,140 @@
+"""
+Генератор синтетической установки Steam для бенчмарков
+Библиотеки, appmanifest, папки downloading с чанками и большой разреженный content_log
+Запуск: python -m benchmarks.steam_fixture OUTPUT [--libraries N] [--manifests N] ...
+"""
+
+import os
+import random
+import argparse
+import tempfile
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+from benchmarks.bench_vdf_parser import make_manifest
+from benchmarks.content_log_generator import generate_lines
+
+# StateFlags загрузки: UpdateRequired | Downloading
+DOWNLOADING_FLAGS = 1026
+
+LIBRARYFOLDERS_HEADER = '"libraryfolders"\n{\n'
+LIBRARY_TEMPLATE = '''\t"{index}"
+\t{{
+\t\t"path"\t\t"{path}"
+\t\t"label"\t\t""
+\t\t"contentid"\t\t"{content_id}"
+\t}}
+'''
+
+
+class SteamFixture(NamedTuple):
+    """Пути созданной установки"""
+    steam_path: Path
+    libraries: List[Path]
+    manifests: List[Path]
+    downloading: List[Path]
+    content_log: Path
+
+
+def default_fixture_dir() -> Path:
+    """tmpfs, если он есть (/dev/shm), иначе обычный временный каталог"""
+    shm = Path("/dev/shm")
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        return shm
+    return Path(tempfile.gettempdir())
+
+
+def _write_chunks(folder: Path, chunks: int, chunk_size: int, rnd: random.Random):
+    """Папка загрузки: чанки по подкаталогам депо, файлы разреженные"""
+    for i in range(chunks):
+        depot = folder / f"depot_{i % 4}"
+        depot.mkdir(parents=True, exist_ok=True)
+        with open(depot / f"chunk_{i:06d}.bin", 'wb') as f:
+            f.truncate(rnd.randint(chunk_size // 2, chunk_size))
+
+
+def _write_content_log(path: Path, lines: int, sparse_bytes: int, seed: int):
+    """content_log: разреженная "дыра" заданного размера, за ней настоящие строки"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        if sparse_bytes > 0:
+            f.seek(sparse_bytes)
+            f.write(b"\n")
+        for line in generate_lines(lines, seed=seed):
+            f.write(line.encode('utf-8'))
+            f.write(b"\n")
+
+
+def build_steam_root(base: Path, libraries: int = 1, manifests: int = 50,
+                     downloading: int = 2, chunks: int = 20, chunk_size: int = 1024 * 1024,
+                     log_lines: int = 1000, log_sparse_bytes: int = 0,
+                     seed: int = 42) -> SteamFixture:
+    """
+    Создает в base каталог steam/ (основная библиотека) и library1..N-1.
+    manifests и downloading - на каждую библиотеку.
+    """
+    rnd = random.Random(seed)
+    base = Path(base)
+    steam_path = base / "steam"
+    library_roots = [steam_path] + [base / f"library{i}" for i in range(1, libraries)]
+
+    all_manifests: List[Path] = []
+    all_downloading: List[Path] = []
+    app_id = 10
+
+    for library in library_roots:
+        steamapps = library / "steamapps"
+        (steamapps / "common").mkdir(parents=True, exist_ok=True)
+        (steamapps / "downloading").mkdir(exist_ok=True)
+
+        for i in range(manifests):
+            state_flags = DOWNLOADING_FLAGS if i < downloading else None
+            manifest = steamapps / f"appmanifest_{app_id}.acf"
+            manifest.write_text(make_manifest(app_id, rnd, state_flags), encoding='utf-8')
+            all_manifests.append(manifest)
+
+            if i < downloading:
+                folder = steamapps / "downloading" / str(app_id)
+                _write_chunks(folder, chunks, chunk_size, rnd)
+                all_downloading.append(folder)
+            app_id += 10
+
+    vdf = [LIBRARYFOLDERS_HEADER]
+    for index, library in enumerate(library_roots):
+        vdf.append(LIBRARY_TEMPLATE.format(index=index, path=library.as_posix(),
+                                           content_id=rnd.getrandbits(62)))
+    vdf.append("}\n")
+    (steam_path / "steamapps" / "libraryfolders.vdf").write_text("".join(vdf), encoding='utf-8')
+
+    content_log = steam_path / "logs" / "content_log.txt"
+    _write_content_log(content_log, log_lines, log_sparse_bytes, seed)
+
+    return SteamFixture(steam_path, library_roots, all_manifests, all_downloading, content_log)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Генератор синтетической установки Steam")
+    parser.add_argument("output", type=Path, nargs="?", help="каталог (по умолчанию во временном на tmpfs)")
+    parser.add_argument("--libraries", type=int, default=1, help="число библиотек")
+    parser.add_argument("--manifests", type=int, default=50, help="appmanifest на библиотеку")
+    parser.add_argument("--downloading", type=int, default=2, help="активных загрузок на библиотеку")
+    parser.add_argument("--chunks", type=int, default=20, help="файлов в папке загрузки")
+    parser.add_argument("--chunk-size", type=int, default=1024 * 1024, help="размер чанка (байт)")
+    parser.add_argument("--log-lines", type=int, default=1000, help="строк в content_log")
+    parser.add_argument("--log-size-gb", type=float, default=0.0, help="разреженный размер content_log (ГБ)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    output = args.output or Path(tempfile.mkdtemp(prefix="steam-fixture-", dir=default_fixture_dir()))
+    fixture = build_steam_root(
+        output, libraries=args.libraries, manifests=args.manifests,
+        downloading=args.downloading, chunks=args.chunks, chunk_size=args.chunk_size,
+        log_lines=args.log_lines, log_sparse_bytes=int(args.log_size_gb * 1024 ** 3), seed=args.seed,
+    )
+    print(f"✅ Steam: {fixture.steam_path}")
+    print(f"   Библиотек: {len(fixture.libraries)}, манифестов: {len(fixture.manifests)}, "
+          f"загрузок: {len(fixture.downloading)}")
+
+
+if __name__ == "__main__":
+    main()
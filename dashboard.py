@@ -0,0 +1,183 @@
+"""
+Живая панель загрузок в терминале
+Перерисовываются только изменившиеся участки строк (ANSI-адресация курсора),
+кадр уходит в терминал одной записью, отрисовка идет в своем потоке.
+"""
+
+import sys
+import shutil
+import threading
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, TextIO
+
+from eta import format_eta
+
+# Кадров в секунду по умолчанию
+DEFAULT_FPS = 4.0
+
+_ESC = "\x1b["
+ENTER_SCREEN = _ESC + "?1049h" + _ESC + "?25l"
+LEAVE_SCREEN = _ESC + "?25h" + _ESC + "?1049l"
+CLEAR_LINE = _ESC + "K"
+
+BAR_WIDTH = 20
+
+
+def _move(row: int, col: int) -> str:
+    """Курсор в строку row, столбец col (с единицы)"""
+    return f"{_ESC}{row};{col}H"
+
+
+def _fit(text: str, width: int) -> str:
+    """Обрезает или дополняет строку пробелами до ширины"""
+    if len(text) > width:
+        return text[:max(0, width - 1)] + "…"
+    return text.ljust(width)
+
+
+def diff_frame(previous: Sequence[str], current: Sequence[str]) -> str:
+    """
+    Escape-последовательности, превращающие кадр previous в current.
+    Строки одной ширины; в измененной строке переписывается участок от первого
+    до последнего отличающегося символа.
+    """
+    out: List[str] = []
+    for row, line in enumerate(current, 1):
+        old = previous[row - 1] if row - 1 < len(previous) else None
+        if old == line:
+            continue
+        if old is None or len(old) != len(line):
+            out.append(_move(row, 1) + line + CLEAR_LINE)
+            continue
+
+        start = 0
+        while line[start] == old[start]:
+            start += 1
+        end = len(line)
+        while line[end - 1] == old[end - 1]:
+            end -= 1
+        out.append(_move(row, start + 1) + line[start:end])
+
+    for row in range(len(current) + 1, len(previous) + 1):
+        out.append(_move(row, 1) + CLEAR_LINE)
+    return "".join(out)
+
+
+def _default_speed(speed_mb: float) -> str:
+    if speed_mb >= 1:
+        return f"{speed_mb:.2f} MB/s"
+    if speed_mb >= 0.001:
+        return f"{speed_mb * 1024:.1f} KB/s"
+    return "0 B/s"
+
+
+class Dashboard:
+    """Принимает снимки загрузок и рисует последний из них с заданной частотой"""
+
+    def __init__(self, stream: Optional[TextIO] = None, fps: float = DEFAULT_FPS,
+                 format_speed: Callable[[float], str] = _default_speed, title: str = "Steam Download Monitor"):
+        self.stream = stream or sys.stdout
+        self.interval = 1.0 / fps if fps > 0 else 1.0 / DEFAULT_FPS
+        self.format_speed = format_speed
+        self.title = title
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._snapshot = None
+        self._version = 0
+        self._thread: Optional[threading.Thread] = None
+        self._frame: List[str] = []
+        self._size = None
+        self.frames = 0
+
+    def submit(self, update_count: int, downloads: Sequence, queue_eta: Optional[float] = None):
+        """Запоминает новый снимок; не блокируется на выводе в терминал"""
+        with self._lock:
+            self._snapshot = (update_count, list(downloads), queue_eta, datetime.now())
+            self._version += 1
+
+    def build_frame(self, width: int, height: int) -> List[str]:
+        """Строки кадра ровно по ширине терминала"""
+        with self._lock:
+            snapshot = self._snapshot
+        lines = []
+        if snapshot is None:
+            lines.append(_fit(f" {self.title} - ожидание первой проверки...", width))
+            return lines
+
+        update_count, downloads, queue_eta, at = snapshot
+        header = f" {self.title}  {at.strftime('%H:%M:%S')}  обновление #{update_count}"
+        if queue_eta:
+            header += f"  очередь: {format_eta(queue_eta)}"
+        lines.append(_fit(header, width))
+        lines.append("-" * width)
+
+        name_width = max(10, width - 78)
+        lines.append(_fit(f" {'AppID':<9}{'Игра':<{name_width}} {'Статус':<12}{'Скорость':>12}  "
+                          f"{'Прогресс':<{BAR_WIDTH + 9}}{'Осталось':>12}", width))
+
+        for dl in downloads[:max(0, height - 5)]:
+            bars = min(BAR_WIDTH, int(dl.progress / 100 * BAR_WIDTH))
+            progress = f"[{'#' * bars}{'.' * (BAR_WIDTH - bars)}] {dl.progress:5.1f}%"
+            eta = getattr(dl, 'eta_seconds', None)
+            lines.append(_fit(
+                f" {dl.app_id:<9}{_fit(dl.game_name, name_width)} {dl.status:<12}"
+                f"{self.format_speed(dl.speed_mbps):>12}  {progress:<{BAR_WIDTH + 9}}"
+                f"{format_eta(eta) if eta else '-':>12}",
+                width
+            ))
+        if not downloads:
+            lines.append(_fit(" Активных загрузок не обнаружено", width))
+        elif len(downloads) > max(0, height - 5):
+            lines.append(_fit(f" ... и еще {len(downloads) - max(0, height - 5)}", width))
+
+        lines.append("-" * width)
+        return lines[:height]
+
+    def render(self) -> str:
+        """Собирает кадр и возвращает изменения относительно предыдущего"""
+        size = shutil.get_terminal_size()
+        if size != self._size:
+            # Новый размер - перерисовываем экран целиком
+            self._size = size
+            self._frame = []
+            prefix = _ESC + "2J"
+        else:
+            prefix = ""
+        frame = self.build_frame(size.columns - 1, size.lines)
+        output = prefix + diff_frame(self._frame, frame)
+        self._frame = frame
+        return output
+
+    def _write(self, data: str):
+        if data:
+            self.stream.write(data)
+            self.stream.flush()
+
+    def _run(self):
+        drawn = -1
+        while not self._stop.is_set():
+            version = self._version
+            if version != drawn or shutil.get_terminal_size() != self._size:
+                self._write(self.render())
+                self.frames += 1
+                drawn = version
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self):
+        """Переключает терминал на отдельный экран и запускает поток отрисовки"""
+        if self._thread is None:
+            self._write(ENTER_SCREEN)
+            self._thread = threading.Thread(target=self._run, name="dashboard", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Останавливает отрисовку и возвращает обычный экран терминала"""
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+            self._write(LEAVE_SCREEN)
@@ -0,0 +1,111 @@
+"""
+Состояния загрузки Steam
+Машина состояний на каждую загрузку + классификация по StateFlags appmanifest
+"""
+
+import logging
+from datetime import datetime
+from typing import Optional
+
+from vdf_parser import AppManifest
+from activity import ACTIVE
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+DOWNLOADING = "downloading"
+PAUSED = "paused"
+VERIFYING = "verifying"
+COMPLETED = "completed"
+
+STATES = (QUEUED, DOWNLOADING, PAUSED, VERIFYING, COMPLETED)
+
+# Ниже этой скорости загрузка считается остановленной (MB/s)
+PAUSED_SPEED_MBPS = 0.01
+
+# Биты StateFlags из appmanifest
+FLAG_UPDATE_REQUIRED = 2
+FLAG_FULLY_INSTALLED = 4
+FLAG_UPDATE_RUNNING = 256
+FLAG_UPDATE_PAUSED = 512
+FLAG_UPDATE_STARTED = 1024
+FLAG_VALIDATING = 131072
+FLAG_PREALLOCATING = 524288
+FLAG_DOWNLOADING = 1048576
+FLAG_STAGING = 2097152
+FLAG_COMMITTING = 4194304
+
+_ACTIVE_FLAGS = (FLAG_UPDATE_RUNNING | FLAG_UPDATE_STARTED | FLAG_PREALLOCATING |
+                 FLAG_DOWNLOADING | FLAG_STAGING | FLAG_COMMITTING)
+
+# Допустимые переходы: завершается только загрузка или проверка,
+# завершенная игра возвращается через очередь, загрузку или проверку (обновление)
+TRANSITIONS = {
+    QUEUED: {DOWNLOADING, PAUSED, VERIFYING},
+    DOWNLOADING: {QUEUED, PAUSED, VERIFYING, COMPLETED},
+    PAUSED: {QUEUED, DOWNLOADING, VERIFYING},
+    VERIFYING: {QUEUED, DOWNLOADING, PAUSED, COMPLETED},
+    COMPLETED: {QUEUED, DOWNLOADING, VERIFYING},
+}
+# Сколько проверок подряд нужно увидеть переход не из TRANSITIONS: промежуточное
+# состояние могло пройти между проверками, а одиночное наблюдение - быть сбоем
+CONFIRM_CHECKS = 2
+
+
+def is_pending(manifest: AppManifest) -> bool:
+    """Есть ли у игры незавершенная загрузка/обновление"""
+    return manifest.state_flags not in (0, FLAG_FULLY_INSTALLED)
+
+
+def classify(manifest: Optional[AppManifest], speed_mbps: float, activity: Optional[str] = None) -> str:
+    """Определяет состояние по StateFlags, текущей скорости и записи в папку downloading"""
+    if manifest is not None:
+        flags = manifest.state_flags
+        if flags & FLAG_VALIDATING:
+            return VERIFYING
+        if flags & FLAG_UPDATE_PAUSED:
+            return PAUSED
+        if not flags & _ACTIVE_FLAGS:
+            if flags & FLAG_UPDATE_REQUIRED:
+                return QUEUED
+            if flags & FLAG_FULLY_INSTALLED:
+                return COMPLETED
+
+    if speed_mbps >= PAUSED_SPEED_MBPS:
+        return DOWNLOADING
+    # Счетчики еще не показали скорость, но Steam пишет в папку загрузки
+    return DOWNLOADING if activity == ACTIVE else PAUSED
+
+
+class DownloadStateMachine:
+    """Состояние одной загрузки"""
+
+    __slots__ = ('app_id', 'state', 'previous', 'changed_at', 'pending', 'pending_count')
+
+    def __init__(self, app_id: str, state: str = QUEUED):
+        self.app_id = app_id
+        self.state = state
+        self.previous: Optional[str] = None
+        self.changed_at = datetime.now()
+        # Состояние, в которое просится недопустимый переход, и сколько раз подряд
+        self.pending: Optional[str] = None
+        self.pending_count = 0
+
+    def update(self, state: str) -> bool:
+        """Переводит загрузку в новое состояние. Возвращает True при смене"""
+        if state == self.state:
+            self.pending = None
+            return False
+        if state not in TRANSITIONS[self.state]:
+            self.pending_count = self.pending_count + 1 if state == self.pending else 1
+            self.pending = state
+            if self.pending_count < CONFIRM_CHECKS:
+                logger.debug(f"Недопустимый переход {self.app_id}: {self.state} -> {state}")
+                return False
+
+        self.pending = None
+
+        self.previous = self.state
+        self.state = state
+        self.changed_at = datetime.now()
+        return True
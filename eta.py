@@ -0,0 +1,171 @@
+"""
+Прогноз времени до завершения загрузок
+Скорость - наклон регрессии BytesDownloaded по времени в скользящем окне
+(суммы пересчитываются за O(1) на измерение); в очереди сначала активные
+загрузки, затем ожидающие.
+"""
+
+from collections import deque
+from typing import Dict, Iterable, NamedTuple, Optional
+
+# Окно регрессии (секунды) и максимум точек в нем
+WINDOW_SECONDS = 300.0
+MAX_SAMPLES = 240
+
+# Загрузки, которые Steam докачает без участия пользователя
+ACTIVE_STATUSES = ("downloading", "verifying")
+QUEUE_STATUSES = ("downloading", "verifying", "queued")
+
+_MB = 1024 * 1024
+
+
+class QueueEta(NamedTuple):
+    eta_seconds: Optional[float]     # вся очередь, None - неизвестно
+    remaining_bytes: int
+    throughput_bps: float            # суммарная скорость активных загрузок (байт/сек)
+    per_app: Dict[str, Optional[float]]
+
+
+class _Track:
+    """Точки (t, bytes) в окне и суммы для метода наименьших квадратов"""
+
+    __slots__ = ('points', 't0', 'b0', 'last', 'st', 'sb', 'stt', 'stb')
+
+    def __init__(self, t0: float, b0: int):
+        self.points: deque = deque()
+        # Начало координат; сдвигается вслед за окном, чтобы суммы не теряли точность
+        self.t0 = t0
+        self.b0 = b0
+        self.last = b0
+        self.st = self.sb = self.stt = self.stb = 0.0
+
+    def add(self, t: float, b: int, window: float, max_samples: int):
+        x, y = t - self.t0, float(b - self.b0)
+        self.last = b
+        self.points.append((x, y))
+        self.st += x
+        self.sb += y
+        self.stt += x * x
+        self.stb += x * y
+
+        oldest = x - window
+        points = self.points
+        while len(points) > max_samples or (len(points) > 2 and points[0][0] < oldest):
+            px, py = points.popleft()
+            self.st -= px
+            self.sb -= py
+            self.stt -= px * px
+            self.stb -= px * py
+
+        if points[0][0] > window:
+            self._rebase()
+
+    def _rebase(self):
+        """Переносит начало координат в первую точку окна (раз в окно, O(n))"""
+        dx, dy = self.points[0]
+        self.t0 += dx
+        self.b0 += int(dy)
+        self.points = deque((x - dx, y - dy) for x, y in self.points)
+        self.st = sum(x for x, _ in self.points)
+        self.sb = sum(y for _, y in self.points)
+        self.stt = sum(x * x for x, _ in self.points)
+        self.stb = sum(x * y for x, y in self.points)
+
+    def slope(self) -> float:
+        """Байт в секунду по точкам окна (0, если точек мало)"""
+        n = len(self.points)
+        if n < 2:
+            return 0.0
+        denominator = n * self.stt - self.st * self.st
+        if denominator <= 1e-9:
+            return 0.0
+        return (n * self.stb - self.st * self.sb) / denominator
+
+
+class EtaForecaster:
+    """Обновляется после каждой проверки и считает ETA по каждой игре и по всей очереди"""
+
+    def __init__(self, window: Optional[float] = None, max_samples: Optional[int] = None):
+        # Пороги по умолчанию читаются при создании, чтобы их можно было подменить (replay --set)
+        self.window = WINDOW_SECONDS if window is None else window
+        self.max_samples = MAX_SAMPLES if max_samples is None else max_samples
+        self._tracks: Dict[str, _Track] = {}
+        self.last: QueueEta = QueueEta(None, 0, 0.0, {})
+
+    def _add(self, app_id: str, now: float, downloaded: int):
+        track = self._tracks.get(app_id)
+        if track is None or downloaded < track.last:
+            # Новая загрузка или сброс счетчика (проверка файлов, новое обновление)
+            track = self._tracks[app_id] = _Track(now, downloaded)
+        track.add(now, downloaded, self.window, self.max_samples)
+
+    def rate(self, app_id: str) -> float:
+        """Скорость по регрессии (байт/сек)"""
+        track = self._tracks.get(app_id)
+        return max(0.0, track.slope()) if track is not None else 0.0
+
+    def update(self, downloads: Iterable, now: float) -> QueueEta:
+        """
+        downloads - объекты с app_id, status, downloaded_bytes, total_bytes, speed_mbps
+        в любом порядке. now - time.monotonic().
+        """
+        downloads = list(downloads)
+        seen = set()
+        for d in downloads:
+            seen.add(d.app_id)
+            if d.total_bytes > 0:
+                self._add(d.app_id, now, d.downloaded_bytes)
+        for app_id in [a for a in self._tracks if a not in seen]:
+            del self._tracks[app_id]
+
+        per_app: Dict[str, Optional[float]] = {}
+        throughput = 0.0
+        active_rates: Dict[str, float] = {}
+        for d in downloads:
+            if d.status in ACTIVE_STATUSES:
+                # Регрессия по байтам; пока точек мало - сглаженная скорость
+                rate = self.rate(d.app_id) or d.speed_mbps * _MB
+                active_rates[d.app_id] = rate
+                throughput += rate
+
+        # Steam качает по очереди: загрузка из очереди начнется, когда закончатся активные
+        # и стоящие перед ней. Настоящего порядка очереди в appmanifest нет, поэтому
+        # сначала идут активные, затем ожидающие в порядке списка (sorted устойчив)
+        remaining_total = 0
+        for d in sorted(downloads, key=lambda d: d.status not in ACTIVE_STATUSES):
+            if d.status == "completed":
+                per_app[d.app_id] = 0.0
+                continue
+            if d.status not in QUEUE_STATUSES or d.total_bytes <= 0:
+                per_app[d.app_id] = None
+                continue
+
+            remaining = max(0, d.total_bytes - d.downloaded_bytes)
+            remaining_total += remaining
+            if d.app_id in active_rates and active_rates[d.app_id] > 0:
+                per_app[d.app_id] = remaining / active_rates[d.app_id]
+            elif throughput > 0:
+                per_app[d.app_id] = remaining_total / throughput
+            else:
+                per_app[d.app_id] = None
+
+        queue_eta = remaining_total / throughput if throughput > 0 else (0.0 if not remaining_total else None)
+        self.last = QueueEta(queue_eta, remaining_total, throughput, per_app)
+        return self.last
+
+
+def format_eta(seconds: Optional[float]) -> str:
+    """12 сек / 5 мин / 1 ч 05 мин / 2 д 3 ч"""
+    if seconds is None:
+        return "неизвестно"
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} сек"
+    minutes = seconds // 60
+    if minutes < 60:
+        return f"{minutes} мин"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours} ч {minutes:02d} мин"
+    days, hours = divmod(hours, 24)
+    return f"{days} д {hours} ч"
@@ -0,0 +1,487 @@
+"""
+Сбор загрузок с нескольких машин
+Агент отправляет коллектору только изменившиеся поля загрузок (NDJSON по TCP
+или Unix-сокету), коллектор сводит машины в общую картину и хранит историю каждой.
+Запуск коллектора: python fleet.py --listen tcp://127.0.0.1:9421
+Агенты не проходят аутентификацию, имя машины (поле h) сообщает сам агент:
+любой, кто может подключиться, может подменить данные любой машины. Поэтому
+по умолчанию коллектор слушает только 127.0.0.1; для других машин - доверенная
+сеть, SSH-туннель или unix-сокет с правами доступа.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import threading
+import socketserver
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from eta import format_eta
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 9421
+# Изменения за это время (секунды) уходят одним сообщением
+BATCH_INTERVAL = 1.0
+# Пустое сообщение, если изменений не было столько секунд
+HEARTBEAT_INTERVAL = 30.0
+# Машина без сообщений дольше этого считается недоступной
+STALE_AFTER = 3 * HEARTBEAT_INTERVAL
+# Точек в истории каждой машины
+HISTORY_SIZE = 720
+# Максимальная пауза между попытками подключиться к коллектору (секунды)
+RECONNECT_MAX = 60.0
+CONNECT_TIMEOUT = 5.0
+# Коллектор, который перестал читать, не должен вешать агент и остановку монитора
+SEND_TIMEOUT = 10.0
+
+# Поле загрузки -> (ключ в сообщении, знаков после запятой).
+# Округление убирает дрожание скорости и ETA, которое не видно в выводе
+FIELDS = {
+    'game_name': ('n', None),
+    'status': ('s', None),
+    'speed_mbps': ('v', 2),
+    'progress': ('p', 1),
+    'downloaded_bytes': ('b', None),
+    'total_bytes': ('t', None),
+    'speed_confidence': ('c', 2),
+    'eta_seconds': ('e', 0),
+}
+
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def parse_address(address: str) -> Tuple[int, Any]:
+    """'unix:/path', 'tcp://host:port', 'host:port', ':port' или 'host' -> (семейство, адрес)"""
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):].replace("//", "/", 1)
+    if address.startswith("tcp://"):
+        address = address[len("tcp://"):]
+    if ":" in address:
+        host, _, port = address.rpartition(":")
+    else:
+        host, port = address, ""
+    return socket.AF_INET, (host.strip("[]") or "127.0.0.1", int(port or DEFAULT_PORT))
+
+
+def encode_download(download) -> Dict[str, Any]:
+    """Поля загрузки в компактном виде для отправки"""
+    record = {}
+    for attr, (key, digits) in FIELDS.items():
+        value = getattr(download, attr, None)
+        if value is not None and digits is not None:
+            value = round(value, digits) if digits else int(round(value))
+        record[key] = value
+    return record
+
+
+def diff_snapshot(previous: Dict[str, Dict], current: Dict[str, Dict]) -> Tuple[Dict[str, Dict], List[str]]:
+    """(измененные поля по AppID, исчезнувшие AppID)"""
+    changed = {}
+    for app_id, record in current.items():
+        old = previous.get(app_id)
+        if old is None:
+            changed[app_id] = record
+            continue
+        delta = {key: value for key, value in record.items() if old.get(key) != value}
+        if delta:
+            changed[app_id] = delta
+    removed = [app_id for app_id in previous if app_id not in current]
+    return changed, removed
+
+
+class FleetAgent:
+    """
+    Отправляет коллектору изменения загрузок этой машины.
+    submit() только запоминает последний снимок; отправка идет в своем потоке,
+    поэтому недоступный коллектор не задерживает проверки.
+    """
+
+    def __init__(self, address: str, host: Optional[str] = None,
+                 batch_interval: float = BATCH_INTERVAL, heartbeat: float = HEARTBEAT_INTERVAL):
+        self.address = address
+        self.family, self.sockaddr = parse_address(address)
+        self.host = host or socket.gethostname()
+        self.batch_interval = batch_interval
+        self.heartbeat = heartbeat
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._current: Optional[Dict[str, Dict]] = None
+        # Что знает коллектор; None - после подключения нужен полный снимок
+        self._sent: Optional[Dict[str, Dict]] = None
+        self._sock: Optional[socket.socket] = None
+        self._seq = 0
+        self._last_sent = 0.0
+        self._online = True
+
+        self.messages_sent = 0
+        self.bytes_sent = 0
+
+    def submit(self, downloads: Iterable):
+        """Запоминает загрузки после проверки"""
+        snapshot = {d.app_id: encode_download(d) for d in downloads}
+        with self._lock:
+            self._current = snapshot
+        self._wake.set()
+
+    def _connect(self) -> socket.socket:
+        if self.family == socket.AF_UNIX:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(CONNECT_TIMEOUT)
+            try:
+                sock.connect(self.sockaddr)
+            except OSError:
+                sock.close()
+                raise
+        else:
+            sock = socket.create_connection(self.sockaddr, CONNECT_TIMEOUT)
+        sock.settimeout(SEND_TIMEOUT)
+        return sock
+
+    def _disconnect(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+        self._sent = None
+
+    def _message(self, current: Dict[str, Dict], now: float) -> Optional[Dict]:
+        """Сообщение для коллектора или None, если отправлять нечего"""
+        if self._sent is None:
+            return {'h': self.host, 'full': 1, 'set': current}
+        changed, removed = diff_snapshot(self._sent, current)
+        if not changed and not removed and now - self._last_sent < self.heartbeat:
+            return None
+        message: Dict[str, Any] = {'h': self.host}
+        if changed:
+            message['set'] = changed
+        if removed:
+            message['del'] = removed
+        return message
+
+    def flush(self) -> bool:
+        """Отправляет изменения с прошлой отправки; False - коллектор недоступен"""
+        with self._lock:
+            current = self._current
+        if current is None:
+            return True
+        now = time.monotonic()
+        message = self._message(current, now)
+        if message is None:
+            return True
+
+        self._seq += 1
+        message['q'] = self._seq
+        message['ts'] = round(time.time(), 3)
+        data = (_dumps(message) + "\n").encode("utf-8")
+        try:
+            if self._sock is None:
+                self._sock = self._connect()
+                if not self._online:
+                    logger.info(f"🔗 Коллектор {self.address} снова доступен")
+                self._online = True
+            self._sock.sendall(data)
+        except OSError as e:
+            if self._online:
+                logger.warning(f"Коллектор {self.address} недоступен: {e}")
+            self._online = False
+            self._disconnect()
+            return False
+
+        self._sent = current
+        self._last_sent = now
+        self.messages_sent += 1
+        self.bytes_sent += len(data)
+        return True
+
+    def _run(self):
+        backoff = 1.0
+        retry_at = 0.0
+        while not self._stop.is_set():
+            self._wake.wait(self.heartbeat)
+            self._wake.clear()
+            # Проверки, закончившиеся за batch_interval, уходят одним сообщением
+            if self._stop.wait(self.batch_interval) or time.monotonic() < retry_at:
+                continue
+            if self.flush():
+                backoff = 1.0
+            else:
+                retry_at = time.monotonic() + backoff
+                backoff = min(backoff * 2, RECONNECT_MAX)
+
+        if self._sock is not None:
+            self.flush()
+        self._disconnect()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="fleet-agent", daemon=True)
+            self._thread.start()
+            logger.info(f"📡 Отправка загрузок на {self.address} как {self.host}")
+
+    def close(self, timeout: float = SEND_TIMEOUT + 1):
+        """Отправляет последние изменения и закрывает соединение (не дольше timeout секунд)"""
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning(f"Коллектор {self.address} не принял последние изменения")
+            self._thread = None
+
+
+class HostSample(NamedTuple):
+    timestamp: float     # time.time() на агенте
+    speed_mbps: float    # суммарная скорость машины
+    active: int          # загрузок в статусе downloading
+
+
+class FleetRow(NamedTuple):
+    host: str
+    app_id: str
+    game_name: str
+    status: str
+    speed_mbps: float
+    progress: float
+    downloaded_bytes: int
+    total_bytes: int
+    speed_confidence: float
+    eta_seconds: Optional[float]
+    online: bool
+
+
+class HostState:
+    """Загрузки одной машины и кольцевой буфер ее истории"""
+
+    __slots__ = ('host', 'downloads', 'synced', 'connected', 'last_seen', 'seq', 'history')
+
+    def __init__(self, host: str, history_size: int):
+        self.host = host
+        self.downloads: Dict[str, Dict] = {}
+        # Получен полный снимок в текущем соединении
+        self.synced = False
+        self.connected = False
+        self.last_seen = 0.0
+        self.seq = 0
+        self.history: Deque[HostSample] = deque(maxlen=history_size)
+
+    def apply(self, message: Dict) -> bool:
+        if message.get('full'):
+            self.downloads = {app_id: dict(record) for app_id, record in message.get('set', {}).items()}
+            self.synced = True
+        elif not self.synced:
+            # Изменения без начального снимка применить не к чему
+            return False
+        else:
+            for app_id, delta in message.get('set', {}).items():
+                self.downloads.setdefault(app_id, {}).update(delta)
+            for app_id in message.get('del', ()):
+                self.downloads.pop(app_id, None)
+
+        self.connected = True
+        self.last_seen = time.monotonic()
+        self.seq = message.get('q', self.seq)
+        speed = sum(r.get('v') or 0.0 for r in self.downloads.values() if r.get('s') == "downloading")
+        active = sum(1 for r in self.downloads.values() if r.get('s') == "downloading")
+        self.history.append(HostSample(message.get('ts') or time.time(), round(speed, 3), active))
+        return True
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        collector: "FleetCollector" = self.server.collector
+        hosts = set()
+        collector.connected(self.request)
+        try:
+            for line in self.rfile:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Некорректное сообщение от {self.client_address}")
+                    continue
+                if isinstance(message, dict) and collector.apply(message):
+                    hosts.add(message['h'])
+        except OSError:
+            pass
+        collector.disconnected(hosts, self.request)
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "UnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+class FleetCollector:
+    """Принимает сообщения агентов и сводит загрузки всех машин"""
+
+    def __init__(self, address: str = f":{DEFAULT_PORT}", history_size: int = HISTORY_SIZE,
+                 stale_after: float = STALE_AFTER):
+        self.address = address
+        self.family, self.sockaddr = parse_address(address)
+        self.history_size = history_size
+        self.stale_after = stale_after
+        self.hosts: Dict[str, HostState] = {}
+
+        self._lock = threading.Lock()
+        self._server: Optional[socketserver.BaseServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._connections = set()
+
+    def apply(self, message: Dict) -> bool:
+        """Применяет сообщение агента; False - сообщение пропущено"""
+        host = message.get('h')
+        if not host:
+            return False
+        with self._lock:
+            state = self.hosts.get(host)
+            if state is None:
+                state = self.hosts[host] = HostState(host, self.history_size)
+            return state.apply(message)
+
+    def connected(self, sock: socket.socket):
+        with self._lock:
+            self._connections.add(sock)
+
+    def disconnected(self, hosts: Iterable[str], sock: Optional[socket.socket] = None):
+        """Соединение закрыто: после переподключения агент пришлет полный снимок"""
+        with self._lock:
+            self._connections.discard(sock)
+            for host in hosts:
+                state = self.hosts.get(host)
+                if state is not None:
+                    state.synced = state.connected = False
+
+    def _online(self, state: HostState, now: float) -> bool:
+        return state.connected and now - state.last_seen < self.stale_after
+
+    def view(self) -> List[FleetRow]:
+        """Загрузки всех машин: машина, затем AppID"""
+        now = time.monotonic()
+        rows = []
+        with self._lock:
+            for host in sorted(self.hosts):
+                state = self.hosts[host]
+                online = self._online(state, now)
+                for app_id in sorted(state.downloads):
+                    r = state.downloads[app_id]
+                    rows.append(FleetRow(
+                        host, app_id, r.get('n') or app_id, r.get('s') or "unknown",
+                        r.get('v') or 0.0, r.get('p') or 0.0, r.get('b') or 0, r.get('t') or 0,
+                        r.get('c') or 0.0, r.get('e'), online
+                    ))
+        return rows
+
+    def history(self, host: str) -> List[HostSample]:
+        """История машины, от старых точек к новым"""
+        with self._lock:
+            state = self.hosts.get(host)
+            return list(state.history) if state is not None else []
+
+    def format_view(self) -> List[str]:
+        """Сводка по машинам и их загрузкам для вывода в консоль"""
+        rows = self.view()
+        now = time.monotonic()
+        lines = []
+        with self._lock:
+            hosts = [(host, self._online(state, now)) for host, state in sorted(self.hosts.items())]
+        for host, online in hosts:
+            host_rows = [r for r in rows if r.host == host]
+            speed = sum(r.speed_mbps for r in host_rows if r.status == "downloading")
+            state_text = "на связи" if online else "нет связи"
+            lines.append(f"🖥  {host} ({state_text}): {len(host_rows)} загрузок, {speed:.2f} MB/s")
+            for r in host_rows:
+                eta = f", осталось {format_eta(r.eta_seconds)}" if r.eta_seconds else ""
+                lines.append(f"   {r.app_id:<9} {r.game_name[:30]:<30} {r.status:<12} "
+                             f"{r.speed_mbps:>8.2f} MB/s {r.progress:5.1f}%{eta}")
+        if not hosts:
+            lines.append("ℹ️  Агенты еще не подключались")
+        return lines
+
+    def start(self):
+        """Запускает прием соединений в фоновом потоке"""
+        if self.family == socket.AF_UNIX:
+            if not hasattr(socketserver, "UnixStreamServer"):
+                raise OSError("Unix-сокеты недоступны на этой платформе")
+            if os.path.exists(self.sockaddr):
+                # Сокет от прошлого запуска
+                os.unlink(self.sockaddr)
+            self._server = _UnixServer(self.sockaddr, _Handler)
+        else:
+            self._server = _TCPServer(self.sockaddr, _Handler)
+        self._server.collector = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fleet-collector", daemon=True)
+        self._thread.start()
+        logger.info(f"📡 Коллектор слушает {self.bound_address}")
+
+    @property
+    def bound_address(self) -> str:
+        """Фактический адрес (при порте 0 выбирается свободный)"""
+        if self._server is None:
+            return self.address
+        if self.family == socket.AF_UNIX:
+            return f"unix:{self.sockaddr}"
+        host, port = self._server.server_address[:2]
+        return f"tcp://{host}:{port}"
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            # Агенты должны заметить остановку и переподключиться к новому коллектору
+            with self._lock:
+                connections = list(self._connections)
+            for sock in connections:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            if self.family == socket.AF_UNIX and os.path.exists(self.sockaddr):
+                os.unlink(self.sockaddr)
+            self._server = None
+
+
+def main(argv: Optional[List[str]] = None):
+    """Коллектор: принимает агентов (steam_monitor.py --agent ADDRESS) и печатает сводку"""
+    parser = argparse.ArgumentParser(description="Сводка загрузок Steam с нескольких машин")
+    parser.add_argument("--listen", default=f"127.0.0.1:{DEFAULT_PORT}",
+                        help=f"tcp://HOST:PORT или unix:PATH (по умолчанию 127.0.0.1:{DEFAULT_PORT}); "
+                             "агенты не проходят аутентификацию, слушайте только доверенную сеть")
+    parser.add_argument("--interval", type=float, default=10,
+                        help="как часто печатать сводку, сек (по умолчанию 10)")
+    parser.add_argument("--history-size", type=int, default=HISTORY_SIZE,
+                        help=f"точек истории на машину (по умолчанию {HISTORY_SIZE})")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    collector = FleetCollector(args.listen, history_size=args.history_size)
+    collector.start()
+    try:
+        while True:
+            time.sleep(args.interval)
+            print(f"\n📊 Сводка {time.strftime('%H:%M:%S')}")
+            print("-" * 70)
+            for line in collector.format_view():
+                print(line)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        collector.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
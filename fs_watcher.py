@@ -0,0 +1,230 @@
+"""
+Ожидание изменений в файлах Steam между проверками
+На Linux - inotify (через ctypes), иначе - обычный sleep
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Сколько ждать после первого события, собирая остальные в одну пачку
+DEBOUNCE_SECONDS = 0.5
+
+# Флаги inotify из <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_CREATE | IN_DELETE |
+              IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF)
+# Появление, удаление и перемещение; запись в файлы чанков сюда не входит
+STRUCTURE_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """Запасной вариант: просто ждет до следующего опроса"""
+
+    backend = "polling"
+
+    def wait(self, timeout: float) -> bool:
+        """Ждет timeout секунд. Возвращает True, если были изменения"""
+        if timeout > 0:
+            time.sleep(timeout)
+        return False
+
+    async def wait_async(self, timeout: float) -> bool:
+        """То же для asyncio: не блокирует цикл событий"""
+        import asyncio
+        if timeout > 0:
+            await asyncio.sleep(timeout)
+        return False
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Просыпается сразу, как только Steam что-то изменил на диске"""
+
+    backend = "inotify"
+
+    def __init__(self, steamapps_dirs: Iterable[Path], logs_dir: Optional[Path] = None,
+                 debounce: float = DEBOUNCE_SECONDS):
+        import ctypes
+
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.debounce = debounce
+
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+        # wd -> (путь, тип каталога)
+        self._watches: Dict[int, tuple] = {}
+
+        for steamapps in steamapps_dirs:
+            self._add_watch(Path(steamapps), "steamapps")
+            self._add_watch(Path(steamapps) / "downloading", "downloading", STRUCTURE_MASK)
+        if logs_dir is not None:
+            self._add_watch(Path(logs_dir), "logs")
+
+    def _add_watch(self, path: Path, kind: str, mask: int = WATCH_MASK) -> bool:
+        if not path.is_dir():
+            return False
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            logger.debug(f"inotify не смог следить за {path}: {os.strerror(self._get_errno())}")
+            return False
+        self._watches[wd] = (path, kind)
+        return True
+
+    @staticmethod
+    def _get_errno() -> int:
+        import ctypes
+        return ctypes.get_errno()
+
+    def _is_relevant(self, kind: str, mask: int, name: str) -> bool:
+        """
+        Отсеивает события, которые не влияют на состояние загрузок.
+        В downloading важны только появление и удаление папок загрузок:
+        запись чанков и строк лога идет непрерывно, ее скорость меряется по расписанию
+        """
+        if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF):
+            return True
+        if kind == "downloading":
+            return bool(mask & STRUCTURE_MASK)
+        if kind == "steamapps":
+            return name.startswith("appmanifest_") or name == "libraryfolders.vdf" or name == "downloading"
+        if kind == "logs":
+            # Дозапись в лог прочитается плановой проверкой; будит только новый файл (ротация)
+            return "content_log" in name and bool(mask & STRUCTURE_MASK)
+        return False
+
+    def drain(self) -> bool:
+        """Читает накопленные события, возвращает True если есть значимые"""
+        relevant = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            if not data:
+                break
+
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].split(b"\0", 1)[0].decode("utf-8", errors="ignore")
+                offset += length
+
+                if mask & IN_IGNORED:
+                    self._watches.pop(wd, None)
+                    continue
+
+                path, kind = self._watches.get(wd, (None, ""))
+                if mask & IN_Q_OVERFLOW:
+                    relevant = True
+                    continue
+                if path is None:
+                    continue
+
+                if (mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO)
+                        and kind == "steamapps" and name == "downloading"):
+                    self._add_watch(path / name, "downloading", STRUCTURE_MASK)
+
+                if self._is_relevant(kind, mask, name):
+                    relevant = True
+
+        return relevant
+
+    def wait(self, timeout: float) -> bool:
+        """Ждет изменений не дольше timeout секунд. Возвращает True, если они были"""
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return False
+
+            # Собираем пачку событий, чтобы не просыпаться на каждый чанк
+            if self.debounce > 0:
+                time.sleep(min(self.debounce, max(0.0, deadline - time.monotonic())))
+            if self.drain():
+                return True
+
+    async def wait_async(self, timeout: float) -> bool:
+        """То же для asyncio: дескриптор inotify слушается через add_reader"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(0.0, timeout)
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+
+            ready = asyncio.Event()
+            loop.add_reader(self.fd, ready.set)
+            try:
+                await asyncio.wait_for(ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                loop.remove_reader(self.fd)
+
+            if self.debounce > 0:
+                await asyncio.sleep(min(self.debounce, max(0.0, deadline - loop.time())))
+            if self.drain():
+                return True
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def create_watcher(steamapps_dirs: Iterable[Path], logs_dir: Optional[Path] = None,
+                   backend: str = "auto"):
+    """Создает наблюдатель: inotify на Linux (auto/inotify), иначе опрос"""
+    if backend == "polling":
+        return PollingWatcher()
+
+    if sys.platform.startswith("linux"):
+        try:
+            watcher = InotifyWatcher(steamapps_dirs, logs_dir)
+            logger.info("👀 Отслеживание изменений через inotify")
+            return watcher
+        except Exception as e:
+            logger.warning(f"inotify недоступен, используется опрос: {e}")
+    elif backend == "inotify":
+        logger.warning("inotify доступен только на Linux, используется опрос")
+
+    return PollingWatcher()
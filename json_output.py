@@ -0,0 +1,78 @@
+"""
+Вывод загрузок в формате JSON Lines (--format jsonl)
+Одна строка на загрузку в каждой проверке; время в миллисекундах epoch, скорость в байтах/сек.
+Пишется напрямую в stdout или файл, минуя logging.
+"""
+
+import os
+import sys
+import json
+import time
+from typing import BinaryIO, Iterable, Optional
+
+# Размер буфера файла вывода (байты)
+BUFFER_SIZE = 64 * 1024
+
+_MB = 1024 * 1024
+
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+class JsonLinesWriter:
+    """Пишет каждую проверку одной записью в буферизованный поток"""
+
+    def __init__(self, path: Optional[str] = None, buffer_size: int = BUFFER_SIZE):
+        self.path = path or None
+        if self.path:
+            self._stream: BinaryIO = open(self.path, "ab", buffering=buffer_size)
+        else:
+            self._stream = sys.stdout.buffer
+        self.records = 0
+        self.broken = False
+
+    @property
+    def to_stdout(self) -> bool:
+        return self.path is None
+
+    def write(self, downloads: Iterable, sample: int = 0, timestamp: Optional[float] = None):
+        """Записывает загрузки одной проверки (timestamp - time.time(), по умолчанию сейчас)"""
+        ts_ms = int((time.time() if timestamp is None else timestamp) * 1000)
+        lines = []
+        for d in downloads:
+            eta = d.eta_seconds
+            lines.append(_encode({
+                'ts_ms': ts_ms,
+                'sample': sample,
+                'app_id': d.app_id,
+                'game_name': d.game_name,
+                'status': d.status,
+                'speed_bytes_per_sec': int(d.speed_mbps * _MB),
+                'speed_confidence': d.speed_confidence,
+                'progress': d.progress,
+                'downloaded_bytes': d.downloaded_bytes,
+                'total_bytes': d.total_bytes,
+                'eta_seconds': round(eta, 1) if eta is not None else None,
+                'activity': d.activity,
+                'last_update_ms': int(d.last_update.timestamp() * 1000),
+                'library_path': str(d.library_path) if d.library_path is not None else None,
+            }))
+        if lines and not self.broken:
+            lines.append("")
+            try:
+                self._stream.write("\n".join(lines).encode("utf-8"))
+                # Потребитель на другом конце pipe должен видеть проверку сразу
+                self._stream.flush()
+            except BrokenPipeError:
+                # Потребитель закрыл pipe (например, head); дальше писать некуда
+                self.broken = True
+                if self.to_stdout:
+                    # Иначе интерпретатор снова упадет при сбросе stdout на выходе
+                    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+                raise
+            self.records += len(lines) - 1
+
+    def close(self):
+        if self.path:
+            self._stream.close()
+        elif not self.broken:
+            self._stream.flush()
@@ -0,0 +1,65 @@
+"""
+Реестр библиотек Steam
+Читает libraryfolders.vdf один раз и перечитывает только при его изменении
+"""
+
+import os
+import logging
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from vdf_parser import load_vdf, library_paths
+
+logger = logging.getLogger(__name__)
+
+
+class LibraryRegistry:
+    """Список библиотек Steam с инвалидацией по mtime/размеру libraryfolders.vdf"""
+
+    def __init__(self, steam_path: Path):
+        self.steam_path = Path(steam_path)
+        self.library_file = self.steam_path / "steamapps" / "libraryfolders.vdf"
+
+        # Все библиотеки из VDF, доступность не проверяется
+        self.libraries: List[Path] = [self.steam_path]
+        self._signature: Optional[Tuple[float, int]] = None
+        self._available: Optional[List[Path]] = None
+
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """Перечитывает VDF, если он изменился. Возвращает True при перечитывании"""
+        try:
+            st = os.stat(self.library_file)
+            signature = (st.st_mtime, st.st_size)
+        except OSError:
+            signature = None
+
+        if signature == self._signature and self._signature is not None:
+            return False
+
+        self._signature = signature
+        self.libraries = self._parse() if signature else [self.steam_path]
+        self._available = None
+        logger.debug(f"Библиотеки Steam: {[str(p) for p in self.libraries]}")
+        return True
+
+    def _parse(self) -> List[Path]:
+        """Разбирает libraryfolders.vdf"""
+        libraries = [self.steam_path]
+        try:
+            for path in library_paths(load_vdf(self.library_file)):
+                lib_path = Path(path)
+                if lib_path not in libraries:
+                    libraries.append(lib_path)
+        except Exception as e:
+            logger.error(f"Ошибка чтения libraryfolders.vdf: {e}")
+
+        return libraries
+
+    @property
+    def available(self) -> List[Path]:
+        """Существующие библиотеки; диски проверяются один раз до следующего изменения VDF"""
+        if self._available is None:
+            self._available = [p for p in self.libraries if p == self.steam_path or p.exists()]
+        return self._available
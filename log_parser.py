@@ -0,0 +1,62 @@
+"""
+Разбор строк content_log Steam
+Один проход предкомпилированным выражением по строке
+"""
+
+import re
+from typing import NamedTuple, Optional
+
+
+class LogRecord(NamedTuple):
+    """Запись о загрузке из одной строки лога"""
+    app_id: str
+    speed_mbps: Optional[float]  # None если в строке нет скорости
+    progress: float  # 0-100, 0.0 если в строке нет процентов
+
+
+# Быстрый фильтр: строки без слова download не разбираем вовсе
+_DOWNLOAD_RE = re.compile(r'download', re.IGNORECASE)
+
+# Все интересующие поля одним выражением, порядок в строке любой
+_FIELDS_RE = re.compile(
+    r'app[_\s]?id[\s:=]+(?P<app>\d+)'
+    r'|(?P<speed>\d+(?:\.\d+)?)\s*(?P<unit>[KMG]?B)/s'
+    r'|(?P<pct>\d+(?:\.\d+)?)%',
+    re.IGNORECASE
+)
+
+# Множитель перевода единицы скорости в MB/s
+_UNIT_TO_MB = {
+    'B': 1 / (1024 * 1024),
+    'KB': 1 / 1024,
+    'MB': 1.0,
+    'GB': 1024.0,
+}
+
+
+def parse_line(line: str) -> Optional[LogRecord]:
+    """Разбирает строку лога, None если в ней нет загрузки с AppID"""
+    if _DOWNLOAD_RE.search(line) is None:
+        return None
+
+    app_id = None
+    speed = None
+    progress = None
+
+    for match in _FIELDS_RE.finditer(line):
+        group = match.lastgroup
+        if group == 'app':
+            if app_id is None:
+                app_id = match.group('app')
+        elif group == 'unit':
+            # Единица берется из самого совпадения, а не из всей строки
+            if speed is None:
+                speed = float(match.group('speed')) * _UNIT_TO_MB[match.group('unit').upper()]
+        elif group == 'pct':
+            if progress is None:
+                progress = float(match.group('pct'))
+
+    if app_id is None:
+        return None
+
+    return LogRecord(app_id, speed, progress or 0.0)
@@ -0,0 +1,137 @@
+"""
+Инкрементальное чтение content_log Steam
+Запоминает inode, начало и смещение текущего лога и читает только новые байты
+"""
+
+import os
+import logging
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+# Сколько байт с конца файла читать при первом открытии лога: старые строки
+# выглядели бы как свежие события, поэтому по умолчанию чтение идет с конца файла
+INITIAL_TAIL_BYTES = 0
+# Сколько байт с начала файла сравнивать, чтобы заметить перезапись того же файла
+FINGERPRINT_BYTES = 64
+# Размер блока чтения
+READ_CHUNK_SIZE = 1024 * 1024
+# Steam пишет logs/content_log.txt; .log - для совместимости с прежним разбором
+LOG_SUFFIXES = (".txt", ".log")
+
+
+class ContentLogTailer:
+    """Следит за самым свежим content_log*.txt/.log, как `tail -F`"""
+
+    def __init__(self, logs_path: Path, parse_line: Callable[[str], Optional[Any]],
+                 initial_tail_bytes: int = INITIAL_TAIL_BYTES):
+        self.logs_path = Path(logs_path)
+        self.parse_line = parse_line
+        self.initial_tail_bytes = initial_tail_bytes
+
+        self.current_path: Optional[Path] = None
+        self.file_id: Optional[tuple] = None  # (st_dev, st_ino)
+        self.offset = 0
+        self._partial = b""
+        # Первые байты файла: усеченный и дописанный заново лог может вырасти
+        # больше прежнего смещения, и по размеру это не видно
+        self._fingerprint = b""
+        # Первая строка обрезана (чтение началось с середины файла)
+        self._skip_first = False
+
+    def _find_latest_log(self) -> Optional[Path]:
+        """Находит самый свежий content_log"""
+        latest = None
+        latest_mtime = -1.0
+        try:
+            with os.scandir(self.logs_path) as it:
+                for entry in it:
+                    name = entry.name
+                    if not name.startswith("content_log") or not name.endswith(LOG_SUFFIXES):
+                        continue
+                    try:
+                        mtime = entry.stat().st_mtime
+                    except OSError:
+                        continue
+                    if mtime > latest_mtime:
+                        latest, latest_mtime = Path(entry.path), mtime
+        except OSError:
+            return None
+        return latest
+
+    def _reset(self, path: Path, st: os.stat_result, from_start: bool):
+        """Переключается на новый файл лога"""
+        self.current_path = path
+        self.file_id = (st.st_dev, st.st_ino)
+        self._partial = b""
+        self._fingerprint = b""
+        if from_start:
+            self.offset = 0
+        else:
+            self.offset = max(0, st.st_size - self.initial_tail_bytes)
+        self._skip_first = self.offset > 0
+
+    def read_lines(self) -> Iterator[str]:
+        """Отдает только строки, дописанные с прошлого вызова"""
+        latest = self._find_latest_log()
+        if latest is None:
+            return
+
+        try:
+            st = latest.stat()
+        except OSError:
+            return
+
+        if self.current_path is None:
+            # Первое открытие - читаем только хвост файла (по умолчанию - только новые строки)
+            self._reset(latest, st, from_start=False)
+        elif latest != self.current_path or (st.st_dev, st.st_ino) != self.file_id:
+            # Ротация: появился новый файл, читаем его с начала
+            logger.debug(f"Ротация лога: {self.current_path} -> {latest}")
+            self._reset(latest, st, from_start=True)
+        elif st.st_size < self.offset:
+            # Файл усечен
+            logger.debug(f"Лог усечен: {latest}")
+            self._reset(latest, st, from_start=True)
+
+        with open(latest, "rb") as f:
+            prefix = f.read(FINGERPRINT_BYTES)
+            if prefix[:len(self._fingerprint)] != self._fingerprint:
+                # Тот же файл записан заново с начала
+                logger.debug(f"Лог перезаписан: {latest}")
+                self._reset(latest, st, from_start=True)
+            self._fingerprint = prefix
+
+            if self._skip_first and not self._partial:
+                # Строка обрезана, только если перед смещением нет перевода строки
+                f.seek(self.offset - 1)
+                self._skip_first = f.read(1) != b"\n"
+            if st.st_size == self.offset:
+                return
+
+            f.seek(self.offset)
+            while True:
+                chunk = f.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.offset += len(chunk)
+
+                lines = (self._partial + chunk).split(b"\n")
+                # Последний кусок может быть недописанной строкой
+                self._partial = lines.pop()
+
+                if self._skip_first and lines:
+                    # При старте с середины файла первая строка обрезана
+                    lines.pop(0)
+                    self._skip_first = False
+
+                for raw in lines:
+                    yield raw.decode("utf-8", errors="ignore").rstrip("\r")
+
+    def read_events(self) -> Iterator[Any]:
+        """Генератор разобранных событий из новых строк лога"""
+        for line in self.read_lines():
+            event = self.parse_line(line)
+            if event is not None:
+                yield event
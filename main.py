@@ -1,18 +1,10 @@
-from steam_monitor import SteamDownloadMonitor
+"""
+Точка входа Steam Download Monitor
+python main.py [параметры] - то же, что команда steam-download-monitor
+"""
 
-
-def main():
-    print("=" * 60)
-    print("Steam Download Monitor v2.0")
-    print("Отслеживание скорости загрузки игр")
-    print("=" * 60)
-
-    monitor = SteamDownloadMonitor()
-    monitor.start_monitoring(
-        update_interval=60,  # секунды
-        duration_minutes=5  # минут
-    )
+from steam_monitor import main
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
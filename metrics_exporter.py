@@ -0,0 +1,223 @@
+"""
+Экспорт метрик загрузок в формате Prometheus
+Страница /metrics собирается после каждой проверки, запрос только отдает готовые байты
+"""
+
+import time
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы гистограммы длительности проверки (секунды)
+POLL_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STATUSES = ("queued", "downloading", "paused", "verifying", "completed")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+class PollHistogram:
+    """Гистограмма с фиксированными корзинами"""
+
+    def __init__(self, buckets: Tuple[float, ...] = POLL_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def render(self, name: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum {self.sum}")
+        lines.append(f"{name}_count {self.count}")
+        return lines
+
+
+class MetricsExporter:
+    """HTTP-эндпоинт /metrics со снимком последней проверки"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9420):
+        self.host = host
+        self.requested_port = port
+
+        self.completed_total = 0
+        self.bytes_transferred_total = 0
+        self.poll_duration = PollHistogram()
+        self.queue_eta_seconds: Optional[float] = None
+
+        self._last_status: Dict[str, str] = {}
+        self._last_bytes: Dict[str, int] = {}
+        self._payload = self._render([])
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        """Фактический порт (при port=0 выбирается свободный)"""
+        if self._server is not None:
+            return self._server.server_address[1]
+        return self.requested_port
+
+    def update(self, downloads: Iterable, poll_seconds: Optional[float] = None,
+               queue_eta_seconds: Optional[float] = None):
+        """Обновляет счетчики и пересобирает страницу (вызывается после проверки)"""
+        downloads = list(downloads)
+        self.queue_eta_seconds = queue_eta_seconds
+        if poll_seconds is not None:
+            self.poll_duration.observe(poll_seconds)
+
+        last_status: Dict[str, str] = {}
+        last_bytes: Dict[str, int] = {}
+        for d in downloads:
+            previous = self._last_status.get(d.app_id)
+            if d.status == "completed" and previous is not None and previous != "completed":
+                self.completed_total += 1
+            last_status[d.app_id] = d.status
+
+            previous_bytes = self._last_bytes.get(d.app_id)
+            if previous_bytes is not None and d.downloaded_bytes > previous_bytes:
+                self.bytes_transferred_total += d.downloaded_bytes - previous_bytes
+            last_bytes[d.app_id] = d.downloaded_bytes
+        # Только загрузки из снимка: завершенные и удаленные игры не копятся
+        self._last_status, self._last_bytes = last_status, last_bytes
+
+        self._payload = self._render(downloads)
+
+    def _render(self, downloads: List) -> bytes:
+        lines = [
+            "# HELP steam_download_speed_bytes Current download speed in bytes per second.",
+            "# TYPE steam_download_speed_bytes gauge",
+        ]
+        for d in downloads:
+            lines.append(f"steam_download_speed_bytes{_labels(app_id=d.app_id, game=d.game_name)} "
+                         f"{d.speed_mbps * 1024 * 1024:.0f}")
+
+        lines += [
+            "# HELP steam_download_speed_confidence Confidence of the speed estimate from 0 to 1.",
+            "# TYPE steam_download_speed_confidence gauge",
+        ]
+        for d in downloads:
+            lines.append(f"steam_download_speed_confidence{_labels(app_id=d.app_id)} "
+                         f"{getattr(d, 'speed_confidence', 0.0):.2f}")
+
+        lines += [
+            "# HELP steam_download_progress_ratio Download progress from 0 to 1.",
+            "# TYPE steam_download_progress_ratio gauge",
+        ]
+        for d in downloads:
+            lines.append(f"steam_download_progress_ratio{_labels(app_id=d.app_id)} {d.progress / 100:.4f}")
+
+        lines += [
+            "# HELP steam_download_bytes_downloaded Bytes downloaded so far.",
+            "# TYPE steam_download_bytes_downloaded gauge",
+        ]
+        for d in downloads:
+            lines.append(f"steam_download_bytes_downloaded{_labels(app_id=d.app_id)} {d.downloaded_bytes}")
+
+        lines += [
+            "# HELP steam_download_size_bytes Total bytes to download.",
+            "# TYPE steam_download_size_bytes gauge",
+        ]
+        for d in downloads:
+            lines.append(f"steam_download_size_bytes{_labels(app_id=d.app_id)} {d.total_bytes}")
+
+        lines += [
+            "# HELP steam_download_eta_seconds Forecast seconds until the download completes.",
+            "# TYPE steam_download_eta_seconds gauge",
+        ]
+        for d in downloads:
+            eta = getattr(d, 'eta_seconds', None)
+            if eta is not None:
+                lines.append(f"steam_download_eta_seconds{_labels(app_id=d.app_id)} {eta:.0f}")
+        if self.queue_eta_seconds is not None:
+            lines += [
+                "# HELP steam_queue_eta_seconds Forecast seconds until the whole download queue completes.",
+                "# TYPE steam_queue_eta_seconds gauge",
+                f"steam_queue_eta_seconds {self.queue_eta_seconds:.0f}",
+            ]
+
+        lines += [
+            "# HELP steam_download_status Current download state (1 for the active state).",
+            "# TYPE steam_download_status gauge",
+        ]
+        for d in downloads:
+            for status in STATUSES:
+                value = 1 if d.status == status else 0
+                lines.append(f"steam_download_status{_labels(app_id=d.app_id, status=status)} {value}")
+
+        lines += [
+            "# HELP steam_downloads_completed_total Downloads that reached the completed state.",
+            "# TYPE steam_downloads_completed_total counter",
+            f"steam_downloads_completed_total {self.completed_total}",
+            "# HELP steam_download_bytes_transferred_total Bytes downloaded while monitored.",
+            "# TYPE steam_download_bytes_transferred_total counter",
+            f"steam_download_bytes_transferred_total {self.bytes_transferred_total}",
+            "# HELP steam_poll_duration_seconds Duration of one download check.",
+            "# TYPE steam_poll_duration_seconds histogram",
+        ]
+        lines += self.poll_duration.render("steam_poll_duration_seconds")
+        lines += [
+            "# HELP steam_monitor_last_update_seconds Unix time of the snapshot.",
+            "# TYPE steam_monitor_last_update_seconds gauge",
+            f"steam_monitor_last_update_seconds {time.time():.3f}",
+        ]
+
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def render(self) -> bytes:
+        """Текущая страница метрик"""
+        return self._payload
+
+    def start(self):
+        """Запускает HTTP-сервер в фоновом потоке"""
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                payload = exporter.render()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                logger.debug(f"metrics: {format % args}")
+
+        self._server = ThreadingHTTPServer((self.host, self.requested_port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True)
+        self._thread.start()
+        logger.info(f"📈 Метрики: http://{self.host}:{self.port}/metrics")
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,212 @@
+"""
+Кэш названий игр по AppID
+Память (LRU) + JSON-файл в пользовательском кэше, сетевой запрос в фоне
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+
+from vdf_parser import load_manifest
+
+logger = logging.getLogger(__name__)
+
+STORE_API_URL = "https://store.steampowered.com/api/appdetails?appids={app_id}"
+
+# Таймаут запроса к Store API (секунды)
+LOOKUP_TIMEOUT = 5.0
+# Сколько не повторять неудачный запрос (секунды)
+NEGATIVE_TTL = 6 * 60 * 60
+# Размер LRU в памяти
+MEMORY_SIZE = 512
+
+
+def default_cache_dir() -> Path:
+    """Каталог пользовательского кэша для текущей ОС"""
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~/AppData/Local")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return Path(base) / "steam-download-monitor"
+
+
+def parse_store_response(app_id: str, data: Dict) -> Optional[str]:
+    """Достает название из ответа appdetails"""
+    entry = data.get(app_id) or {}
+    if entry.get('success'):
+        return entry['data']['name']
+    return None
+
+
+def fetch_store_name(app_id: str, timeout: float = LOOKUP_TIMEOUT) -> Optional[str]:
+    """Синхронный запрос названия в Store API"""
+    try:
+        import requests
+        response = requests.get(STORE_API_URL.format(app_id=app_id), timeout=timeout)
+        if response.status_code == 200:
+            return parse_store_response(app_id, response.json())
+    except Exception as e:
+        logger.debug(f"Store API недоступен для {app_id}: {e}")
+    return None
+
+
+class GameNameCache:
+    """Разрешает AppID в название один раз за процесс и помнит его между запусками"""
+
+    def __init__(self, cache_file: Optional[Path] = None,
+                 lookup_timeout: float = LOOKUP_TIMEOUT,
+                 negative_ttl: float = NEGATIVE_TTL,
+                 memory_size: int = MEMORY_SIZE,
+                 use_network: bool = True,
+                 lookup_handler: Optional[Callable[[str], None]] = None):
+        self.cache_file = Path(cache_file) if cache_file else default_cache_dir() / "game_names.json"
+        self.lookup_timeout = lookup_timeout
+        self.negative_ttl = negative_ttl
+        self.memory_size = memory_size
+        self.use_network = use_network
+        self.lookup_handler = lookup_handler
+
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._disk: Dict[str, Dict] = self._load()
+        self._pending = set()
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _load(self) -> Dict[str, Dict]:
+        """Загружает дисковый кэш"""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                return data
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Кэш названий поврежден, начинаем заново: {e}")
+        return {}
+
+    def _remember(self, app_id: str, name: str):
+        """Кладет название в LRU"""
+        self._memory[app_id] = name
+        self._memory.move_to_end(app_id)
+        if len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _from_disk(self, app_id: str) -> Optional[str]:
+        """Берет название с диска, если запись еще актуальна"""
+        entry = self._disk.get(app_id)
+        if not entry or not entry.get('name'):
+            return None
+
+        manifest = entry.get('manifest')
+        if manifest:
+            # Запись из appmanifest действительна, пока не изменился сам файл
+            try:
+                if os.stat(manifest).st_mtime != entry.get('mtime'):
+                    return None
+            except OSError:
+                return None
+
+        return entry['name']
+
+    def get_name(self, app_id: str,
+                 manifests: Callable[[], Iterable[Path]]) -> Optional[str]:
+        """
+        Возвращает название игры или None, если оно пока неизвестно.
+        manifests вызывается только при промахе кэша.
+        """
+        with self._lock:
+            name = self._memory.get(app_id)
+            if name is not None:
+                self._memory.move_to_end(app_id)
+                return name
+
+            name = self._from_disk(app_id)
+            if name is not None:
+                self._remember(app_id, name)
+                return name
+
+        for manifest in manifests():
+            try:
+                mtime = manifest.stat().st_mtime
+                name = load_manifest(manifest).name
+            except (OSError, ValueError):
+                continue
+            if name:
+                with self._lock:
+                    self._remember(app_id, name)
+                    self._disk[app_id] = {'name': name, 'manifest': str(manifest), 'mtime': mtime}
+                    self._dirty = True
+                return name
+
+        self._schedule_lookup(app_id)
+        return None
+
+    def _schedule_lookup(self, app_id: str):
+        """Ставит запрос к Store API в фон, если он не запрещен отрицательным кэшем"""
+        if not self.use_network:
+            return
+
+        with self._lock:
+            if app_id in self._pending:
+                return
+            entry = self._disk.get(app_id)
+            if entry and entry.get('name') is None:
+                if time.time() - entry.get('checked', 0) < self.negative_ttl:
+                    return
+
+            self._pending.add(app_id)
+            handler = self.lookup_handler
+            if handler is None and self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="name-lookup")
+
+        if handler is not None:
+            # Запрос выполняет внешний клиент (например, асинхронный движок)
+            handler(app_id)
+        else:
+            self._executor.submit(self._lookup, app_id)
+
+    def _lookup(self, app_id: str):
+        """Запрашивает название в Store API (выполняется в фоне)"""
+        self.set_lookup_result(app_id, fetch_store_name(app_id, self.lookup_timeout))
+
+    def set_lookup_result(self, app_id: str, name: Optional[str]):
+        """Сохраняет результат сетевого запроса (None - запомнить неудачу)"""
+        with self._lock:
+            self._pending.discard(app_id)
+            if name:
+                self._remember(app_id, name)
+                self._disk[app_id] = {'name': name, 'manifest': None, 'mtime': None}
+            else:
+                self._disk[app_id] = {'name': None, 'checked': time.time()}
+            self._dirty = True
+
+    def flush(self):
+        """Сохраняет дисковый кэш, если были изменения"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = dict(self._disk)
+            self._dirty = False
+
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix(".tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить кэш названий: {e}")
+
+    def close(self):
+        """Сохраняет кэш и останавливает фоновые запросы"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self.flush()
@@ -0,0 +1,304 @@
+"""
+Уведомления о загрузках
+Детектор находит переходы (завершена, застряла, медленно, возобновилась) после каждой
+проверки; доставка идет в своем потоке через ограниченную очередь со слиянием событий
+и лимитом частоты, поэтому проверки не ждут ни notify-send, ни вебхук.
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+import subprocess
+import urllib.request
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+COMPLETED = "completed"
+STALLED = "stalled"
+SLOW = "slow"
+RESUMED = "resumed"
+
+# Без прогресса столько минут - загрузка застряла
+STALL_MINUTES = 10.0
+# Статусы, в которых загрузка может застрять
+STALL_STATUSES = ("downloading", "verifying")
+# Сколько секунд скорость должна быть ниже порога, чтобы уведомить
+SLOW_FOR = 60.0
+# Пауза короче этого (секунды) не считается: статус колеблется около порога скорости
+RESUME_AFTER = 60.0
+# Скорость с меньшей достоверностью не сравнивается с порогом
+MIN_CONFIDENCE = 0.5
+
+# Максимум ожидающих уведомлений; при переполнении выбрасываются самые старые
+QUEUE_SIZE = 100
+# События за это время (секунды) уходят одним уведомлением
+COALESCE_SECONDS = 2.0
+# Лимит частоты: до BURST уведомлений подряд, дальше одно в REFILL_SECONDS
+BURST = 3
+REFILL_SECONDS = 20.0
+SINK_TIMEOUT = 10.0
+
+TITLE = "Steam Download Monitor"
+
+
+class Notification(NamedTuple):
+    kind: str         # completed, stalled, slow, resumed
+    app_id: str
+    game_name: str
+    message: str
+    timestamp: float  # time.time()
+
+
+class _AppWatch:
+    __slots__ = ('status', 'downloaded', 'advanced_at', 'active_seen', 'paused_since',
+                 'slow_since', 'stalled', 'slow')
+
+    def __init__(self, status: str, downloaded: int, now: float):
+        self.status = status
+        self.downloaded = downloaded
+        self.advanced_at = now
+        # Без этого флага застрявшей считалась бы загрузка, стоявшая на паузе до запуска монитора
+        self.active_seen = status == "downloading"
+        self.paused_since: Optional[float] = now if status == "paused" else None
+        self.slow_since: Optional[float] = None
+        self.stalled = False
+        self.slow = False
+
+
+class TransitionDetector:
+    """Сравнивает проверки и возвращает события по каждой загрузке"""
+
+    def __init__(self, stall_after: float = STALL_MINUTES * 60, slow_mbps: Optional[float] = None,
+                 slow_for: float = SLOW_FOR):
+        self.stall_after = stall_after
+        self.slow_mbps = slow_mbps
+        self.slow_for = slow_for
+        self._apps: Dict[str, _AppWatch] = {}
+
+    def update(self, downloads: Iterable, now: float) -> List[Notification]:
+        """downloads - результат проверки, now - time.monotonic()"""
+        events: List[Notification] = []
+        seen = set()
+        for d in downloads:
+            seen.add(d.app_id)
+            watch = self._apps.get(d.app_id)
+            if watch is None:
+                self._apps[d.app_id] = _AppWatch(d.status, d.downloaded_bytes, now)
+                continue
+            self._check(watch, d, now, events)
+            watch.status = d.status
+            watch.downloaded = d.downloaded_bytes
+
+        for app_id in [a for a in self._apps if a not in seen]:
+            del self._apps[app_id]
+        return events
+
+    def _check(self, watch: _AppWatch, d, now: float, events: List[Notification]):
+        def emit(kind: str, message: str):
+            events.append(Notification(kind, d.app_id, d.game_name, message, time.time()))
+
+        if d.status == "completed":
+            if watch.status != "completed":
+                emit(COMPLETED, "Загрузка завершена")
+            watch.stalled = watch.slow = False
+            return
+
+        progressing = (d.downloaded_bytes > watch.downloaded
+                       or getattr(d, 'activity', None) == "active"
+                       or (not d.total_bytes and d.speed_mbps > 0))
+        if progressing:
+            if watch.stalled or (watch.paused_since is not None and now - watch.paused_since >= RESUME_AFTER):
+                emit(RESUMED, "Загрузка возобновилась")
+            watch.advanced_at = now
+            watch.active_seen = True
+            watch.stalled = False
+            watch.paused_since = None
+        else:
+            if d.status == "paused" and watch.paused_since is None:
+                watch.paused_since = now
+            if d.status not in STALL_STATUSES:
+                # Пауза пользователя (FLAG_UPDATE_PAUSED) и очередь - не зависание;
+                # время без прогресса считается заново, когда загрузка пойдет
+                watch.advanced_at = now
+            elif (watch.active_seen and not watch.stalled
+                    and now - watch.advanced_at >= self.stall_after):
+                emit(STALLED, f"Нет прогресса {int((now - watch.advanced_at) // 60)} мин")
+                watch.stalled = True
+
+        if (self.slow_mbps is not None and d.status == "downloading"
+                and d.speed_confidence >= MIN_CONFIDENCE):
+            if d.speed_mbps >= self.slow_mbps:
+                watch.slow_since = None
+                watch.slow = False
+            elif watch.slow_since is None:
+                watch.slow_since = now
+            elif not watch.slow and now - watch.slow_since >= self.slow_for:
+                emit(SLOW, f"Скорость {d.speed_mbps:.2f} MB/s ниже {self.slow_mbps:g} MB/s")
+                watch.slow = True
+
+
+class DesktopSink:
+    """Уведомление на рабочем столе через notify-send"""
+
+    def __init__(self, timeout: float = SINK_TIMEOUT):
+        self.timeout = timeout
+        self.command = shutil.which("notify-send")
+        if self.command is None:
+            logger.warning("notify-send не найден, уведомления на рабочем столе отключены")
+
+    def send(self, title: str, text: str, events: Sequence[Notification]):
+        if self.command is not None:
+            subprocess.run([self.command, title, text], timeout=self.timeout,
+                           capture_output=True, check=False)
+
+
+class WebhookSink:
+    """POST с JSON на адрес (например, локальный Home Assistant или бот)"""
+
+    def __init__(self, url: str, timeout: float = SINK_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, title: str, text: str, events: Sequence[Notification]):
+        payload = json.dumps({
+            'title': title,
+            'text': text,
+            'events': [n._asdict() for n in events],
+        }, ensure_ascii=False).encode("utf-8")
+        request = urllib.request.Request(self.url, data=payload, method="POST",
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class CommandSink:
+    """Команда оболочки; текст уведомления - в переменных окружения STEAM_NOTIFY_*"""
+
+    def __init__(self, command: str, timeout: float = SINK_TIMEOUT):
+        self.command = command
+        self.timeout = timeout
+
+    def send(self, title: str, text: str, events: Sequence[Notification]):
+        env = dict(os.environ)
+        env.update(
+            STEAM_NOTIFY_TITLE=title,
+            STEAM_NOTIFY_TEXT=text,
+            STEAM_NOTIFY_KIND=events[0].kind if len(events) == 1 else "batch",
+            STEAM_NOTIFY_APP_IDS=",".join(n.app_id for n in events),
+            STEAM_NOTIFY_EVENTS=json.dumps([n._asdict() for n in events], ensure_ascii=False),
+        )
+        subprocess.run(self.command, shell=True, env=env, timeout=self.timeout, check=False)
+
+
+class Notifier:
+    """
+    Очередь уведомлений с доставкой в фоновом потоке.
+    Повторное событие того же вида по той же игре заменяет ожидающее,
+    "застряла" и следующее за ним "возобновилась" взаимно гасятся.
+    """
+
+    def __init__(self, sinks: Sequence, detector: Optional[TransitionDetector] = None,
+                 queue_size: int = QUEUE_SIZE, coalesce: float = COALESCE_SECONDS,
+                 burst: int = BURST, refill: float = REFILL_SECONDS):
+        self.sinks = list(sinks)
+        self.detector = detector or TransitionDetector()
+        self.queue_size = queue_size
+        self.coalesce = coalesce
+        self.burst = burst
+        self.refill = refill
+
+        self._pending: "OrderedDict[Tuple[str, str], Notification]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._closing = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    def observe(self, downloads: Iterable, now: float):
+        """Вызывается после каждой проверки; не блокируется на доставке"""
+        for notification in self.detector.update(downloads, now):
+            self.publish(notification)
+
+    def publish(self, notification: Notification):
+        key = (notification.kind, notification.app_id)
+        with self._cond:
+            if notification.kind == RESUMED and (STALLED, notification.app_id) in self._pending:
+                # Загрузка ожила раньше, чем о зависании успели сообщить
+                del self._pending[(STALLED, notification.app_id)]
+                self.coalesced += 2
+                return
+            if key in self._pending:
+                del self._pending[key]
+                self.coalesced += 1
+            elif len(self._pending) >= self.queue_size:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._pending[key] = notification
+            self._cond.notify()
+
+    def _take_token(self) -> bool:
+        """Ждет разрешения лимита частоты; False - монитор завершается"""
+        while not self._closing.is_set():
+            now = time.monotonic()
+            self._tokens = min(float(self.burst), self._tokens + (now - self._refilled_at) / self.refill)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            self._closing.wait((1 - self._tokens) * self.refill)
+        return False
+
+    def _deliver(self, batch: List[Notification]):
+        if len(batch) == 1:
+            title = f"{TITLE}: {batch[0].game_name}"
+            text = batch[0].message
+        else:
+            title = f"{TITLE}: {len(batch)} событий"
+            text = "\n".join(f"{n.game_name}: {n.message}" for n in batch)
+
+        for sink in self.sinks:
+            try:
+                sink.send(title, text, batch)
+            except Exception as e:
+                logger.warning(f"Уведомление через {type(sink).__name__} не доставлено: {e}")
+        self.sent += 1
+        logger.info(f"🔔 {title} - {text.replace(chr(10), '; ')}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closing.is_set():
+                    self._cond.wait()
+                if not self._pending:
+                    return
+            # Дожидаемся остальных событий пачки, затем разрешения лимита
+            if not self._closing.wait(self.coalesce):
+                self._take_token()
+            with self._cond:
+                batch = list(self._pending.values())
+                self._pending.clear()
+            if batch:
+                self._deliver(batch)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="notifier", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: float = SINK_TIMEOUT):
+        """Отправляет ожидающие уведомления (без лимита частоты) и останавливает поток"""
+        if self._thread is not None:
+            self._closing.set()
+            with self._cond:
+                self._cond.notify()
+            self._thread.join(timeout)
+            self._thread = None
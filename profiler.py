@@ -0,0 +1,124 @@
+"""
+Профилирование этапов проверки загрузок
+Монотонные таймеры, p50/p95/max по гистограмме фиксированного размера
+"""
+
+import json
+import math
+import time
+import logging
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Гистограмма: от 1 мкс, каждая корзина в 1.25 раза шире предыдущей (~100 сек в последней)
+_MIN_SECONDS = 1e-6
+_RATIO = 1.25
+_BUCKETS = 84
+_LOG_RATIO = math.log(_RATIO)
+
+
+class StageStats:
+    """Время одного этапа"""
+
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * _BUCKETS
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if seconds <= _MIN_SECONDS:
+            index = 0
+        else:
+            index = min(_BUCKETS - 1, int(math.log(seconds / _MIN_SECONDS) / _LOG_RATIO) + 1)
+        self.buckets[index] += 1
+
+    def percentile(self, q: float) -> float:
+        """Оценка перцентиля (верхняя граница корзины, не больше max)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.buckets):
+            cumulative += count
+            if cumulative >= rank:
+                return min(self.max, _MIN_SECONDS * _RATIO ** index)
+        return self.max
+
+
+class _Timer:
+    __slots__ = ('stats', 'start')
+
+    def __init__(self, stats: StageStats):
+        self.stats = stats
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class StageProfiler:
+    """Собирает время этапов; выключенный профайлер почти ничего не стоит"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.stages: Dict[str, StageStats] = {}
+
+    def stage(self, name: str):
+        """with profiler.stage("scan"): ..."""
+        if not self.enabled:
+            return _NULL_TIMER
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        return _Timer(stats)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Сводка по этапам в миллисекундах"""
+        return {
+            name: {
+                'count': stats.count,
+                'p50_ms': round(stats.percentile(0.50) * 1000, 3),
+                'p95_ms': round(stats.percentile(0.95) * 1000, 3),
+                'max_ms': round(stats.max * 1000, 3),
+                'total_ms': round(stats.total * 1000, 3),
+            }
+            for name, stats in self.stages.items()
+        }
+
+    def log_summary(self):
+        """Структурированная строка лога с результатами"""
+        if self.enabled and self.stages:
+            logger.info("profile " + json.dumps(self.summary(), ensure_ascii=False, sort_keys=True))
+
+    def format_summary(self) -> List[str]:
+        """Таблица для вывода в консоль"""
+        lines = [f"{'Этап':<20} {'вызовов':>8} {'p50, мс':>10} {'p95, мс':>10} {'max, мс':>10}"]
+        for name, row in sorted(self.summary().items(), key=lambda item: -item[1]['total_ms']):
+            lines.append(f"{name:<20} {row['count']:>8} {row['p50_ms']:>10.3f} "
+                         f"{row['p95_ms']:>10.3f} {row['max_ms']:>10.3f}")
+        return lines
@@ -0,0 +1,349 @@
+"""
+Запись и воспроизведение сессий мониторинга
+Запись (steam_monitor.py --record PATH): на каждую проверку строка NDJSON с новыми
+строками content_log, измененными appmanifest, размерами папок downloading
+и найденными состояниями. Воспроизведение прогоняет запись через RealSteamMonitor
+с виртуальными часами - быстрее реального времени, без Steam и сети.
+Запуск: python replay.py session.jsonl [--set download_state.PAUSED_SPEED_MBPS=0.05]
+"""
+
+import sys
+import json
+import time
+import argparse
+import importlib
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from steam_monitor import RealSteamMonitor
+from vdf_parser import AppManifest, VdfError, parse_vdf
+from activity import classify_activity
+
+FORMAT_VERSION = 1
+
+# Пороги, которые читает воспроизведение и которые можно подменить через --set
+TUNABLES = (
+    "activity.ACTIVE_WITHIN",
+    "activity.STALLED_WITHIN",
+    "download_state.PAUSED_SPEED_MBPS",
+    "eta.MAX_SAMPLES",
+    "eta.WINDOW_SECONDS",
+    "speed_estimator.ALPHA",
+    "speed_estimator.IDLE_AFTER",
+    "speed_estimator.MIN_SAMPLES",
+    "speed_estimator.OUTLIER_FACTOR",
+    "speed_history.CAPACITY",
+    "speed_history.EWMA_ALPHA",
+    "speed_history.IDLE_TTL",
+    "speed_history.WINDOW_SECONDS",
+)
+
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+class SessionRecorder:
+    """Пишет входные данные каждой проверки; appmanifest - только при изменении"""
+
+    def __init__(self, path, steam_path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._lines: List[str] = []
+        self._manifests: Dict[str, AppManifest] = {}
+        self._libraries: List[str] = []
+        self._origin: Optional[float] = None
+        self.records = 0
+
+        self._write({'version': FORMAT_VERSION, 'steam_path': str(steam_path), 'started': time.time()})
+
+    def _write(self, obj: Dict):
+        self._file.write(_dumps(obj))
+        self._file.write("\n")
+
+    def add_line(self, line: str):
+        """Строка content_log, прочитанная монитором"""
+        self._lines.append(line)
+
+    def take_lines(self) -> List[str]:
+        """Строки, прочитанные с прошлой проверки (забирается в потоке состояния монитора)"""
+        lines, self._lines = self._lines, []
+        return lines
+
+    def record(self, now: float, scanned: Dict[str, Dict], downloads: List,
+               lines: Optional[List[str]] = None):
+        """
+        Сохраняет проверку: now - time.monotonic(), scanned - результат сканирования библиотек,
+        lines - строки лога этой проверки (None - забрать накопленные)
+        """
+        if self._origin is None:
+            self._origin = now
+        if lines is None:
+            lines = self.take_lines()
+        entry: Dict[str, Any] = {'t': round(now - self._origin, 3)}
+        if lines:
+            entry['log'] = lines
+
+        libraries = sorted({str(item['library']) for item in scanned.values() if item.get('library')})
+        if libraries != self._libraries:
+            entry['libraries'] = self._libraries = libraries
+
+        manifests = {}
+        folders = {}
+        for app_id, item in scanned.items():
+            manifest = item.get('manifest')
+            if manifest is not None and self._manifests.get(app_id) is not manifest:
+                # ManifestCache возвращает тот же объект, пока файл не изменился
+                path = Path(item['library']) / "steamapps" / f"appmanifest_{app_id}.acf"
+                try:
+                    manifests[app_id] = {'library': str(item['library']),
+                                         'text': path.read_text(encoding="utf-8", errors="replace")}
+                except OSError:
+                    pass
+                else:
+                    self._manifests[app_id] = manifest
+            if item.get('folder'):
+                folders[app_id] = {'library': str(item['library']), 'path': item['folder'],
+                                   'bytes': item.get('folder_bytes'), 'files': item['has_files']}
+                activity = item.get('activity')
+                if activity is not None:
+                    folders[app_id]['activity'] = [activity.state, activity.idle_seconds]
+
+        removed = [app_id for app_id in self._manifests
+                   if scanned.get(app_id, {}).get('manifest') is None]
+        for app_id in removed:
+            del self._manifests[app_id]
+
+        if manifests:
+            entry['manifests'] = manifests
+        if removed:
+            entry['removed'] = removed
+        if folders:
+            entry['folders'] = folders
+        entry['detected'] = {d.app_id: [d.status, d.speed_mbps] for d in downloads}
+
+        self._write(entry)
+        self.records += 1
+
+    def close(self):
+        self._file.close()
+
+
+def read_session(path) -> Tuple[Dict, Iterator[Dict]]:
+    """(заголовок, записи проверок)"""
+    f = open(path, encoding="utf-8")
+    header = json.loads(f.readline() or "{}")
+    if header.get('version') != FORMAT_VERSION:
+        f.close()
+        raise ValueError(f"{path}: неизвестный формат записи {header.get('version')}")
+
+    def entries():
+        with f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Недописанная строка, если запись прервалась аварийно
+                    return
+
+    return header, entries()
+
+
+class _ReplayTailer:
+    """Отдает записанные строки content_log вместо чтения файла"""
+
+    def __init__(self, parse_line):
+        self.parse_line = parse_line
+        self.lines: List[str] = []
+
+    def read_events(self):
+        lines, self.lines = self.lines, []
+        for line in lines:
+            event = self.parse_line(line)
+            if event is not None:
+                yield event
+
+
+class ReplayMonitor(RealSteamMonitor):
+    """RealSteamMonitor, который берет логи и библиотеки из записи"""
+
+    def __init__(self, steam_path):
+        super().__init__(steam_path)
+        self.log_tailer = _ReplayTailer(self._parse_log_line)
+        self.libraries: List[Path] = [self.steam_path]
+        self.manifests: Dict[str, Tuple[Path, AppManifest]] = {}
+        self.folders: Dict[str, Dict] = {}
+
+    def apply(self, entry: Dict):
+        """Переносит в монитор состояние диска на момент проверки"""
+        self.log_tailer.lines = entry.get('log', [])
+        if 'libraries' in entry:
+            self.libraries = [Path(p) for p in entry['libraries']]
+        for app_id, data in entry.get('manifests', {}).items():
+            try:
+                manifest = AppManifest.from_vdf(parse_vdf(data['text'], lower_keys=True))
+            except (VdfError, ValueError):
+                # Steam мог дописывать файл в момент записи, как и при живом чтении
+                self.manifests.pop(app_id, None)
+                continue
+            self.manifests[app_id] = (Path(data['library']), manifest)
+        for app_id in entry.get('removed', ()):
+            self.manifests.pop(app_id, None)
+        self.folders = entry.get('folders', {})
+
+    def _get_all_libraries(self) -> List[Path]:
+        return self.libraries
+
+    def _scan_libraries(self) -> Dict[str, Dict]:
+        scanned: Dict[str, Dict] = {}
+        wall = time.time()
+        for app_id, (library, manifest) in self.manifests.items():
+            scanned[app_id] = {'library': library, 'manifest': manifest, 'has_files': None}
+        for app_id, folder in self.folders.items():
+            item = scanned.get(app_id)
+            activity = folder.get('activity')
+            scanned[app_id] = {
+                'library': Path(folder['library']),
+                'manifest': item['manifest'] if item is not None else None,
+                'has_files': folder['files'],
+                'folder': folder['path'],
+                'folder_bytes': folder['bytes'],
+                # Состояние заново по записанному простою, чтобы работали подмененные пороги
+                'activity': self._reclassify(activity, wall) if activity else None,
+            }
+        return scanned
+
+    @staticmethod
+    def _reclassify(activity: List, wall: float):
+        """[состояние, простой в секундах] из записи -> Activity по текущим порогам"""
+        idle = activity[1]
+        return classify_activity(wall - idle if idle is not None else None, wall)
+
+    def _get_game_name(self, app_id: str) -> str:
+        # Без сети и кэша на диске: только название из записанного appmanifest
+        entry = self.manifests.get(app_id)
+        if entry is not None and entry[1].name:
+            return entry[1].name
+        return f"Игра (AppID: {app_id})"
+
+
+class ReplayReport(NamedTuple):
+    checks: int
+    recorded_seconds: float      # длительность записанной сессии
+    replay_seconds: float        # время проверок при воспроизведении
+    checks_per_second: float
+    compared: int                # пар (проверка, загрузка) со статусом из записи
+    matched: int
+    confusion: Dict[Tuple[str, str], int]   # (записанный, полученный) -> число
+
+    @property
+    def accuracy(self) -> float:
+        return self.matched / self.compared if self.compared else 1.0
+
+    @property
+    def speedup(self) -> float:
+        return self.recorded_seconds / self.replay_seconds if self.replay_seconds > 0 else 0.0
+
+
+def apply_overrides(overrides: List[str]):
+    """'модуль.ИМЯ=значение' - подменяет порог из TUNABLES перед воспроизведением"""
+    for item in overrides:
+        target, _, raw = item.partition("=")
+        module_name, _, name = target.rpartition(".")
+        if not module_name or not raw:
+            raise ValueError(f"ожидается модуль.ИМЯ=значение: {item}")
+        if target not in TUNABLES:
+            raise ValueError(f"{target} не влияет на воспроизведение, допустимы: {', '.join(TUNABLES)}")
+        module = importlib.import_module(module_name)
+        current = getattr(module, name)
+        setattr(module, name, type(current)(raw) if current is not None else raw)
+
+
+def replay(path, speed: float = 0.0) -> ReplayReport:
+    """
+    Воспроизводит запись. speed - во сколько раз быстрее реального времени,
+    0 - без пауз между проверками.
+    """
+    header, entries = read_session(path)
+    monitor = ReplayMonitor(header['steam_path'])
+    # Виртуальные часы: с начала отсчета прошло как минимум время записи
+    origin = time.monotonic()
+
+    checks = 0
+    compared = matched = 0
+    confusion: Counter = Counter()
+    elapsed = 0.0
+    recorded = 0.0
+    for entry in entries:
+        if speed > 0 and entry['t'] > recorded:
+            time.sleep((entry['t'] - recorded) / speed)
+        recorded = entry['t']
+
+        monitor.apply(entry)
+        started = time.perf_counter()
+        downloads = monitor.check_downloads(now=origin + entry['t'])
+        elapsed += time.perf_counter() - started
+        checks += 1
+
+        expected = entry.get('detected', {})
+        for d in downloads:
+            if d.app_id in expected:
+                status = expected[d.app_id][0]
+                compared += 1
+                matched += status == d.status
+                confusion[(status, d.status)] += 1
+
+    monitor.name_cache.close()
+    return ReplayReport(checks, recorded, elapsed, checks / elapsed if elapsed > 0 else 0.0,
+                        compared, matched, dict(confusion))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Воспроизведение записанной сессии мониторинга")
+    parser.add_argument("session", help="файл, записанный steam_monitor.py --record")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="во сколько раз быстрее реального времени (0 - без пауз)")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="MODULE.NAME=VALUE",
+                        help="подменить порог, например download_state.PAUSED_SPEED_MBPS=0.05")
+    parser.add_argument("--min-accuracy", type=float, default=None,
+                        help="код возврата 1, если совпадение статусов с записью ниже (0-1)")
+    parser.add_argument("--json", action="store_true", help="вывести результат в JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        apply_overrides(args.overrides)
+    except ValueError as e:
+        parser.error(str(e))
+    report = replay(args.session, args.speed)
+
+    if args.json:
+        print(json.dumps({
+            'checks': report.checks,
+            'recorded_seconds': report.recorded_seconds,
+            'replay_seconds': round(report.replay_seconds, 4),
+            'checks_per_second': round(report.checks_per_second, 1),
+            'speedup': round(report.speedup, 1),
+            'compared': report.compared,
+            'accuracy': round(report.accuracy, 4),
+            'confusion': [{'recorded': r, 'replayed': p, 'count': n}
+                          for (r, p), n in sorted(report.confusion.items())],
+        }, ensure_ascii=False, indent=2))
+    else:
+        print("=" * 60)
+        print(f"Проверок: {report.checks} за {report.recorded_seconds:.0f} сек записи")
+        print(f"Воспроизведение: {report.replay_seconds * 1000:.1f} мс "
+              f"({report.checks_per_second:.0f} проверок/сек, x{report.speedup:.0f})")
+        print(f"Совпадение статусов: {report.accuracy:.1%} ({report.matched}/{report.compared})")
+        print("=" * 60)
+        for (recorded, replayed), count in sorted(report.confusion.items()):
+            if recorded != replayed:
+                print(f"  {recorded:<12} -> {replayed:<12} {count}")
+
+    if args.min_accuracy is not None and report.accuracy < args.min_accuracy:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
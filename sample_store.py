@@ -0,0 +1,178 @@
+"""
+Хранилище истории загрузок
+SQLite в режиме WAL, пакетная запись из фонового потока, прореживание старых данных
+"""
+
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from name_cache import default_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# Как часто сбрасывать накопленные измерения на диск (секунды)
+FLUSH_INTERVAL = 5.0
+# Измерения старше стольких дней прореживаются
+RETENTION_DAYS = 7.0
+# Шаг прореживания (секунды)
+DOWNSAMPLE_SECONDS = 300
+# Как часто проверять, не пора ли прореживать (секунды)
+RETENTION_CHECK_INTERVAL = 60 * 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    ts REAL NOT NULL,
+    app_id TEXT NOT NULL,
+    bytes_downloaded INTEGER NOT NULL,
+    bytes_total INTEGER NOT NULL,
+    speed REAL NOT NULL,
+    status TEXT NOT NULL,
+    resolution INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS samples_app_ts ON samples (app_id, ts);
+"""
+
+Sample = Tuple[float, str, int, int, float, str]
+
+
+def default_store_path() -> Path:
+    return default_cache_dir() / "samples.db"
+
+
+class SampleStore:
+    """Пишет измерения (ts, app_id, bytes_downloaded, bytes_total, speed, status) в SQLite"""
+
+    def __init__(self, path: Optional[Path] = None, flush_interval: float = FLUSH_INTERVAL,
+                 retention_days: float = RETENTION_DAYS, downsample_seconds: int = DOWNSAMPLE_SECONDS):
+        self.path = Path(path) if path else default_store_path()
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.downsample_seconds = downsample_seconds
+
+        self._buffer: List[Sample] = []
+        self._buffer_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_retention = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def add(self, downloads: Iterable, ts: Optional[float] = None):
+        """Запоминает измерения; на диск они попадут при следующем сбросе"""
+        if ts is None:
+            ts = time.time()
+        rows = [
+            (ts, d.app_id, d.downloaded_bytes, d.total_bytes, d.speed_mbps * 1024 * 1024, d.status)
+            for d in downloads
+        ]
+        if rows:
+            with self._buffer_lock:
+                self._buffer.extend(rows)
+
+    def flush(self) -> int:
+        """Записывает накопленные измерения одной транзакцией"""
+        with self._buffer_lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+
+        try:
+            with self._db_lock:
+                conn = self._connect()
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO samples (ts, app_id, bytes_downloaded, bytes_total, speed, status)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        rows
+                    )
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка записи истории загрузок: {e}")
+            return 0
+        return len(rows)
+
+    def apply_retention(self, now: Optional[float] = None) -> int:
+        """Прореживает измерения старше retention_days до одного на downsample_seconds"""
+        if now is None:
+            now = time.time()
+        step = int(self.downsample_seconds)
+        # Граница по началу интервала: интервал прореживается целиком и один раз,
+        # иначе его остаток дал бы при следующем запуске вторую строку resolution=step
+        cutoff = int(now - self.retention_days * 24 * 60 * 60) // step * step
+
+        try:
+            with self._db_lock:
+                conn = self._connect()
+                with conn:
+                    # Статус интервала - статус последнего измерения в нем
+                    # (MAX(status) сравнивал бы строки по алфавиту)
+                    conn.execute(
+                        "INSERT INTO samples"
+                        " (ts, app_id, bytes_downloaded, bytes_total, speed, status, resolution)"
+                        " SELECT CAST(s.ts / :step AS INTEGER) * :step AS bucket, s.app_id,"
+                        " MAX(s.bytes_downloaded), MAX(s.bytes_total), AVG(s.speed),"
+                        " (SELECT l.status FROM samples l"
+                        "  WHERE l.app_id = s.app_id AND l.resolution = 0 AND l.ts < :cutoff"
+                        "  AND l.ts >= CAST(s.ts / :step AS INTEGER) * :step"
+                        "  AND l.ts < CAST(s.ts / :step AS INTEGER) * :step + :step"
+                        "  ORDER BY l.ts DESC LIMIT 1), :step"
+                        " FROM samples s WHERE s.resolution = 0 AND s.ts < :cutoff"
+                        " GROUP BY s.app_id, CAST(s.ts / :step AS INTEGER)",
+                        {'step': step, 'cutoff': cutoff}
+                    )
+                    deleted = conn.execute(
+                        "DELETE FROM samples WHERE resolution = 0 AND ts < ?", (cutoff,)
+                    ).rowcount
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка прореживания истории: {e}")
+            return 0
+
+        self._last_retention = now
+        return deleted
+
+    def query(self, app_id: str, since: float = 0.0) -> List[Sample]:
+        """Измерения загрузки начиная с since (для отчетов)"""
+        self.flush()
+        with self._db_lock:
+            return self._connect().execute(
+                "SELECT ts, app_id, bytes_downloaded, bytes_total, speed, status FROM samples"
+                " WHERE app_id = ? AND ts >= ? ORDER BY ts",
+                (app_id, since)
+            ).fetchall()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            if time.time() - self._last_retention >= RETENTION_CHECK_INTERVAL:
+                self.apply_retention()
+
+    def start(self):
+        """Запускает фоновый сброс на диск"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sample-store", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Останавливает фоновый поток и дописывает остаток"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,105 @@
+"""
+Планировщик опросов для долгой работы (режим демона)
+Монотонные часы без накопления дрейфа + адаптивный интервал
+"""
+
+import signal
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Минимальная пауза между проверками по событиям на диске (секунды)
+EVENT_GAP = 1.0
+
+
+class MonitorStopped(Exception):
+    """Мониторинг остановлен сигналом (SIGTERM)"""
+
+
+class PollScheduler:
+    """
+    Решает, когда делать следующую проверку.
+    Быстро, пока идут байты; обычно, если загрузки стоят;
+    все реже (до idle_interval), пока загрузок нет совсем.
+    """
+
+    def __init__(self, interval: float, fast_interval: Optional[float] = None,
+                 idle_interval: Optional[float] = None, event_gap: float = EVENT_GAP):
+        self.interval = interval
+        self.fast_interval = fast_interval or interval
+        self.idle_interval = idle_interval or interval
+        self.event_gap = event_gap
+        self._idle_streak = 0
+        self._next_tick: Optional[float] = None
+        self._checked_at: Optional[float] = None
+
+    @property
+    def adaptive(self) -> bool:
+        return self.fast_interval != self.interval or self.idle_interval != self.interval
+
+    def choose_interval(self, downloads: Iterable) -> float:
+        """Интервал до следующей проверки по текущим загрузкам"""
+        downloads = list(downloads)
+        if not downloads:
+            # Загрузок нет - удваиваем паузу до idle_interval
+            self._idle_streak += 1
+            backoff = self.interval * (2 ** min(self._idle_streak - 1, 16))
+            return min(max(self.interval, backoff), max(self.interval, self.idle_interval))
+
+        self._idle_streak = 0
+        if any(d.status == "downloading" and d.speed_mbps > 0 for d in downloads):
+            return self.fast_interval
+        return self.interval
+
+    def next_delay(self, downloads: Iterable) -> float:
+        """Сколько ждать до следующей проверки, с поправкой на время самой проверки"""
+        interval = self.choose_interval(downloads)
+        now = time.monotonic()
+        self._checked_at = now
+
+        if self._next_tick is None:
+            self._next_tick = now
+        self._next_tick += interval
+
+        # Проверка заняла дольше интервала - не пытаемся догонять пропущенные тики
+        if self._next_tick < now:
+            self._next_tick = now
+
+        return self._next_tick - now
+
+    def event_delay(self) -> float:
+        """
+        Сколько еще ждать перед проверкой по событию на диске:
+        проверки по событиям идут не чаще event_gap и не позже плановой
+        """
+        if self._checked_at is None:
+            return 0.0
+        due = self._checked_at + self.event_gap
+        if self._next_tick is not None:
+            due = min(due, self._next_tick)
+        return max(0.0, due - time.monotonic())
+
+    def reset(self):
+        """Сдвигает расписание: проверка выполнена вне очереди (например, по событию)"""
+        self._next_tick = time.monotonic()
+
+
+@contextmanager
+def stop_on_sigterm():
+    """Превращает SIGTERM в исключение MonitorStopped внутри блока"""
+    if threading.current_thread() is not threading.main_thread() or not hasattr(signal, "SIGTERM"):
+        yield
+        return
+
+    def handler(signum, frame):
+        raise MonitorStopped(f"получен сигнал {signum}")
+
+    previous = signal.signal(signal.SIGTERM, handler)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGTERM, previous)
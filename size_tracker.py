@@ -0,0 +1,146 @@
+"""
+Инкрементальный подсчет размера каталога загрузки
+Пересканирует только каталоги, у которых изменился mtime;
+попутно запоминает самый свежий mtime файлов для activity.py
+"""
+
+import os
+import time
+import logging
+from typing import Dict, List, Optional
+
+from activity import ACTIVE_WITHIN
+
+logger = logging.getLogger(__name__)
+
+# Через сколько секунд пересканировать каталог даже без изменения mtime:
+# дозапись в существующий файл mtime каталога не меняет. Меньше ACTIVE_WITHIN,
+# чтобы запись в любой файл, а не только в последний, была замечена, пока загрузка активна
+MAX_DIR_AGE = ACTIVE_WITHIN / 2
+
+
+class _DirState:
+    __slots__ = ('mtime_ns', 'files_size', 'file_count', 'subdirs', 'scanned_at',
+                 'newest_ns', 'newest_file')
+
+    def __init__(self, mtime_ns: int, files_size: int, file_count: int,
+                 subdirs: List[str], scanned_at: float,
+                 newest_ns: int = 0, newest_file: Optional[str] = None):
+        self.mtime_ns = mtime_ns
+        self.files_size = files_size
+        self.file_count = file_count
+        self.subdirs = subdirs
+        self.scanned_at = scanned_at
+        # Самый свежий mtime файлов каталога (вместе с mtime самого каталога) и этот файл
+        self.newest_ns = max(mtime_ns, newest_ns)
+        self.newest_file = newest_file
+
+
+class DirSizeTracker:
+    """Размер дерева файлов с кэшем по каталогам"""
+
+    def __init__(self, root, max_dir_age: float = MAX_DIR_AGE):
+        self.root = os.fspath(root)
+        self.max_dir_age = max_dir_age
+        self._dirs: Dict[str, _DirState] = {}
+
+        self.total_size = 0
+        self.file_count = 0
+        self.rescanned = 0  # сколько каталогов пересканировано при последнем update()
+        # Последняя запись в дерево (секунды epoch), None - каталога нет
+        self.newest_mtime: Optional[float] = None
+        self._newest_ns = 0
+        self._newest_file: Optional[str] = None
+
+    def _scan_dir(self, path: str, mtime_ns: int, now: float) -> _DirState:
+        """Читает один каталог через os.scandir"""
+        files_size = 0
+        file_count = 0
+        subdirs = []
+        newest_ns = 0
+        newest_file = None
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        files_size += st.st_size
+                        file_count += 1
+                        if st.st_mtime_ns > newest_ns:
+                            newest_ns, newest_file = st.st_mtime_ns, entry.path
+                except OSError:
+                    continue
+        self.rescanned += 1
+        return _DirState(mtime_ns, files_size, file_count, subdirs, now, newest_ns, newest_file)
+
+    def _visit(self, path: str, now: float, seen: set):
+        """Обходит каталог, пересканируя его только при изменениях"""
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return
+
+        state = self._dirs.get(path)
+        if (state is None or state.mtime_ns != mtime_ns
+                or now - state.scanned_at >= self.max_dir_age):
+            try:
+                state = self._scan_dir(path, mtime_ns, now)
+            except OSError:
+                return
+            self._dirs[path] = state
+
+        seen.add(path)
+        self.total_size += state.files_size
+        self.file_count += state.file_count
+        if state.newest_ns > self._newest_ns:
+            self._newest_ns = state.newest_ns
+            self._newest_file = state.newest_file
+        for subdir in state.subdirs:
+            self._visit(subdir, now, seen)
+
+    def update(self) -> int:
+        """Обновляет и возвращает общий размер в байтах"""
+        now = time.monotonic()
+        seen = set()
+        hot_file = self._newest_file
+        self.total_size = 0
+        self.file_count = 0
+        self.rescanned = 0
+        self._newest_ns = 0
+        self._newest_file = None
+
+        self._visit(self.root, now, seen)
+
+        # Дозапись в файл не меняет mtime каталога: файл, куда писали в прошлый раз,
+        # проверяется каждый раз одним stat, остальные - при пересканировании каталога
+        if hot_file is not None and seen:
+            try:
+                hot_ns = os.stat(hot_file).st_mtime_ns
+            except OSError:
+                pass
+            else:
+                if hot_ns > self._newest_ns:
+                    self._newest_ns, self._newest_file = hot_ns, hot_file
+        self.newest_mtime = self._newest_ns / 1e9 if seen else None
+
+        # Удаленные каталоги больше не учитываются
+        if len(seen) != len(self._dirs):
+            for path in [p for p in self._dirs if p not in seen]:
+                del self._dirs[path]
+
+        return self.total_size
+
+    @property
+    def dir_count(self) -> int:
+        return len(self._dirs)
+
+
+def get_tracker(trackers: Dict[str, DirSizeTracker], key: str, root) -> DirSizeTracker:
+    """Возвращает трекер для key, создавая его при первом обращении"""
+    tracker: Optional[DirSizeTracker] = trackers.get(key)
+    if tracker is None or tracker.root != os.fspath(root):
+        tracker = DirSizeTracker(root)
+        trackers[key] = tracker
+    return tracker
@@ -0,0 +1,168 @@
+"""
+Оценка скорости загрузки по счетчикам байтов
+Основной источник - BytesDownloaded из appmanifest, запасной - размер папки downloading.
+Сглаживание EWMA, отсев выбросов и достоверность оценки от 0 до 1.
+"""
+
+from typing import Dict, Iterable, NamedTuple, Optional
+
+# Вес нового измерения в EWMA
+ALPHA = 0.3
+# Во сколько раз измерение должно превышать сглаженную скорость, чтобы считаться выбросом
+OUTLIER_FACTOR = 4.0
+# Сколько принятых измерений нужно, прежде чем отсеивать выбросы
+MIN_SAMPLES = 3
+# Через сколько секунд без роста счетчиков загрузка считается остановленной
+IDLE_AFTER = 30.0
+
+SOURCE_MANIFEST = "manifest"
+SOURCE_FOLDER = "folder"
+SOURCE_NONE = "none"
+
+# Насколько доверять источнику: размер папки завышается предвыделенными файлами
+SOURCE_WEIGHT = {
+    SOURCE_MANIFEST: 1.0,
+    SOURCE_FOLDER: 0.6,
+    SOURCE_NONE: 0.0,
+}
+
+_MB = 1024 * 1024
+
+
+class SpeedEstimate(NamedTuple):
+    speed_mbps: float
+    confidence: float  # 0..1
+    source: str
+
+
+class _Counter:
+    """
+    Счетчик байтов. Steam обновляет BytesDownloaded пачками, поэтому скорость
+    считается между изменениями счетчика, а не между опросами.
+    """
+
+    __slots__ = ('value', 'changed_at', 'anchored')
+
+    def __init__(self):
+        self.value: Optional[int] = None
+        self.changed_at = 0.0
+        # changed_at - момент настоящего изменения, а не первого наблюдения или простоя
+        self.anchored = False
+
+    def advance(self, value: int, now: float) -> Optional[float]:
+        """Возвращает байт/сек, если счетчик вырос с прошлого изменения"""
+        previous = self.value
+        if previous is None or value < previous:
+            # Первое измерение или сброс (проверка файлов, новая загрузка)
+            self.value, self.changed_at, self.anchored = value, now, False
+            return None
+        if value == previous:
+            return None
+
+        elapsed = now - self.changed_at
+        anchored = self.anchored
+        self.value, self.changed_at, self.anchored = value, now, True
+        if not anchored or elapsed <= 0:
+            return None
+        return (value - previous) / elapsed
+
+
+class _AppState:
+    __slots__ = ('manifest', 'folder', 'ewma', 'samples', 'rejected', 'source', 'sampled_at')
+
+    def __init__(self):
+        self.manifest = _Counter()
+        self.folder = _Counter()
+        self.ewma = 0.0
+        self.samples = 0
+        self.rejected = False
+        self.source = SOURCE_NONE
+        self.sampled_at: Optional[float] = None
+
+
+class SpeedEstimator:
+    """Сглаженная скорость каждой загрузки"""
+
+    def __init__(self, alpha: Optional[float] = None, outlier_factor: Optional[float] = None,
+                 idle_after: Optional[float] = None):
+        # Пороги по умолчанию читаются при создании, чтобы их можно было подменить (replay --set)
+        self.alpha = ALPHA if alpha is None else alpha
+        self.outlier_factor = OUTLIER_FACTOR if outlier_factor is None else outlier_factor
+        self.idle_after = IDLE_AFTER if idle_after is None else idle_after
+        self._apps: Dict[str, _AppState] = {}
+
+    def update(self, app_id: str, now: float, bytes_downloaded: Optional[int] = None,
+               folder_bytes: Optional[int] = None) -> SpeedEstimate:
+        """
+        Учитывает новые значения счетчиков (now - time.monotonic()).
+        Папка используется, только если appmanifest давно не менялся.
+        """
+        state = self._apps.get(app_id)
+        if state is None:
+            state = self._apps[app_id] = _AppState()
+
+        rate = None
+        source = SOURCE_NONE
+        if bytes_downloaded is not None:
+            rate = state.manifest.advance(bytes_downloaded, now)
+            source = SOURCE_MANIFEST
+        # Манифест, который недавно менялся, важнее папки, даже если сейчас он не изменился
+        manifest_fresh = state.manifest.anchored and now - state.manifest.changed_at < self.idle_after
+
+        if folder_bytes is not None:
+            folder_rate = state.folder.advance(folder_bytes, now)
+            if rate is None and not manifest_fresh and folder_rate is not None:
+                rate, source = folder_rate, SOURCE_FOLDER
+
+        if rate is not None:
+            self._add_sample(state, rate, source, now)
+        elif now - self._last_change(state) >= self.idle_after:
+            # Ни один счетчик не растет - загрузка стоит; первое изменение
+            # после простоя не годится для расчета скорости
+            state.ewma = 0.0
+            state.manifest.anchored = state.folder.anchored = False
+
+        return SpeedEstimate(round(state.ewma / _MB, 3), self._confidence(state, now), state.source)
+
+    def _add_sample(self, state: _AppState, rate: float, source: str, now: float):
+        if (state.samples >= MIN_SAMPLES and state.ewma > 0
+                and rate > state.ewma * self.outlier_factor and not state.rejected):
+            # Одиночный всплеск (предвыделение файла, запись манифеста пачкой) отбрасывается;
+            # второй подряд означает, что скорость действительно изменилась
+            state.rejected = True
+            return
+
+        state.rejected = False
+        if state.samples == 0 or state.ewma == 0.0:
+            # Первое измерение или возобновление после остановки
+            state.ewma = rate
+        else:
+            state.ewma += self.alpha * (rate - state.ewma)
+        state.samples += 1
+        state.source = source
+        state.sampled_at = now
+
+    @staticmethod
+    def _last_change(state: _AppState) -> float:
+        return max(state.manifest.changed_at, state.folder.changed_at)
+
+    def _confidence(self, state: _AppState, now: float) -> float:
+        """Достоверность: источник, число измерений и их свежесть"""
+        if state.sampled_at is None:
+            return 0.0
+        warmup = min(1.0, state.samples / MIN_SAMPLES)
+        age = now - self._last_change(state)
+        freshness = 1.0 if age < self.idle_after else max(0.0, 2.0 - age / self.idle_after)
+        if state.ewma == 0.0:
+            # Остановка видна по счетчикам так же надежно, как и рост
+            freshness = 1.0
+        return round(SOURCE_WEIGHT[state.source] * warmup * freshness, 2)
+
+    def retain(self, app_ids: Iterable[str]):
+        """Забывает загрузки, которых больше нет"""
+        keep = set(app_ids)
+        for app_id in [a for a in self._apps if a not in keep]:
+            del self._apps[app_id]
+
+    def __contains__(self, app_id: str) -> bool:
+        return app_id in self._apps
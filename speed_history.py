@@ -0,0 +1,154 @@
+"""
+История скоростей загрузок
+Кольцевой буфер на array('d') со скользящими sum/min/max/EWMA за O(1)
+"""
+
+import time
+from array import array
+from collections import deque
+from typing import Dict, Iterator, Optional, Tuple
+
+# Окно усреднения (секунды)
+WINDOW_SECONDS = 300.0
+# Максимум измерений в окне
+CAPACITY = 1024
+# Через сколько секунд без измерений история загрузки удаляется
+IDLE_TTL = 30 * 60.0
+# Коэффициент сглаживания EWMA
+EWMA_ALPHA = 0.3
+
+
+class SpeedSeries:
+    """Скорости одной загрузки за последние window секунд"""
+
+    __slots__ = ('window', 'capacity', '_times', '_values', '_head', '_size',
+                 '_sum', '_min', '_max', 'ewma', 'alpha', 'total_count', 'peak', 'last_time')
+
+    def __init__(self, window: Optional[float] = None, capacity: Optional[int] = None,
+                 alpha: Optional[float] = None):
+        # Пороги по умолчанию читаются при создании, чтобы их можно было подменить (replay --set)
+        self.window = WINDOW_SECONDS if window is None else window
+        self.capacity = CAPACITY if capacity is None else capacity
+        self.alpha = EWMA_ALPHA if alpha is None else alpha
+        self._times = array('d', bytes(8 * self.capacity))
+        self._values = array('d', bytes(8 * self.capacity))
+        self._head = 0  # индекс самого старого измерения
+        self._size = 0
+        self._sum = 0.0
+        # Монотонные очереди (номер измерения, значение) для скользящих min/max
+        self._min: deque = deque()
+        self._max: deque = deque()
+
+        self.ewma: Optional[float] = None
+        self.total_count = 0
+        self.peak = 0.0  # максимум за все время, а не только за окно
+        self.last_time = 0.0
+
+    def _pop_oldest(self):
+        seq = self.total_count - self._size  # номер самого старого измерения
+        self._sum -= self._values[self._head]
+        self._head = (self._head + 1) % self.capacity
+        self._size -= 1
+        if self._min and self._min[0][0] <= seq:
+            self._min.popleft()
+        if self._max and self._max[0][0] <= seq:
+            self._max.popleft()
+
+    def _evict(self, now: float):
+        cutoff = now - self.window
+        while self._size and self._times[self._head] < cutoff:
+            self._pop_oldest()
+
+    def append(self, value: float, now: Optional[float] = None):
+        """Добавляет измерение (MB/s)"""
+        if now is None:
+            now = time.monotonic()
+
+        self._evict(now)
+        if self._size == self.capacity:
+            self._pop_oldest()
+
+        index = (self._head + self._size) % self.capacity
+        self._times[index] = now
+        self._values[index] = value
+        self._size += 1
+        self._sum += value
+
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((self.total_count, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((self.total_count, value))
+
+        self.ewma = value if self.ewma is None else self.alpha * value + (1 - self.alpha) * self.ewma
+        self.total_count += 1
+        self.peak = max(self.peak, value)
+        self.last_time = now
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self) -> Iterator[Tuple[float, float]]:
+        for i in range(self._size):
+            index = (self._head + i) % self.capacity
+            yield self._times[index], self._values[index]
+
+    @property
+    def mean(self) -> float:
+        return self._sum / self._size if self._size else 0.0
+
+    @property
+    def min(self) -> float:
+        return self._min[0][1] if self._min else 0.0
+
+    @property
+    def max(self) -> float:
+        return self._max[0][1] if self._max else 0.0
+
+    @property
+    def last(self) -> float:
+        if not self._size:
+            return 0.0
+        return self._values[(self._head + self._size - 1) % self.capacity]
+
+
+class SpeedHistory:
+    """Истории скоростей по AppID с удалением неактивных загрузок"""
+
+    def __init__(self, window: Optional[float] = None, idle_ttl: Optional[float] = None,
+                 capacity: Optional[int] = None):
+        self.window = WINDOW_SECONDS if window is None else window
+        self.idle_ttl = IDLE_TTL if idle_ttl is None else idle_ttl
+        self.capacity = CAPACITY if capacity is None else capacity
+        self._series: Dict[str, SpeedSeries] = {}
+
+    def add(self, app_id: str, value: float, now: Optional[float] = None) -> SpeedSeries:
+        """Добавляет измерение и возвращает историю загрузки"""
+        series = self._series.get(app_id)
+        if series is None:
+            series = SpeedSeries(self.window, self.capacity)
+            self._series[app_id] = series
+        series.append(value, now)
+        return series
+
+    def get(self, app_id: str) -> Optional[SpeedSeries]:
+        return self._series.get(app_id)
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Удаляет истории загрузок без измерений дольше idle_ttl"""
+        if now is None:
+            now = time.monotonic()
+        stale = [a for a, s in self._series.items() if now - s.last_time > self.idle_ttl]
+        for app_id in stale:
+            del self._series[app_id]
+        return len(stale)
+
+    def __contains__(self, app_id: str) -> bool:
+        return app_id in self._series
+
+    def __iter__(self):
+        return iter(self._series.items())
+
+    def __len__(self):
+        return len(self._series)
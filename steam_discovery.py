@@ -0,0 +1,127 @@
+"""
+Поиск каталога установки Steam
+STEAM_ROOT > реестр Windows (winreg импортируется только на Windows) > стандартные пути ОС
+"""
+
+import os
+import sys
+import logging
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Переменная окружения с явным путем к Steam
+STEAM_ROOT_ENV = "STEAM_ROOT"
+
+# (куст, ключ, значение) в реестре Windows
+REGISTRY_KEYS = [
+    ("HKEY_CURRENT_USER", r"Software\Valve\Steam", "SteamPath"),
+    ("HKEY_LOCAL_MACHINE", r"Software\Wow6432Node\Valve\Steam", "InstallPath"),
+    ("HKEY_LOCAL_MACHINE", r"Software\Valve\Steam", "InstallPath"),
+]
+
+Locator = Callable[[], Iterable[Path]]
+
+_locators: List[Locator] = []
+_cache: Dict[str, Optional[Path]] = {}
+
+
+def registry_paths() -> Iterable[Path]:
+    """Пути из реестра Windows; на других ОС ничего"""
+    if sys.platform != "win32":
+        return
+    try:
+        import winreg
+    except ImportError:
+        return
+
+    for hive, key_path, value_name in REGISTRY_KEYS:
+        try:
+            with winreg.OpenKey(getattr(winreg, hive), key_path) as key:
+                value = winreg.QueryValueEx(key, value_name)[0]
+        except OSError:
+            continue
+        if value:
+            yield Path(value)
+
+
+def default_paths() -> Iterable[Path]:
+    """Стандартные места установки для текущей ОС"""
+    home = Path.home()
+    if sys.platform == "win32":
+        for env in ("ProgramFiles(x86)", "ProgramFiles"):
+            base = os.environ.get(env)
+            if base:
+                yield Path(base) / "Steam"
+        yield Path("C:/Program Files (x86)/Steam")
+        yield Path("C:/Program Files/Steam")
+    elif sys.platform == "darwin":
+        yield home / "Library" / "Application Support" / "Steam"
+    else:
+        yield home / ".steam" / "steam"
+        yield home / ".steam" / "root"
+        data_home = os.environ.get("XDG_DATA_HOME")
+        if data_home:
+            yield Path(data_home) / "Steam"
+        yield home / ".local" / "share" / "Steam"
+        # Flatpak
+        yield home / ".var" / "app" / "com.valvesoftware.Steam" / ".local" / "share" / "Steam"
+    yield home / "Steam"
+
+
+def register_locator(locator: Locator, first: bool = False):
+    """Добавляет свой источник путей (например, для нестандартной установки)"""
+    if first:
+        _locators.insert(0, locator)
+    else:
+        _locators.append(locator)
+    _cache.clear()
+
+
+register_locator(registry_paths)
+register_locator(default_paths)
+
+
+def is_steam_root(path: Path) -> bool:
+    """Похоже ли на каталог Steam: внутри есть steamapps"""
+    return (path / "steamapps").is_dir()
+
+
+def _discover() -> Optional[Path]:
+    seen = set()
+    for locator in _locators:
+        for path in locator():
+            try:
+                resolved = path.resolve()
+            except OSError:
+                continue
+            if resolved in seen:
+                continue
+            seen.add(resolved)
+            if is_steam_root(resolved):
+                return resolved
+    return None
+
+
+def find_steam_root(refresh: bool = False) -> Optional[Path]:
+    """
+    Возвращает каталог Steam или None.
+    Результат запоминается на время работы процесса; refresh=True ищет заново.
+    """
+    override = os.environ.get(STEAM_ROOT_ENV, "")
+    if not refresh and override in _cache:
+        return _cache[override]
+
+    if override:
+        path = Path(override).expanduser()
+        if path.is_dir():
+            result = path
+        else:
+            logger.error(f"{STEAM_ROOT_ENV}={override}: каталог не найден")
+            result = None
+    else:
+        result = _discover()
+
+    _cache[override] = result
+    return result
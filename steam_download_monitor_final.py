@@ -6,274 +6,425 @@ Steam Download Monitor - Final Version
 import os
 import sys
 import time
-import re
 import json
-import winreg
+import argparse
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, Tuple, List
+from typing import TYPE_CHECKING, NamedTuple, Optional, Dict, Tuple, List
 from dataclasses import dataclass
 import threading
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('steam_monitor.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
+from concurrent.futures import ThreadPoolExecutor
+
+from log_tailer import ContentLogTailer
+from log_parser import parse_line
+from name_cache import GameNameCache
+from library_registry import LibraryRegistry
+from fs_watcher import create_watcher
+from vdf_parser import ManifestCache
+from speed_history import SpeedHistory
+from speed_estimator import SpeedEstimator
+from eta import EtaForecaster, QueueEta, format_eta
+from size_tracker import DirSizeTracker, get_tracker
+from scheduler import PollScheduler, MonitorStopped, stop_on_sigterm
+from profiler import StageProfiler
+from steam_discovery import STEAM_ROOT_ENV, find_steam_root
+from activity import STALLED, classify_activity
+from download_state import (
+    DownloadStateMachine, classify, is_pending, COMPLETED, DOWNLOADING
 )
+
+if TYPE_CHECKING:
+    # Хранилище истории и метрики импортируются только при --history/--metrics-port
+    from sample_store import SampleStore
+    from metrics_exporter import MetricsExporter
+    from dashboard import Dashboard
+    from fleet import FleetAgent
+    from json_output import JsonLinesWriter
+    from replay import SessionRecorder
+    from notifier import Notifier
+
 logger = logging.getLogger(__name__)
 
+LOG_FILE = "steam_monitor.log"
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+STATUS_ICONS = {
+    "queued": "⏳",
+    "downloading": "⬇️",
+    "paused": "⏸️",
+    "verifying": "🔍",
+    "completed": "✅",
+}
+
 
 @dataclass
 class DownloadInfo:
     """Информация о загрузке"""
     app_id: str
     game_name: str
-    status: str  # downloading, paused, completed
+    status: str  # queued, downloading, paused, verifying, completed
     speed_mbps: float
     progress: float  # 0-100
     downloaded_bytes: int
     total_bytes: int
     last_update: datetime
+    library_path: Optional[Path] = None
+    speed_confidence: float = 0.0  # 0-1, насколько можно доверять скорости
+    eta_seconds: Optional[float] = None  # до завершения, None - неизвестно
+    activity: Optional[str] = None  # active/stalled/paused по записи в папку downloading
+
+
+class CheckResult(NamedTuple):
+    """Итог проверки для истории, метрик, агента, записи сессии и уведомлений"""
+    downloads: List[DownloadInfo]
+    scanned: Dict[str, Dict]
+    now: float
+    duration: float
+    queue_eta: QueueEta
+    log_lines: Optional[List[str]]  # строки content_log для записи сессии
 
 
 class RealSteamMonitor:
-    def __init__(self):
-        self.steam_path = self._find_steam_path()
+    def __init__(self, steam_path=None):
+        if steam_path:
+            self.steam_path = Path(steam_path)
+        else:
+            self.steam_path = self._find_steam_path()
+
         if not self.steam_path:
-            logger.error("❌ Steam не найден!")
+            logger.error(f"❌ Steam не найден! Укажите путь в переменной {STEAM_ROOT_ENV}")
             sys.exit(1)
 
         logger.info(f"✅ Steam найден: {self.steam_path}")
         self.active_downloads: Dict[str, DownloadInfo] = {}
-        self.last_speeds: Dict[str, List[Tuple[datetime, float]]] = {}
+        self.speed_history = SpeedHistory()
+
+        # Инкрементальное чтение content_log
+        self.log_tailer = ContentLogTailer(self.steam_path / "logs", self._parse_log_line)
+
+        # Библиотеки Steam из libraryfolders.vdf
+        self.library_registry = LibraryRegistry(self.steam_path)
+
+        # Кэш названий игр (память + диск)
+        self.name_cache = GameNameCache()
+
+        # Все загрузки во всех библиотеках, у каждой своя машина состояний
+        self.manifest_cache = ManifestCache()
+        self.download_states: Dict[str, DownloadStateMachine] = {}
+        self.scan_executor: Optional[ThreadPoolExecutor] = None
+
+        # Скорость по BytesDownloaded из appmanifest, запасной вариант - размер папки downloading
+        self.speed_estimator = SpeedEstimator()
+        self.size_trackers: Dict[str, DirSizeTracker] = {}
+        # Сканирование, не уложившееся в таймаут (--async), продолжается в другом потоке
+        self._trackers_lock = threading.Lock()
+
+        # Время до завершения каждой загрузки и всей очереди
+        self.eta = EtaForecaster()
+        self.queue_eta = QueueEta(None, 0, 0.0, {})
+
+        # Время этапов проверки (--profile)
+        self.profiler = StageProfiler()
+
+        # История измерений на диске и метрики Prometheus (включаются из main)
+        self.sample_store: Optional["SampleStore"] = None
+        self.metrics: Optional["MetricsExporter"] = None
+        # Живая панель в терминале (--dashboard)
+        self.dashboard: Optional["Dashboard"] = None
+        # Вывод в JSON Lines (--format jsonl)
+        self.json_output: Optional["JsonLinesWriter"] = None
+        # Отправка изменений коллектору (--agent)
+        self.agent: Optional["FleetAgent"] = None
+        # Запись сессии для replay.py (--record)
+        self.recorder: Optional["SessionRecorder"] = None
+        # Уведомления о завершении и зависании (--notify-*)
+        self.notifier: Optional["Notifier"] = None
+        # Экспорт прямо в проверке; --async отдает last_check своим обработчикам
+        self.inline_exports = True
+        self.last_check: Optional[CheckResult] = None
 
     def _find_steam_path(self) -> Optional[Path]:
-        """Находит путь к Steam"""
-        # Ваш конкретный путь
-        paths = [
-            Path("G:/SteamLibrary"),
-            Path("C:/Program Files (x86)/Steam"),
-            Path("C:/Program Files/Steam"),
-            Path(os.path.expanduser("~/Steam")),
-        ]
-
-        for path in paths:
-            if path.exists():
-                return path
-
-        # Поиск в реестре
-        try:
-            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Software\Valve\Steam")
-            steam_path = winreg.QueryValueEx(key, "SteamPath")[0]
-            winreg.CloseKey(key)
-            return Path(steam_path)
-        except:
+        """Находит путь к Steam (STEAM_ROOT, реестр Windows, стандартные пути ОС)"""
+        return find_steam_root()
+
+    def _parse_log_line(self, line: str) -> Optional[Dict]:
+        """Разбирает одну строку content_log"""
+        if self.recorder is not None:
+            self.recorder.add_line(line)
+        record = parse_line(line)
+        if record is None:
             return None
 
-    def _parse_logs_for_downloads(self) -> List[Dict]:
-        """Парсит логи Steam для поиска загрузок"""
-        downloads = []
-        logs_path = self.steam_path / "logs"
-
-        if not logs_path.exists():
-            return downloads
+        return {
+            'app_id': record.app_id,
+            'speed': record.speed_mbps,
+            'progress': record.progress,
+            'timestamp': datetime.now()
+        }
 
+    def _parse_logs_for_downloads(self) -> List[Dict]:
+        """Записи о загрузках, дописанные в логи Steam с прошлой проверки"""
+        events = []
         try:
-            # Ищем свежие логи
-            log_files = sorted(
-                [f for f in logs_path.glob("*.log") if "content_log" in f.name],
-                key=lambda x: x.stat().st_mtime,
-                reverse=True
-            )
-
-            if not log_files:
-                return downloads
-
-            latest_log = log_files[0]
-
-            # Читаем последние 100 строк лога
-            with open(latest_log, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()[-100:]
-
-            current_app = None
-            for line in reversed(lines):  # Читаем с конца
-                # Поиск информации о загрузке
-                if "Downloading" in line or "download" in line.lower():
-                    # Ищем AppID
-                    app_match = re.search(r'app[_\s]?id[\s:=]+(\d+)', line, re.IGNORECASE)
-                    if app_match:
-                        app_id = app_match.group(1)
-
-                        # Ищем скорость
-                        speed_match = re.search(r'(\d+(?:\.\d+)?)\s*(?:MB|mb|KB|kb)/s', line, re.IGNORECASE)
-                        speed = 0.0
-                        if speed_match:
-                            speed_val = float(speed_match.group(1))
-                            if 'KB' in line.upper():
-                                speed = speed_val / 1024  # KB/s → MB/s
-                            else:
-                                speed = speed_val
-
-                        # Ищем прогресс
-                        progress_match = re.search(r'(\d+(?:\.\d+)?)%', line)
-                        progress = float(progress_match.group(1)) if progress_match else 0.0
-
-                        downloads.append({
-                            'app_id': app_id,
-                            'speed': speed,
-                            'progress': progress,
-                            'timestamp': datetime.now()
-                        })
-
+            # Прошлые записи не повторяются: если лог молчит, статус берется из appmanifest и папки
+            events.extend(self.log_tailer.read_events())
         except Exception as e:
             logger.error(f"Ошибка парсинга логов: {e}")
-
-        return downloads
+        return events
 
     def _get_game_name(self, app_id: str) -> str:
         """Получает название игры по AppID"""
-        # Проверяем appmanifest файлы
-        for lib in self._get_all_libraries():
-            manifest = lib / "steamapps" / f"appmanifest_{app_id}.acf"
-            if manifest.exists():
-                try:
-                    with open(manifest, 'r', encoding='utf-8') as f:
-                        content = f.read()
+        # Кэш читает appmanifest только при промахе, Store API - в фоне
+        with self.profiler.stage("game_name"):
+            name = self.name_cache.get_name(
+                app_id,
+                lambda: [lib / "steamapps" / f"appmanifest_{app_id}.acf" for lib in self._get_all_libraries()]
+            )
+        return name or f"Игра (AppID: {app_id})"
+
+    def _get_all_libraries(self) -> List[Path]:
+        """Получает все библиотеки Steam"""
+        return self.library_registry.available
 
-                    # Ищем название
-                    name_match = re.search(r'"name"\s+"([^"]+)"', content)
-                    if name_match:
-                        return name_match.group(1)
-                except:
-                    pass
+    def _scan_library(self, library: Path) -> Dict[str, Dict]:
+        """Находит загрузки одной библиотеки: папки downloading и appmanifest"""
+        found: Dict[str, Dict] = {}
+        steamapps = library / "steamapps"
 
-        # Альтернативный источник
+        # Папки downloading/<appid>
         try:
-            import requests
-            response = requests.get(f"https://store.steampowered.com/api/appdetails?appids={app_id}")
-            if response.status_code == 200:
-                data = response.json()
-                if data.get(app_id, {}).get('success'):
-                    return data[app_id]['data']['name']
-        except:
+            with os.scandir(steamapps / "downloading") as it:
+                for entry in it:
+                    if entry.is_dir() and entry.name.isdigit():
+                        # Пересканируются только измененные каталоги
+                        with self.profiler.stage("size_walk"):
+                            with self._trackers_lock:
+                                tracker = get_tracker(self.size_trackers, entry.path, entry.path)
+                            folder_bytes = tracker.update()
+                        # Время последней записи трекер находит тем же обходом
+                        activity = classify_activity(tracker.newest_mtime)
+                        found[entry.name] = {
+                            'library': library,
+                            'manifest': None,
+                            'has_files': tracker.file_count > 0,
+                            'folder': entry.path,
+                            'folder_bytes': folder_bytes,
+                            'activity': activity,
+                        }
+        except OSError:
             pass
 
-        return f"Игра (AppID: {app_id})"
+        # appmanifest_*.acf (разбираются заново только при изменении)
+        seen = []
+        try:
+            with os.scandir(steamapps) as it:
+                for entry in it:
+                    name = entry.name
+                    if not (name.startswith("appmanifest_") and name.endswith(".acf")):
+                        continue
+                    seen.append(entry.path)
+                    manifest = self.manifest_cache.get(entry.path, entry.stat())
+                    if manifest is None:
+                        continue
+                    app_id = manifest.app_id or name[len("appmanifest_"):-len(".acf")]
+                    if app_id in found:
+                        found[app_id]['manifest'] = manifest
+                    else:
+                        found[app_id] = {'library': library, 'manifest': manifest, 'has_files': None}
+        except OSError:
+            pass
+        else:
+            # Удаленные appmanifest (игра удалена) больше не держатся в кэше
+            self.manifest_cache.retain(steamapps, seen)
 
-    def _get_all_libraries(self) -> List[Path]:
-        """Получает все библиотеки Steam"""
-        libraries = [self.steam_path]
+        return found
 
-        library_file = self.steam_path / "steamapps" / "libraryfolders.vdf"
-        if library_file.exists():
-            try:
-                with open(library_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-
-                # Ищем все пути
-                path_matches = re.findall(r'"path"\s+"([^"]+)"', content)
-                for path in path_matches:
-                    lib_path = Path(path.replace('\\\\', '\\'))
-                    if lib_path.exists() and lib_path not in libraries:
-                        libraries.append(lib_path)
-            except:
-                pass
-
-        return libraries
-
-    def check_downloads(self) -> List[DownloadInfo]:
-        """Проверяет текущие загрузки"""
-        downloads = []
+    def _scan_libraries(self) -> Dict[str, Dict]:
+        """Сканирует все библиотеки параллельно, медленный диск не задерживает остальные"""
+        libraries = self._get_all_libraries()
+        if len(libraries) == 1:
+            results = [self._scan_library(libraries[0])]
+        else:
+            if self.scan_executor is None:
+                self.scan_executor = ThreadPoolExecutor(
+                    max_workers=min(8, len(libraries)),
+                    thread_name_prefix="library-scan"
+                )
+            results = self.scan_executor.map(self._scan_library, libraries)
+
+        return self._merge_scans(results)
+
+    @staticmethod
+    def _merge_scans(results) -> Dict[str, Dict]:
+        """Объединяет результаты сканирования библиотек"""
+        scanned: Dict[str, Dict] = {}
+        for result in results:
+            for app_id, item in result.items():
+                # Приоритет у библиотеки, где есть папка downloading
+                if app_id not in scanned or item['has_files'] is not None:
+                    scanned[app_id] = item
+        return scanned
+
+    def _update_state(self, app_id: str, state: str) -> Tuple[str, bool]:
+        """Обновляет машину состояний загрузки"""
+        machine = self.download_states.get(app_id)
+        if machine is None:
+            machine = DownloadStateMachine(app_id, state)
+            self.download_states[app_id] = machine
+            return machine.state, True
+        changed = machine.update(state)
+        return machine.state, changed
+
+    def _collect_log_speeds(self, now: float) -> Dict[str, Tuple[Dict, Optional[float]]]:
+        """Способ 1: загрузки из логов со средней скоростью (None, если строки были без скорости)"""
+        log_speeds: Dict[str, Tuple[Dict, Optional[float]]] = {}
+
+        for log_dl in self._parse_logs_for_downloads():
+            app_id = log_dl['app_id']
 
-        # Способ 1: Парсинг логов
-        log_downloads = self._parse_logs_for_downloads()
+            if log_dl['speed'] is not None:
+                # Каждое новое измерение попадает в историю один раз, средняя за 5 минут считается за O(1)
+                avg_speed = self.speed_history.add(app_id, log_dl['speed'], now).mean
+            else:
+                # Строка без скорости не означает остановку загрузки
+                previous = log_speeds.get(app_id)
+                avg_speed = previous[1] if previous is not None else None
 
-        for log_dl in log_downloads:
-            app_id = log_dl['app_id']
+            log_speeds[app_id] = (log_dl, avg_speed)
+
+        return log_speeds
 
-            # Получаем историю скоростей
-            if app_id not in self.last_speeds:
-                self.last_speeds[app_id] = []
+    def check_downloads(self, now: Optional[float] = None) -> List[DownloadInfo]:
+        """Проверяет текущие загрузки во всех библиотеках (now - для воспроизведения записи)"""
+        profiler = self.profiler
+        if now is None:
+            now = time.monotonic()
 
-            # Добавляем текущую скорость
-            self.last_speeds[app_id].append((datetime.now(), log_dl['speed']))
+        # libraryfolders.vdf перечитывается только если изменился
+        with profiler.stage("libraries"):
+            self.library_registry.refresh()
 
-            # Очищаем старые записи (старше 5 минут)
-            self.last_speeds[app_id] = [
-                (t, s) for t, s in self.last_speeds[app_id]
-                if datetime.now() - t < timedelta(minutes=5)
-            ]
+        # Способ 1: Парсинг логов
+        with profiler.stage("parse_logs"):
+            log_speeds = self._collect_log_speeds(now)
+
+        # Способ 2: Папки downloading и appmanifest во всех библиотеках
+        with profiler.stage("scan_libraries"):
+            scanned = self._scan_libraries()
 
-            # Рассчитываем среднюю скорость
-            avg_speed = 0.0
-            if self.last_speeds[app_id]:
-                speeds = [s for _, s in self.last_speeds[app_id]]
-                avg_speed = sum(speeds) / len(speeds)
+        with profiler.stage("build_downloads"):
+            downloads = self._build_downloads(log_speeds, scanned, now)
+
+        return downloads
 
-            # Определяем статус
-            status = "downloading"
-            if avg_speed < 0.01:  # Меньше 10 KB/s
-                status = "paused"
+    def _build_downloads(self, log_speeds: Dict[str, Tuple[Dict, Optional[float]]],
+                         scanned: Dict[str, Dict], now: float) -> List[DownloadInfo]:
+        """Сводит данные логов и библиотек в список загрузок"""
+        downloads = []
 
-            # Получаем имя игры
-            game_name = self._get_game_name(app_id)
+        app_ids = list(log_speeds)
+        for app_id, item in scanned.items():
+            if app_id in log_speeds:
+                continue
+            manifest = item['manifest']
+            if (item['has_files'] is not None
+                    or (manifest is not None and is_pending(manifest))
+                    or app_id in self.download_states):
+                app_ids.append(app_id)
+
+        for app_id in app_ids:
+            item = scanned.get(app_id, {})
+            manifest = item.get('manifest')
+
+            # Оценщик получает счетчики каждый опрос, даже когда скорость есть в логе
+            estimate = self.speed_estimator.update(
+                app_id, now,
+                manifest.bytes_downloaded if manifest is not None else None,
+                item.get('folder_bytes')
+            )
+            speed, confidence = estimate.speed_mbps, estimate.confidence
+            progress = 0.0
+
+            if app_id in log_speeds:
+                log_dl, log_speed = log_speeds[app_id]
+                progress = log_dl['progress']
+                if log_speed is not None:
+                    # Скорость, которую сообщает сам Steam
+                    speed, confidence = log_speed, 1.0
+
+            downloaded_bytes = total_bytes = 0
+            if manifest is not None:
+                downloaded_bytes = manifest.bytes_downloaded
+                total_bytes = manifest.total_bytes
+                if total_bytes > 0:
+                    progress = round(manifest.progress, 1)
+
+            activity = item.get('activity')
+            activity_state = activity.state if activity is not None else None
+            status, changed = self._update_state(app_id, classify(manifest, speed, activity_state))
+
+            # Завершенная загрузка показывается один раз, если о ней молчат логи
+            if status == COMPLETED and not changed and app_id not in log_speeds:
+                continue
 
             # Создаем объект загрузки
             download = DownloadInfo(
                 app_id=app_id,
-                game_name=game_name,
+                game_name=self._get_game_name(app_id),
                 status=status,
-                speed_mbps=avg_speed,
-                progress=log_dl['progress'],
-                downloaded_bytes=0,
-                total_bytes=0,
-                last_update=datetime.now()
+                speed_mbps=speed if status == DOWNLOADING else 0.0,
+                progress=progress,
+                downloaded_bytes=downloaded_bytes,
+                total_bytes=total_bytes,
+                last_update=datetime.now(),
+                library_path=item.get('library'),
+                speed_confidence=confidence,
+                activity=activity_state
             )
 
             downloads.append(download)
 
-        # Способ 2: Проверка папки downloading
-        if not downloads:
-            for library in self._get_all_libraries():
-                downloading_path = library / "steamapps" / "downloading"
-                if downloading_path.exists():
-                    for folder in downloading_path.iterdir():
-                        if folder.is_dir():
-                            app_id = folder.name
-
-                            # Проверяем, активна ли загрузка
-                            files = list(folder.rglob("*"))
-                            if files:
-                                status = "downloading"
-                                # Примерная скорость (можно улучшить)
-                                speed = 5.0  # MB/s, заменить на реальный расчет
-                            else:
-                                status = "paused"
-                                speed = 0.0
-
-                            game_name = self._get_game_name(app_id)
-
-                            download = DownloadInfo(
-                                app_id=app_id,
-                                game_name=game_name,
-                                status=status,
-                                speed_mbps=speed,
-                                progress=0.0,
-                                downloaded_bytes=0,
-                                total_bytes=0,
-                                last_update=datetime.now()
-                            )
-
-                            downloads.append(download)
+        self.queue_eta = self.eta.update(downloads, now)
+        for download in downloads:
+            download.eta_seconds = self.queue_eta.per_app.get(download.app_id)
 
         self.active_downloads = {d.app_id: d for d in downloads}
+        # Машины состояний только у загрузок, которые еще могут попасть в проверку:
+        # завершенная без папки downloading больше не проверяется
+        for app_id in [a for a, m in self.download_states.items()
+                       if (a not in scanned and a not in log_speeds)
+                       or (m.state == COMPLETED and scanned.get(a, {}).get('has_files') is None)]:
+            del self.download_states[app_id]
+        self.speed_estimator.retain(app_ids)
+        folders = {item['folder'] for item in scanned.values() if item.get('folder')}
+        with self._trackers_lock:
+            for path in [p for p in self.size_trackers if p not in folders]:
+                del self.size_trackers[path]
+        # Строки лога забираются здесь: в потоке состояния, до следующего чтения лога
+        log_lines = self.recorder.take_lines() if self.recorder is not None else None
+        self.last_check = CheckResult(downloads, scanned, now, time.monotonic() - now,
+                                      self.queue_eta, log_lines)
+        if self.inline_exports:
+            self._export(self.last_check)
+        self.speed_history.evict_idle(now)
+        self.name_cache.flush()
         return downloads
 
+    def _export(self, check: CheckResult):
+        """Передает проверку в историю, метрики, агент, запись сессии и уведомления"""
+        downloads = check.downloads
+        if self.sample_store is not None:
+            self.sample_store.add(downloads)
+        if self.metrics is not None:
+            self.metrics.update(downloads, check.duration, check.queue_eta.eta_seconds)
+        if self.agent is not None:
+            self.agent.submit(downloads)
+        if self.recorder is not None:
+            self.recorder.record(check.now, check.scanned, downloads, check.log_lines)
+        if self.notifier is not None:
+            self.notifier.observe(downloads, check.now)
+
     def format_speed(self, speed_mb: float) -> str:
         """Форматирует скорость"""
         if speed_mb >= 100:
@@ -285,60 +436,220 @@ class RealSteamMonitor:
         else:
             return "0 B/s"
 
-    def monitor(self, interval: int = 60, duration: int = 5):
-        """Основной цикл мониторинга"""
-        print("=" * 70)
-        print("🎮 Steam Download Monitor - Реальный мониторинг")
-        print(f"📁 Путь к Steam: {self.steam_path}")
-        print(f"⏱  Интервал: {interval} сек, Длительность: {duration} мин")
-        print("=" * 70)
+    def _create_watcher(self, backend: str):
+        """Наблюдатель за steamapps/downloading, appmanifest и логами"""
+        return create_watcher(
+            [lib / "steamapps" for lib in self._get_all_libraries()],
+            self.steam_path / "logs",
+            backend
+        )
+
+    def _print_downloads(self, update_count: int, downloads: List[DownloadInfo]):
+        """Печатает блок с текущими загрузками"""
+        print(f"\n📊 Обновление #{update_count} - {datetime.now().strftime('%H:%M:%S')}")
+        print("-" * 70)
+
+        if downloads:
+            for i, dl in enumerate(downloads, 1):
+                status_icon = STATUS_ICONS.get(dl.status, "ℹ️")
+                speed_str = self.format_speed(dl.speed_mbps)
+
+                print(f"{i}. {status_icon} {dl.game_name}")
+                print(f"   AppID: {dl.app_id}")
+                print(f"   Статус: {dl.status}")
+                if dl.speed_mbps > 0 and dl.speed_confidence < 1.0:
+                    speed_str += f" (достоверность {dl.speed_confidence:.0%})"
+                print(f"   Скорость: {speed_str}")
+
+                if dl.progress > 0:
+                    print(f"   Прогресс: {dl.progress}%")
+                    # Простой прогресс-бар
+                    bars = min(20, int(dl.progress / 5))
+                    print(f"   [{'█' * bars}{'░' * (20 - bars)}]")
+
+                if dl.eta_seconds:
+                    print(f"   Осталось: {format_eta(dl.eta_seconds)}")
+                if dl.activity == STALLED:
+                    print("   ⚠️  Steam давно ничего не записывал в папку загрузки")
+
+                print(f"   Библиотека: {dl.library_path or self.steam_path}")
+                print()
+            if len(downloads) > 1 and self.queue_eta.eta_seconds:
+                print(f"⏳ Вся очередь: {format_eta(self.queue_eta.eta_seconds)} "
+                      f"({self.queue_eta.remaining_bytes / 1024 ** 3:.1f} GB)")
+        else:
+            print("ℹ️  Активных загрузок не обнаружено")
+            print("💡 Совет: Начните загрузку игры в Steam")
 
-        end_time = datetime.now() + timedelta(minutes=duration)
+        print("-" * 70)
+
+    def _render(self, update_count: int, downloads: List[DownloadInfo], quiet: bool):
+        """Выводит результат проверки: JSON Lines, панель, блок в консоли или строка в логе"""
+        with self.profiler.stage("render"):
+            if self.json_output is not None:
+                try:
+                    self.json_output.write(downloads, update_count)
+                except BrokenPipeError:
+                    raise MonitorStopped("получатель JSON Lines закрыл поток")
+            elif self.dashboard is not None:
+                # Панель рисуется в своем потоке, здесь только передается снимок
+                self.dashboard.submit(update_count, downloads, self.queue_eta.eta_seconds)
+            elif quiet:
+                self._log_downloads(downloads)
+            else:
+                self._print_downloads(update_count, downloads)
+
+    def _log_downloads(self, downloads: List[DownloadInfo]):
+        """Одна строка в лог вместо блока в консоли (режим демона)"""
+        if downloads:
+            logger.info("; ".join(
+                f"{dl.app_id} {dl.status} {self.format_speed(dl.speed_mbps)} {dl.progress}%"
+                + (f" ETA {format_eta(dl.eta_seconds)}" if dl.eta_seconds else "")
+                for dl in downloads
+            ))
+
+    def monitor(self, interval: int = 60, duration: Optional[float] = 5, backend: str = "auto",
+                scheduler: Optional[PollScheduler] = None, quiet: bool = False):
+        """
+        Основной цикл мониторинга.
+        duration - в минутах, None или 0 - без ограничения (режим демона).
+        """
+        watcher = self._create_watcher(backend)
+        scheduler = scheduler or PollScheduler(interval)
+
+        if self.dashboard is not None:
+            self.dashboard.start()
+        elif not quiet:
+            print("=" * 70)
+            print("🎮 Steam Download Monitor - Реальный мониторинг")
+            print(f"📁 Путь к Steam: {self.steam_path}")
+            duration_text = f"{duration} мин" if duration else "без ограничения"
+            print(f"⏱  Интервал: {interval} сек, Длительность: {duration_text}")
+            print("=" * 70)
+        else:
+            logger.info(f"Мониторинг запущен (интервал {scheduler.fast_interval}-"
+                        f"{scheduler.idle_interval} сек)")
+
+        end_time = time.monotonic() + duration * 60 if duration else None
         update_count = 0
 
         try:
-            while datetime.now() < end_time:
-                downloads = self.check_downloads()
-                update_count += 1
-
-                print(f"\n📊 Обновление #{update_count} - {datetime.now().strftime('%H:%M:%S')}")
-                print("-" * 70)
-
-                if downloads:
-                    for i, dl in enumerate(downloads, 1):
-                        status_icon = "⬇️" if dl.status == "downloading" else "⏸️"
-                        speed_str = self.format_speed(dl.speed_mbps)
-
-                        print(f"{i}. {status_icon} {dl.game_name}")
-                        print(f"   AppID: {dl.app_id}")
-                        print(f"   Статус: {dl.status}")
-                        print(f"   Скорость: {speed_str}")
-
-                        if dl.progress > 0:
-                            print(f"   Прогресс: {dl.progress}%")
-                            # Простой прогресс-бар
-                            bars = min(20, int(dl.progress / 5))
-                            print(f"   [{'█' * bars}{'░' * (20 - bars)}]")
-
-                        print(f"   Библиотека: {self.steam_path}")
-                        print()
-                else:
-                    print("ℹ️  Активных загрузок не обнаружено")
-                    print("💡 Совет: Начните загрузку игры в Steam")
-
-                print("-" * 70)
-
-                # Ожидание до следующего обновления
-                wait_time = min(interval, (end_time - datetime.now()).total_seconds())
-                if wait_time > 0:
-                    time.sleep(wait_time)
-                else:
-                    break
+            with stop_on_sigterm():
+                while end_time is None or time.monotonic() < end_time:
+                    with self.profiler.stage("check_downloads"):
+                        downloads = self.check_downloads()
+                    update_count += 1
+
+                    self._render(update_count, downloads, quiet)
+
+                    # Ожидание до следующего обновления или до изменений на диске
+                    wait_time = scheduler.next_delay(downloads)
+                    if end_time is not None:
+                        wait_time = min(wait_time, end_time - time.monotonic())
+                    if wait_time > 0:
+                        if watcher.wait(wait_time):
+                            # Проверка сразу после события, но не чаще event_gap
+                            delay = scheduler.event_delay()
+                            if end_time is not None:
+                                delay = min(delay, end_time - time.monotonic())
+                            if delay > 0:
+                                time.sleep(delay)
+                            scheduler.reset()
+                    elif end_time is not None:
+                        break
 
         except KeyboardInterrupt:
-            print("\n\n⚠️  Мониторинг прерван пользователем")
+            if quiet:
+                logger.info("Мониторинг прерван пользователем")
+            else:
+                print("\n\n⚠️  Мониторинг прерван пользователем")
+        except MonitorStopped as e:
+            logger.info(f"Мониторинг остановлен: {e}")
         finally:
+            watcher.close()
+            self._shutdown()
+
+    def monitor_async(self, interval: int = 60, duration: Optional[float] = 5, backend: str = "auto",
+                      scheduler: Optional[PollScheduler] = None, quiet: bool = False):
+        """То же, что monitor(), но на asyncio: медленный диск или сеть не задерживают проверку"""
+        import asyncio
+        from async_engine import AsyncMonitorEngine
+
+        engine = AsyncMonitorEngine(self, scheduler or PollScheduler(interval))
+        update_count = 0
+
+        def render(downloads: List[DownloadInfo]):
+            nonlocal update_count
+            update_count += 1
+            try:
+                self._render(update_count, downloads, quiet)
+            except MonitorStopped as e:
+                logger.info(f"Мониторинг остановлен: {e}")
+                engine.stop()
+
+        engine.add_consumer(render)
+        # История, метрики, агент, запись и уведомления - вне потока состояния, без пропусков
+        self.inline_exports = False
+        engine.add_exporter(self._export)
+
+        if self.dashboard is not None:
+            self.dashboard.start()
+        elif not quiet:
+            print("=" * 70)
+            print("🎮 Steam Download Monitor - Реальный мониторинг (asyncio)")
+            print(f"📁 Путь к Steam: {self.steam_path}")
+            duration_text = f"{duration} мин" if duration else "без ограничения"
+            print(f"⏱  Интервал: {interval} сек, Длительность: {duration_text}")
+            print("=" * 70)
+
+        try:
+            asyncio.run(engine.run(duration, backend))
+        except KeyboardInterrupt:
+            if quiet:
+                logger.info("Мониторинг прерван пользователем")
+            else:
+                print("\n\n⚠️  Мониторинг прерван пользователем")
+        finally:
+            self.inline_exports = True
+            self._shutdown()
+
+    def _shutdown(self):
+        """Останавливает фоновые потоки, сохраняет кэши и печатает итоги"""
+        if self.dashboard is not None:
+            self.dashboard.close()
+        if self.scan_executor is not None:
+            self.scan_executor.shutdown(wait=False)
+        # stdout может быть занят потоком JSON Lines
+        console = self.json_output is None or not self.json_output.to_stdout
+        if self.json_output is not None:
+            self.json_output.close()
+        if console:
             self._print_summary()
+        self.name_cache.close()
+        if self.profiler.enabled:
+            if console:
+                self._print_profile()
+            else:
+                self.profiler.log_summary()
+        if self.sample_store is not None:
+            self.sample_store.close()
+        if self.metrics is not None:
+            self.metrics.close()
+        if self.agent is not None:
+            self.agent.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.notifier is not None:
+            self.notifier.close()
+
+    def _print_profile(self):
+        """Печатает время этапов проверки (--profile)"""
+        print("\n" + "=" * 70)
+        print("⏱  Профиль проверки")
+        print("=" * 70)
+        for line in self.profiler.format_summary():
+            print(line)
+        self.profiler.log_summary()
 
     def _print_summary(self):
         """Печатает итоговую статистику"""
@@ -352,28 +663,147 @@ class RealSteamMonitor:
                 print(f"   Финальный статус: {dl.status}")
                 print(f"   Последняя скорость: {self.format_speed(dl.speed_mbps)}")
 
-                if app_id in self.last_speeds and self.last_speeds[app_id]:
-                    speeds = [s for _, s in self.last_speeds[app_id]]
-                    if speeds:
-                        avg = sum(speeds) / len(speeds)
-                        max_speed = max(speeds)
-                        print(f"   Средняя скорость: {self.format_speed(avg)}")
-                        print(f"   Максимальная скорость: {self.format_speed(max_speed)}")
+                series = self.speed_history.get(app_id)
+                if series:
+                    print(f"   Средняя скорость: {self.format_speed(series.mean)}")
+                    print(f"   Максимальная скорость: {self.format_speed(series.peak)}")
         else:
             print("ℹ️  За время мониторинга загрузок не обнаружено")
 
         print("\n✅ Мониторинг завершен")
 
 
-def main():
+def setup_logging(log_file: Optional[str] = LOG_FILE, level: int = logging.INFO, console: bool = True):
+    """Настраивает вывод логов в консоль и файл (вызывается из main, не при импорте)"""
+    handlers: List[logging.Handler] = [logging.StreamHandler()] if console else []
+    if log_file:
+        handlers.insert(0, logging.FileHandler(log_file, encoding='utf-8'))
+    logging.basicConfig(level=level, format=LOG_FORMAT, handlers=handlers)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Параметры командной строки"""
+    parser = argparse.ArgumentParser(description="Steam Download Monitor")
+    parser.add_argument("--interval", type=float, default=60,
+                        help="интервал проверки, сек (по умолчанию 60)")
+    parser.add_argument("--duration", type=float, default=5,
+                        help="длительность мониторинга, мин; 0 - без ограничения (по умолчанию 5)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="фоновый режим: без ограничения времени, адаптивный интервал, вывод в лог")
+    parser.add_argument("--fast-interval", type=float, default=None,
+                        help="интервал, пока идет загрузка, сек (в режиме демона по умолчанию 5)")
+    parser.add_argument("--idle-interval", type=float, default=None,
+                        help="максимальный интервал без загрузок, сек (в режиме демона по умолчанию 300)")
+    parser.add_argument("--backend", choices=["auto", "inotify", "polling"], default="auto",
+                        help="как ждать изменений между проверками")
+    parser.add_argument("--history", nargs="?", const="", default=None, metavar="DB",
+                        help="сохранять измерения в SQLite (по умолчанию в кэше пользователя)")
+    parser.add_argument("--retention-days", type=float, default=7,
+                        help="через сколько дней прореживать историю (по умолчанию 7)")
+    parser.add_argument("--metrics-port", type=int, default=None, metavar="PORT",
+                        help="отдавать метрики Prometheus на http://HOST:PORT/metrics")
+    parser.add_argument("--metrics-host", default="127.0.0.1",
+                        help="адрес для метрик (по умолчанию 127.0.0.1)")
+    parser.add_argument("--profile", action="store_true",
+                        help="замерять время этапов проверки и вывести сводку при выходе")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="асинхронный движок: диски и сеть не блокируют друг друга")
+    parser.add_argument("--format", dest="output_format", choices=["text", "jsonl"], default="text",
+                        help="text - для человека, jsonl - одна JSON-строка на загрузку в каждой проверке")
+    parser.add_argument("--output", default=None, metavar="PATH",
+                        help="файл для --format jsonl (по умолчанию stdout)")
+    parser.add_argument("--dashboard", action="store_true",
+                        help="живая панель в терминале вместо построчного вывода")
+    parser.add_argument("--fps", type=float, default=4,
+                        help="кадров в секунду для --dashboard (по умолчанию 4)")
+    parser.add_argument("--agent", default=None, metavar="ADDRESS",
+                        help="отправлять изменения коллектору (fleet.py): tcp://HOST:PORT или unix:PATH")
+    parser.add_argument("--agent-name", default=None, metavar="NAME",
+                        help="имя машины для коллектора (по умолчанию имя хоста)")
+    parser.add_argument("--notify-desktop", action="store_true",
+                        help="уведомления на рабочем столе (notify-send)")
+    parser.add_argument("--notify-webhook", default=None, metavar="URL",
+                        help="отправлять уведомления POST-запросом с JSON")
+    parser.add_argument("--notify-command", default=None, metavar="CMD",
+                        help="выполнять команду; текст в переменных STEAM_NOTIFY_*")
+    parser.add_argument("--stall-minutes", type=float, default=10,
+                        help="через сколько минут без прогресса загрузка считается зависшей (по умолчанию 10)")
+    parser.add_argument("--slow-mbps", type=float, default=None, metavar="MBPS",
+                        help="уведомлять, если скорость дольше минуты ниже порога (MB/s)")
+    parser.add_argument("--record", default=None, metavar="PATH",
+                        help="записывать логи, appmanifest и размеры папок для replay.py")
+    parser.add_argument("--log-file", default=LOG_FILE, metavar="PATH",
+                        help=f"файл лога (по умолчанию {LOG_FILE}; пустая строка - только консоль)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """Точка входа"""
+    args = parse_args(argv)
+    jsonl = args.output_format == "jsonl"
+    # Сообщения в консоли испортили бы панель
+    dashboard = args.dashboard and not args.daemon and not jsonl and sys.stdout.isatty()
+    setup_logging(args.log_file, console=not dashboard)
+    if args.dashboard and not dashboard and not jsonl:
+        logger.warning("--dashboard работает только в терминале, используется обычный вывод")
     monitor = RealSteamMonitor()
-
-    # Настройки мониторинга
-    UPDATE_INTERVAL = 60  # секунды
-    MONITOR_DURATION = 5  # минуты
-
-    monitor.monitor(interval=UPDATE_INTERVAL, duration=MONITOR_DURATION)
+    monitor.profiler.enabled = args.profile
+
+    fast_interval = args.fast_interval
+    idle_interval = args.idle_interval
+    duration = args.duration
+    if args.daemon:
+        duration = 0
+        fast_interval = fast_interval or min(5.0, args.interval)
+        idle_interval = idle_interval or max(300.0, args.interval)
+
+    if args.history is not None:
+        from sample_store import SampleStore
+        monitor.sample_store = SampleStore(args.history or None, retention_days=args.retention_days)
+        monitor.sample_store.start()
+        logger.info(f"💾 История загрузок: {monitor.sample_store.path}")
+
+    if args.metrics_port is not None:
+        from metrics_exporter import MetricsExporter
+        monitor.metrics = MetricsExporter(args.metrics_host, args.metrics_port)
+        monitor.metrics.start()
+
+    if args.agent:
+        from fleet import FleetAgent
+        monitor.agent = FleetAgent(args.agent, args.agent_name)
+        monitor.agent.start()
+
+    if jsonl:
+        from json_output import JsonLinesWriter
+        monitor.json_output = JsonLinesWriter(args.output)
+
+    if args.notify_desktop or args.notify_webhook or args.notify_command:
+        from notifier import CommandSink, DesktopSink, Notifier, TransitionDetector, WebhookSink
+        sinks = []
+        if args.notify_desktop:
+            sinks.append(DesktopSink())
+        if args.notify_webhook:
+            sinks.append(WebhookSink(args.notify_webhook))
+        if args.notify_command:
+            sinks.append(CommandSink(args.notify_command))
+        detector = TransitionDetector(args.stall_minutes * 60, args.slow_mbps)
+        monitor.notifier = Notifier(sinks, detector)
+        monitor.notifier.start()
+
+    if args.record:
+        from replay import SessionRecorder
+        monitor.recorder = SessionRecorder(args.record, monitor.steam_path)
+        logger.info(f"⏺  Запись сессии: {args.record}")
+
+    if dashboard:
+        from dashboard import Dashboard
+        monitor.dashboard = Dashboard(fps=args.fps, format_speed=monitor.format_speed)
+
+    scheduler = PollScheduler(args.interval, fast_interval, idle_interval)
+    run = monitor.monitor_async if args.use_async else monitor.monitor
+    # Баннер и итоги не должны попадать в поток JSON Lines
+    run(interval=args.interval, duration=duration, backend=args.backend,
+        scheduler=scheduler, quiet=args.daemon or jsonl)
 
 
 if __name__ == "__main__":
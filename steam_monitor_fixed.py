@@ -1,18 +1,16 @@
-import os
 import sys
 import time
-import winreg
 import logging
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, Dict, Tuple
-import random
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+from vdf_parser import load_manifest, load_vdf, library_paths
+from size_tracker import get_tracker
+from speed_estimator import SpeedEstimator
+from steam_discovery import STEAM_ROOT_ENV, find_steam_root
+from activity import ACTIVE, STALLED, classify_activity
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,7 +18,7 @@ class SteamDownloadMonitor:
     def __init__(self):
         self.steam_path = self._find_steam_path()
         if not self.steam_path:
-            logger.error("Steam не найден на системе")
+            logger.error(f"Steam не найден на системе (можно указать путь в {STEAM_ROOT_ENV})")
             sys.exit(1)
 
         logger.info(f"Основной путь Steam: {self.steam_path}")
@@ -30,51 +28,12 @@ class SteamDownloadMonitor:
         logger.info(f"Найдено библиотек Steam: {len(self.all_libraries)}")
 
         self.download_history = {}
+        self.size_trackers = {}
+        self.speed_estimator = SpeedEstimator()
 
     def _find_steam_path(self) -> Optional[Path]:
-        """Находит путь установки Steam"""
-        # Сначала пробуем ваш конкретный путь
-        your_path = Path("G:/SteamLibrary")
-        if your_path.exists():
-            return your_path
-
-        # Затем стандартные пути
-        paths_to_check = [
-            Path("G:/SteamLibrary"),
-            Path("C:/Program Files (x86)/Steam"),
-            Path("C:/Program Files/Steam"),
-            Path(os.path.expanduser("~/Steam")),
-            Path("D:/Steam"),
-            Path("E:/Steam"),
-        ]
-
-        for path in paths_to_check:
-            if path.exists():
-                return path
-
-        # Ищем в реестре
-        try:
-            registry_paths = [
-                (winreg.HKEY_CURRENT_USER, r"Software\Valve\Steam"),
-                (winreg.HKEY_LOCAL_MACHINE, r"Software\Valve\Steam"),
-                (winreg.HKEY_LOCAL_MACHINE, r"Software\Wow6432Node\Valve\Steam")
-            ]
-
-            for hive, path in registry_paths:
-                try:
-                    key = winreg.OpenKey(hive, path, 0, winreg.KEY_READ)
-                    steam_path = winreg.QueryValueEx(key, "SteamPath")[0]
-                    winreg.CloseKey(key)
-
-                    path_obj = Path(steam_path)
-                    if path_obj.exists():
-                        return path_obj
-                except WindowsError:
-                    continue
-        except Exception as e:
-            logger.error(f"Ошибка поиска в реестре: {e}")
-
-        return None
+        """Находит путь установки Steam (STEAM_ROOT, реестр Windows, стандартные пути ОС)"""
+        return find_steam_root()
 
     def _get_all_steam_libraries(self) -> list:
         """Находит все библиотеки Steam"""
@@ -87,22 +46,12 @@ class SteamDownloadMonitor:
             library_file = self.steam_path / "steamapps" / "libraryfolders.vdf"
             if library_file.exists():
                 try:
-                    with open(library_file, 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
-
-                    for line in lines:
-                        if '"path"' in line.lower():
-                            # Извлекаем путь из строки вида: "path"		"D:\\SteamLibrary"
-                            parts = line.strip().split('"')
-                            if len(parts) >= 4:
-                                lib_path = parts[3]
-                                # Заменяем двойные слеши на одинарные
-                                lib_path = lib_path.replace('\\\\', '\\')
-                                lib_path_obj = Path(lib_path)
-
-                                if lib_path_obj.exists() and lib_path_obj not in libraries:
-                                    libraries.append(lib_path_obj)
-                                    logger.info(f"Дополнительная библиотека: {lib_path_obj}")
+                    for lib_path in library_paths(load_vdf(library_file)):
+                        lib_path_obj = Path(lib_path)
+
+                        if lib_path_obj.exists() and lib_path_obj not in libraries:
+                            libraries.append(lib_path_obj)
+                            logger.info(f"Дополнительная библиотека: {lib_path_obj}")
                 except Exception as e:
                     logger.error(f"Ошибка чтения libraryfolders.vdf: {e}")
 
@@ -114,10 +63,21 @@ class SteamDownloadMonitor:
             downloading_path = library / "steamapps" / "downloading"
 
             if downloading_path.exists():
-                folders = list(downloading_path.iterdir())
+                folders = [f for f in downloading_path.iterdir() if f.is_dir()]
 
                 if folders:
-                    app_id = folders[0].name
+                    # Из нескольких папок берем ту, куда Steam писал последним;
+                    # время последней записи трекер размера находит тем же обходом
+                    activity, folder, folder_bytes = None, folders[0], None
+                    for candidate in folders:
+                        tracker = get_tracker(self.size_trackers, str(candidate), candidate)
+                        candidate_bytes = tracker.update()
+                        candidate_activity = classify_activity(tracker.newest_mtime)
+                        if activity is None or (candidate_activity.newest_mtime or 0) > (activity.newest_mtime or 0):
+                            activity, folder, folder_bytes = candidate_activity, candidate, candidate_bytes
+                        if activity.state == ACTIVE:
+                            break
+                    app_id = folder.name
 
                     # Получаем имя игры
                     game_name = f"Игра (AppID: {app_id})"
@@ -127,33 +87,22 @@ class SteamDownloadMonitor:
                         acf_file = library2 / "steamapps" / f"appmanifest_{app_id}.acf"
                         if acf_file.exists():
                             try:
-                                with open(acf_file, 'r', encoding='utf-8') as f:
-                                    for line in f:
-                                        if '"name"' in line:
-                                            parts = line.strip().split('"')
-                                            if len(parts) >= 4:
-                                                game_name = parts[3]
-                                            break
+                                name = load_manifest(acf_file).name
+                                if name:
+                                    game_name = name
                             except:
                                 pass
                             break
 
-                    # Проверяем, идет ли загрузка
-                    download_folder = downloading_path / app_id
-                    if download_folder.exists():
-                        files = list(download_folder.rglob("*"))
-                        if files:
-                            status = "downloading"
-                        else:
-                            status = "paused"
-                    else:
-                        status = "downloading"
+                    # Идет ли загрузка - по времени последней записи в папку
+                    status = {ACTIVE: "downloading", STALLED: "stalled"}.get(activity.state, "paused")
 
                     return {
                         "app_id": app_id,
                         "status": status,
                         "game_name": game_name,
-                        "library_path": library
+                        "library_path": library,
+                        "folder_bytes": folder_bytes
                     }
 
         return None
@@ -167,90 +116,44 @@ class SteamDownloadMonitor:
 
         app_id = game_info["app_id"]
         library_path = game_info["library_path"]
+        steamapps = library_path / "steamapps"
 
-        # Реальный расчет скорости по изменению размера папки
-        download_folder = library_path / "steamapps" / "downloading" / app_id
-        current_time = time.time()
-
-        if download_folder.exists() and download_folder.is_dir():
+        # Основной источник - BytesDownloaded из appmanifest
+        bytes_downloaded = None
+        acf_file = steamapps / f"appmanifest_{app_id}.acf"
+        if acf_file.exists():
             try:
-                # Считаем общий размер всех файлов в папке
-                total_size = 0
-                file_count = 0
-
-                for file_path in download_folder.rglob("*"):
-                    if file_path.is_file():
-                        total_size += file_path.stat().st_size
-                        file_count += 1
-
-                logger.debug(f"Папка {app_id}: {file_count} файлов, {total_size / 1024 / 1024:.2f} MB")
-
-                # Инициализируем историю для этого AppID
-                if app_id not in self.download_history:
-                    self.download_history[app_id] = []
+                bytes_downloaded = load_manifest(acf_file).bytes_downloaded
+            except (OSError, ValueError) as e:
+                logger.error(f"Ошибка чтения appmanifest {app_id}: {e}")
 
-                # Добавляем текущее измерение
-                self.download_history[app_id].append((current_time, total_size))
+        # Запасной - размер папки downloading, посчитанный при поиске загрузки
+        folder_bytes = game_info["folder_bytes"]
+        if folder_bytes is not None:
+            logger.debug(f"Папка {app_id}: {folder_bytes / 1024 / 1024:.2f} MB")
 
-                # Ограничиваем историю последними 10 измерениями
-                self.download_history[app_id] = self.download_history[app_id][-10:]
+        estimate = self.speed_estimator.update(app_id, time.monotonic(), bytes_downloaded, folder_bytes)
 
-                # Рассчитываем скорость, если есть хотя бы 2 измерения
-                if len(self.download_history[app_id]) >= 2:
-                    # Берем два последних измерения
-                    history = self.download_history[app_id]
-                    (time1, size1), (time2, size2) = history[-2], history[-1]
-
-                    time_diff = time2 - time1
-                    size_diff = size2 - size1
-
-                    if time_diff > 0 and size_diff >= 0:
-                        # Байты в секунду → Мегабайты в секунду
-                        speed_bps = size_diff / time_diff
-                        speed_mb = speed_bps / (1024 * 1024)
-
-                        # Если скорость отрицательная или очень маленькая
-                        if speed_mb < 0.01:  # Меньше 10 KB/s
-                            game_info["status"] = "paused"
-                            speed_mb = 0.0
-
-                        return speed_mb, game_info
-                    else:
-                        # Размер не изменился или уменьшился
-                        game_info["status"] = "paused" if size_diff <= 0 else "checking"
-                        return 0.0, game_info
-
-                # Первое измерение - недостаточно данных
+        if estimate.confidence == 0:
+            # Первые измерения - недостаточно данных; если запись в папку идет, загрузка стартует
+            if game_info["status"] == "downloading":
                 game_info["status"] = "starting"
-                return 0.01, game_info  # Минимальная скорость для показа
-
-            except Exception as e:
-                logger.error(f"Ошибка расчета скорости для {app_id}: {e}")
-                # В случае ошибки возвращаем демо-данные
-                return self._get_demo_speed(game_info)
+            return 0.0, game_info
 
-        # Если папка не существует
-        return self._get_demo_speed(game_info)
+        # Сохраняем измерение для итоговой статистики (последние 10)
+        history = self.download_history.setdefault(app_id, [])
+        history.append(estimate.speed_mbps)
+        del history[:-10]
 
-    def _get_demo_speed(self, game_info: Dict) -> Tuple[float, Dict]:
-        """Возвращает демо-скорость для тестирования"""
-        # Для Ragnarok (215100) - реалистичная скорость
-        if game_info["app_id"] == "215100":
-            # Случайная скорость в разумных пределах
-            speeds = [0.0, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0]  # MB/s
-            speed = random.choice(speeds)
-
-            if speed == 0:
+        if estimate.speed_mbps < 0.01:  # Меньше 10 KB/s
+            # Недавняя запись в папку без роста счетчиков - загрузка застряла, а не на паузе
+            if game_info["status"] != "stalled":
                 game_info["status"] = "paused"
-            else:
-                game_info["status"] = "downloading"
+            return 0.0, game_info
+
+        game_info["status"] = "downloading"
+        return estimate.speed_mbps, game_info
 
-            return speed, game_info
-        else:
-            # Для других игр
-            speed = random.uniform(0.5, 20.0)
-            game_info["status"] = "downloading" if speed > 0.1 else "paused"
-            return speed, game_info
     def format_speed(self, speed_mb: float) -> str:
         """Форматирует скорость загрузки"""
         if speed_mb >= 1000:
@@ -272,8 +175,12 @@ class SteamDownloadMonitor:
                 speed, game_info = self.get_download_speed()
 
                 if game_info:
-                    status_emoji = "✅" if speed > 0 else "⏸️"
-                    status_text = "Загружается" if speed > 0 else "На паузе"
+                    if speed > 0:
+                        status_emoji, status_text = "✅", "Загружается"
+                    elif game_info["status"] == "stalled":
+                        status_emoji, status_text = "⚠️", "Застряла"
+                    else:
+                        status_emoji, status_text = "⏸️", "На паузе"
 
                     # Получаем прогресс
                     progress = self.get_download_progress(game_info)
@@ -320,22 +227,13 @@ class SteamDownloadMonitor:
                 print("Статистика загрузок:")
                 print("=" * 60)
 
-                for app_id, history in self.download_history.items():
-                    if history:
-                        speeds = []
-                        for i in range(1, len(history)):
-                            time1, size1 = history[i - 1]
-                            time2, size2 = history[i]
-                            if time2 > time1:
-                                speed = (size2 - size1) / (time2 - time1) / (1024 * 1024)
-                                speeds.append(speed)
-
-                        if speeds:
-                            avg_speed = sum(speeds) / len(speeds)
-                            max_speed = max(speeds)
-                            print(f"\nAppID {app_id}:")
-                            print(f"  Средняя скорость: {self.format_speed(avg_speed)}")
-                            print(f"  Максимальная скорость: {self.format_speed(max_speed)}")
+                for app_id, speeds in self.download_history.items():
+                    if speeds:
+                        avg_speed = sum(speeds) / len(speeds)
+                        max_speed = max(speeds)
+                        print(f"\nAppID {app_id}:")
+                        print(f"  Средняя скорость: {self.format_speed(avg_speed)}")
+                        print(f"  Максимальная скорость: {self.format_speed(max_speed)}")
 
     def get_download_progress(self, game_info: Dict) -> Optional[float]:
         """Получает прогресс загрузки в процентах"""
@@ -347,52 +245,22 @@ class SteamDownloadMonitor:
             acf_file = library_path / "steamapps" / f"appmanifest_{app_id}.acf"
 
             if acf_file.exists():
-                with open(acf_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-
-                # Ищем размер игры и размер загруженного
-                import re
-
-                # Общий размер игры
-                size_match = re.search(r'"SizeOnDisk"\s+"(\d+)"', content)
-                # Загруженный размер
-                downloaded_match = re.search(r'"BytesDownloaded"\s+"(\d+)"', content)
-
-                if size_match and downloaded_match:
-                    total_size = int(size_match.group(1))
-                    downloaded_size = int(downloaded_match.group(1))
-
-                    if total_size > 0:
-                        progress = (downloaded_size / total_size) * 100
-                        return round(progress, 1)
-
-            # Альтернативный метод: смотрим размер папки downloading
-            download_folder = library_path / "steamapps" / "downloading" / app_id
-            if download_folder.exists():
-                # Получаем размер установленной игры для сравнения
-                common_folder = library_path / "steamapps" / "common"
-                game_folder = None
-
-                for folder in common_folder.iterdir():
-                    if folder.is_dir():
-                        # Проверяем есть ли appmanifest с таким же AppID
-                        manifest = library_path / "steamapps" / f"appmanifest_{app_id}.acf"
-                        if manifest.exists():
-                            with open(manifest, 'r', encoding='utf-8') as f:
-                                if f'"{app_id}"' in f.read():
-                                    game_folder = folder
-                                    break
-
-                # Это приблизительная оценка
-                return None
-
+                manifest = load_manifest(acf_file)
+                if manifest.total_bytes > 0:
+                    return round(manifest.progress, 1)
         except Exception as e:
             logger.error(f"Ошибка получения прогресса: {e}")
 
         return None
 def main():
+    # Настройка логирования
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
     print("=" * 60)
-    print("Steam Download Monitor v1.0 (Fixed for G:/SteamLibrary)")
+    print("Steam Download Monitor v1.0 (Fixed)")
     print("=" * 60)
 
     monitor = SteamDownloadMonitor()
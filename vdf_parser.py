@@ -0,0 +1,231 @@
+"""
+Разбор файлов Valve KeyValues (VDF/ACF)
+Потоковый токенизатор + типизированный AppManifest для appmanifest_*.acf
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+VdfDict = Dict[str, Union[str, "VdfDict"]]
+
+# Токены: строка в кавычках, скобка, комментарий, слово без кавычек
+_TOKEN_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|([{}])|//[^\n]*|([^\s{}"]+)')
+_ESCAPE_RE = re.compile(r'\\(.)')
+_ESCAPES = {'n': '\n', 't': '\t', '\\': '\\', '"': '"'}
+
+# Типы токенов
+STRING = 0
+OPEN = 1
+CLOSE = 2
+
+
+class VdfError(ValueError):
+    """Синтаксическая ошибка VDF"""
+
+
+def _unescape(value: str) -> str:
+    if '\\' not in value:
+        return value
+    return _ESCAPE_RE.sub(lambda m: _ESCAPES.get(m.group(1), m.group(1)), value)
+
+
+def iter_tokens(text: str) -> Iterator[Tuple[int, str]]:
+    """Отдает токены VDF по одному"""
+    for match in _TOKEN_RE.finditer(text):
+        quoted, brace, bare = match.groups()
+        if quoted is not None:
+            yield STRING, _unescape(quoted)
+        elif brace is not None:
+            yield (OPEN if brace == '{' else CLOSE), brace
+        elif bare is not None:
+            yield STRING, bare
+        # комментарии пропускаются
+
+
+def parse_vdf(text: str, lower_keys: bool = False) -> VdfDict:
+    """Разбирает VDF в словарь вложенных словарей"""
+    root: VdfDict = {}
+    stack = [root]
+    key: Optional[str] = None
+
+    for kind, value in iter_tokens(text):
+        current = stack[-1]
+        if kind == STRING:
+            if key is None:
+                key = value.lower() if lower_keys else value
+            else:
+                current[key] = value
+                key = None
+        elif kind == OPEN:
+            if key is None:
+                raise VdfError("'{' без ключа")
+            child: VdfDict = {}
+            current[key] = child
+            stack.append(child)
+            key = None
+        else:
+            if len(stack) == 1:
+                raise VdfError("лишняя '}'")
+            stack.pop()
+            key = None
+
+    if len(stack) != 1:
+        raise VdfError("не закрыта '{'")
+    return root
+
+
+def load_vdf(path: Path, lower_keys: bool = False) -> VdfDict:
+    """Читает и разбирает VDF-файл"""
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        return parse_vdf(f.read(), lower_keys)
+
+
+def _int(section: VdfDict, key: str) -> int:
+    value = section.get(key)
+    try:
+        return int(value) if isinstance(value, str) else 0
+    except ValueError:
+        return 0
+
+
+class AppManifest:
+    """Содержимое appmanifest_<appid>.acf"""
+
+    __slots__ = (
+        'app_id', 'name', 'install_dir', 'state_flags', 'build_id', 'target_build_id',
+        'size_on_disk', 'bytes_to_download', 'bytes_downloaded',
+        'bytes_to_stage', 'bytes_staged', 'last_updated', 'installed_depots',
+    )
+
+    def __init__(self, app_id: str, name: str = "", install_dir: str = "",
+                 state_flags: int = 0, build_id: int = 0, target_build_id: int = 0,
+                 size_on_disk: int = 0, bytes_to_download: int = 0, bytes_downloaded: int = 0,
+                 bytes_to_stage: int = 0, bytes_staged: int = 0, last_updated: int = 0,
+                 installed_depots: Optional[Dict[str, int]] = None):
+        self.app_id = app_id
+        self.name = name
+        self.install_dir = install_dir
+        self.state_flags = state_flags
+        self.build_id = build_id
+        self.target_build_id = target_build_id
+        self.size_on_disk = size_on_disk
+        self.bytes_to_download = bytes_to_download
+        self.bytes_downloaded = bytes_downloaded
+        self.bytes_to_stage = bytes_to_stage
+        self.bytes_staged = bytes_staged
+        self.last_updated = last_updated
+        self.installed_depots = installed_depots or {}
+
+    @classmethod
+    def from_vdf(cls, data: VdfDict) -> "AppManifest":
+        """Строит манифест из разобранного VDF (ключи в нижнем регистре)"""
+        state = data.get('appstate')
+        if not isinstance(state, dict):
+            raise VdfError("нет секции AppState")
+
+        depots = {}
+        installed = state.get('installeddepots')
+        if isinstance(installed, dict):
+            for depot_id, depot in installed.items():
+                if isinstance(depot, dict):
+                    depots[depot_id] = _int(depot, 'size')
+
+        name = state.get('name')
+        install_dir = state.get('installdir')
+        return cls(
+            app_id=str(state.get('appid', '')),
+            name=name if isinstance(name, str) else "",
+            install_dir=install_dir if isinstance(install_dir, str) else "",
+            state_flags=_int(state, 'stateflags'),
+            build_id=_int(state, 'buildid'),
+            target_build_id=_int(state, 'targetbuildid'),
+            size_on_disk=_int(state, 'sizeondisk'),
+            bytes_to_download=_int(state, 'bytestodownload'),
+            bytes_downloaded=_int(state, 'bytesdownloaded'),
+            bytes_to_stage=_int(state, 'bytestostage'),
+            bytes_staged=_int(state, 'bytesstaged'),
+            last_updated=_int(state, 'lastupdated'),
+            installed_depots=depots,
+        )
+
+    @property
+    def total_bytes(self) -> int:
+        """Сколько всего нужно скачать (SizeOnDisk, если Steam не указал BytesToDownload)"""
+        return self.bytes_to_download or self.size_on_disk
+
+    @property
+    def progress(self) -> float:
+        """Прогресс загрузки 0-100"""
+        total = self.total_bytes
+        if total <= 0:
+            return 0.0
+        return min(100.0, self.bytes_downloaded / total * 100)
+
+    def __repr__(self):
+        return (f"AppManifest(app_id={self.app_id!r}, name={self.name!r}, "
+                f"state_flags={self.state_flags}, {self.bytes_downloaded}/{self.total_bytes})")
+
+
+def load_manifest(path: Path) -> AppManifest:
+    """Читает appmanifest_*.acf"""
+    return AppManifest.from_vdf(load_vdf(path, lower_keys=True))
+
+
+def library_paths(data: VdfDict) -> Iterator[str]:
+    """Пути библиотек из libraryfolders.vdf (новый и старый формат)"""
+    folders = None
+    for key, value in data.items():
+        if key.lower() == 'libraryfolders' and isinstance(value, dict):
+            folders = value
+            break
+    if folders is None:
+        return
+
+    for key, value in folders.items():
+        if not key.isdigit():
+            continue
+        if isinstance(value, dict):
+            path = value.get('path')
+            if isinstance(path, str):
+                yield path
+        elif isinstance(value, str):
+            # Старый формат: "1"  "D:\\SteamLibrary"
+            yield value
+
+
+class ManifestCache:
+    """Разобранные appmanifest, перечитываются только при изменении файла"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Tuple[int, int], AppManifest]] = {}
+
+    def get(self, path, st=None) -> Optional[AppManifest]:
+        """Возвращает манифест; st - уже известный stat файла (например, из os.scandir)"""
+        path = str(path)
+        try:
+            if st is None:
+                st = os.stat(path)
+            signature = (st.st_mtime_ns, st.st_size)
+
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+
+            manifest = load_manifest(Path(path))
+        except (OSError, ValueError):
+            self._entries.pop(path, None)
+            return None
+
+        self._entries[path] = (signature, manifest)
+        return manifest
+
+    def retain(self, directory, paths: Iterable[str]):
+        """Забывает манифесты каталога directory, кроме paths (удаленные файлы)"""
+        directory = str(directory)
+        keep = set(paths)
+        # Копия ключей: другие библиотеки сканируются в соседних потоках
+        for path in list(self._entries):
+            if path not in keep and os.path.dirname(path) == directory:
+                self._entries.pop(path, None)